@@ -0,0 +1,206 @@
+# In-memory autocomplete for the people, sales rep and contact pickers
+#
+# Each worker keeps, per tenant, a sorted list of (key, id) pairs over the
+# lower-cased words of names, usernames and emails, plus the whole name,
+# email and email domain. A keystroke is a bisect to the first key starting
+# with what was typed and a walk over the keys that share the prefix, with no
+# query once the tenant is loaded:
+#
+#     autocomplete.people(tenant.id, "ada")                     # user_search
+#     autocomplete.people(tenant.id, "ada", sales_reps=True)    # autocomplete_sales_rep
+#     autocomplete.contacts(tenant.id, "acme")                  # contact_search
+#
+# An index is built on first use (one or two queries) and kept current by the
+# CustomUser/Contact/Role signals in signals.py once the transaction commits.
+# Those only reach the worker that saved; other workers pick the change up
+# when their copy expires (AUTOCOMPLETE_TTL). Beyond AUTOCOMPLETE_MAX_TENANTS
+# tenants, the least recently used index is dropped.
+
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+
+from tenants.cache import LRUCache
+
+from .models import Contact, CustomUser
+
+SALES_REP_ROLE = "Sales Rep"
+PEOPLE, CONTACTS = "people", "contacts"
+
+Person = namedtuple("Person", "id username email name is_sales_rep")
+ContactItem = namedtuple("ContactItem", "id name email")
+
+# (kind, tenant id) -> PrefixIndex
+_indexes = LRUCache(
+    maxsize=getattr(settings, "AUTOCOMPLETE_MAX_TENANTS", 100),
+    ttl=getattr(settings, "AUTOCOMPLETE_TTL", 300),
+)
+
+
+def normalize(text):
+    return " ".join(str(text or "").split()).lower()
+
+
+def _keys(*values):
+    keys = set()
+    for value in values:
+        value = normalize(value)
+        if value:
+            keys.add(value)
+            keys.update(re.findall(r"\w+", value))
+            if "@" in value:
+                keys.add(value.rsplit("@", 1)[1])
+    return keys
+
+
+class PrefixIndex:
+    """Sorted (key, id) pairs with one item per id."""
+
+    def __init__(self, kind, entries=()):
+        self.kind = kind
+        self._lock = threading.Lock()
+        self._items = {}
+        pairs = []
+        for item, keys in entries:
+            self._items[item.id] = (item, keys)
+            pairs.extend((key, item.id) for key in keys)
+        pairs.sort()
+        self._pairs = pairs
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, item, keys):
+        """Insert `item`, or replace the item with the same id."""
+        with self._lock:
+            self._discard(item.id)
+            self._items[item.id] = (item, keys)
+            for key in keys:
+                insort(self._pairs, (key, item.id))
+
+    def discard(self, item_id):
+        with self._lock:
+            self._discard(item_id)
+
+    def _discard(self, item_id):
+        _, keys = self._items.pop(item_id, (None, ()))
+        for key in keys:
+            position = bisect_left(self._pairs, (key, item_id))
+            if position < len(self._pairs) and self._pairs[position] == (key, item_id):
+                del self._pairs[position]
+
+    def lookup(self, prefix, limit=10, predicate=None):
+        """Up to `limit` items with a key starting with `prefix`, in key order."""
+        found = {}
+        with self._lock:
+            position = bisect_left(self._pairs, (prefix,))
+            while position < len(self._pairs) and len(found) < limit:
+                key, item_id = self._pairs[position]
+                if not key.startswith(prefix):
+                    break
+                item = self._items[item_id][0]
+                if item_id not in found and (predicate is None or predicate(item)):
+                    found[item_id] = item
+                position += 1
+        return list(found.values())
+
+
+def _person(user, is_sales_rep):
+    name = f"{user.first_name} {user.last_name}".strip() or user.username
+    item = Person(user.id, user.username, user.email, name, is_sales_rep)
+    return item, _keys(user.username, user.first_name, user.last_name, name, user.email)
+
+
+def _contact(contact):
+    item = ContactItem(contact.id, contact.name, contact.email)
+    return item, _keys(contact.name, contact.email, contact.organization)
+
+
+def _load_people(tenant_id):
+    users = CustomUser.objects.filter(tenant_id=tenant_id).only("id", "username", "first_name", "last_name", "email")
+    sales_reps = set(CustomUser.roles.through.objects.filter(
+        customuser__tenant_id=tenant_id, role__name=SALES_REP_ROLE,
+    ).values_list("customuser_id", flat=True))
+    return PrefixIndex(PEOPLE, (_person(user, user.id in sales_reps) for user in users.iterator()))
+
+
+def _load_contacts(tenant_id):
+    contacts = Contact.objects.filter(tenant_id=tenant_id).only("id", "name", "email", "organization")
+    return PrefixIndex(CONTACTS, (_contact(contact) for contact in contacts.iterator()))
+
+
+LOADERS = {PEOPLE: _load_people, CONTACTS: _load_contacts}
+
+
+def get_index(kind, tenant_id):
+    index = _indexes.get((kind, tenant_id))
+    if index is None:
+        index = LOADERS[kind](tenant_id)
+        _indexes.set((kind, tenant_id), index)
+    return index
+
+
+def people(tenant_id, query, limit=10, sales_reps=False):
+    """Users of the tenant with a name, username or email word starting with `query`."""
+    predicate = (lambda person: person.is_sales_rep) if sales_reps else None
+    return get_index(PEOPLE, tenant_id).lookup(normalize(query), limit, predicate)
+
+
+def contacts(tenant_id, query, limit=10):
+    """Contacts of the tenant with a name, email or organization word starting with `query`."""
+    return get_index(CONTACTS, tenant_id).lookup(normalize(query), limit)
+
+
+def _cached(kind, tenant_id):
+    return _indexes.get((kind, tenant_id)) if tenant_id else None
+
+
+def _discard_elsewhere(kind, item_id, tenant_id=None):
+    # An object that moved tenants must leave the index of its old tenant
+    for (cached_kind, cached_tenant_id), index in _indexes.items():
+        if cached_kind == kind and cached_tenant_id != tenant_id:
+            index.discard(item_id)
+
+
+def _update_person(user):
+    _discard_elsewhere(PEOPLE, user.pk, user.tenant_id)
+    index = _cached(PEOPLE, user.tenant_id)
+    if index is not None:
+        index.add(*_person(user, user.roles.filter(name=SALES_REP_ROLE).exists()))
+
+
+def _update_contact(contact):
+    _discard_elsewhere(CONTACTS, contact.pk, contact.tenant_id)
+    index = _cached(CONTACTS, contact.tenant_id)
+    if index is not None:
+        index.add(*_contact(contact))
+
+
+def update_person(user):
+    transaction.on_commit(lambda: _update_person(user))
+
+
+def update_contact(contact):
+    transaction.on_commit(lambda: _update_contact(contact))
+
+
+def remove_person(user_id):
+    transaction.on_commit(lambda: _discard_elsewhere(PEOPLE, user_id))
+
+
+def remove_contact(contact_id):
+    transaction.on_commit(lambda: _discard_elsewhere(CONTACTS, contact_id))
+
+
+def invalidate(kind, tenant_id=None):
+    """Drop the cached `kind` indexes of one tenant, or of every tenant."""
+    def drop():
+        if tenant_id is None:
+            _indexes.delete_where(lambda index: index.kind == kind)
+        else:
+            _indexes.delete((kind, tenant_id))
+    transaction.on_commit(drop)
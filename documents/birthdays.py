@@ -0,0 +1,134 @@
+# Daily birthday notifications, generated in one batch for every tenant.
+#
+# Run from BirthdayNotificationCronJob (cron.py) or the generate_birthday_notifications
+# command. Each tenant gets:
+#   - one "self" notification per celebrant, addressed only to them
+#   - one "others" notification listing the celebrants, addressed to everyone else
+# Notifications are keyed by Notification.dedupe_key, so re-running on the same day
+# creates nothing new.
+
+import logging
+from datetime import datetime, time, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.utils.timezone import localdate, make_aware
+
+from tenants.observability import log_event
+
+from . import notifications
+from .models import CustomUser, Notification, StaffProfile, UserNotification
+
+BATCH_SIZE = 500
+
+
+def _key_prefix(day):
+    return f"birthday:{day.isoformat()}:"
+
+
+def _join_names(names):
+    return names[0] if len(names) == 1 else f"{', '.join(names[:-1])} and {names[-1]}"
+
+
+def generate_birthday_notifications(day=None):
+    """
+    Create today's birthday Notification/UserNotification rows for all tenants.
+    Returns (notifications_created, user_notifications_created).
+    """
+    day = day or localdate()
+    prefix = _key_prefix(day)
+    expires_at = make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+    # Query 1: every celebrant across all tenants, grouped by tenant
+    celebrants = list(
+        StaffProfile.objects.filter(
+            tenant__isnull=False,
+            date_of_birth__month=day.month,
+            date_of_birth__day=day.day,
+        ).order_by('tenant_id', 'first_name', 'last_name').values('tenant_id', 'user_id', 'first_name', 'last_name')
+    )
+    if not celebrants:
+        return 0, 0
+
+    by_tenant = {tenant_id: list(rows) for tenant_id, rows in groupby(celebrants, key=itemgetter('tenant_id'))}
+
+    # Query 2: the recipients, i.e. active users of those tenants
+    tenant_users = {tenant_id: [] for tenant_id in by_tenant}
+    for user_id, tenant_id in CustomUser.objects.filter(
+        tenant_id__in=by_tenant, is_active=True
+    ).values_list('id', 'tenant_id'):
+        tenant_users[tenant_id].append(user_id)
+
+    new_notifications = []
+    recipients = {}  # (tenant_id, dedupe_key) -> [user_id, ...]
+    for tenant_id, rows in by_tenant.items():
+        celebrant_ids = {row['user_id'] for row in rows}
+        names = []
+        for row in rows:
+            first_name = row['first_name'] or ''
+            names.append(f"{first_name} {row['last_name'] or ''}".strip())
+            key = f"{prefix}self:{row['user_id']}"
+            new_notifications.append(Notification(
+                tenant_id=tenant_id,
+                dedupe_key=key,
+                title=f"Happy Birthday, {first_name}!" if first_name else "Happy Birthday!",
+                message="Wishing you a wonderful birthday from all of us! 🎉",
+                type=Notification.NotificationType.BIRTHDAY,
+                is_active=True,
+                expires_at=expires_at,
+            ))
+            recipients[(tenant_id, key)] = [row['user_id']]
+
+        others = [user_id for user_id in tenant_users[tenant_id] if user_id not in celebrant_ids]
+        if others:
+            key = f"{prefix}others"
+            new_notifications.append(Notification(
+                tenant_id=tenant_id,
+                dedupe_key=key,
+                title="Birthday Today! 🎉" if len(names) == 1 else "Birthdays Today! 🎉",
+                message=f"Today is {_join_names(names)}'s birthday. Wish them a happy birthday!",
+                type=Notification.NotificationType.BIRTHDAY,
+                is_active=True,
+                expires_at=expires_at,
+            ))
+            recipients[(tenant_id, key)] = others
+
+    with transaction.atomic():
+        # ignore_conflicts + the (tenant, dedupe_key) constraint makes re-runs no-ops
+        before = Notification.objects.filter(tenant_id__in=by_tenant, dedupe_key__startswith=prefix).count()
+        Notification.objects.bulk_create(new_notifications, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+        # bulk_create does not return ids when conflicts are ignored; read them back by key
+        saved = Notification.objects.filter(
+            tenant_id__in=by_tenant, dedupe_key__startswith=prefix
+        ).values_list('id', 'tenant_id', 'dedupe_key')
+        notifications_created = len(saved) - before
+
+        links = [
+            UserNotification(tenant_id=tenant_id, user_id=user_id, notification_id=notification_id)
+            for notification_id, tenant_id, key in saved
+            for user_id in recipients.get((tenant_id, key), [])
+        ]
+        before = UserNotification.objects.filter(notification__tenant_id__in=by_tenant,
+                                                 notification__dedupe_key__startswith=prefix).count()
+        UserNotification.objects.bulk_create(links, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        user_notifications_created = UserNotification.objects.filter(
+            notification__tenant_id__in=by_tenant, notification__dedupe_key__startswith=prefix
+        ).count() - before
+
+    # bulk_create skips the signals that normally invalidate the notification bar cache;
+    # bumping the tenant version covers every user of the tenant
+    for tenant_id in by_tenant:
+        notifications.invalidate_tenant(tenant_id)
+
+    log_event(
+        "birthdays.generated",
+        level=logging.INFO,
+        day=day.isoformat(),
+        tenants=len(by_tenant),
+        celebrants=len(celebrants),
+        notifications_created=notifications_created,
+        user_notifications_created=user_notifications_created,
+    )
+    return notifications_created, user_notifications_created
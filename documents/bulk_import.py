@@ -0,0 +1,433 @@
+# Bulk import of users (with staff profiles, teams and roles) and contacts from CSV/XLSX
+#
+# read_rows() streams an upload row by row: CSV through the csv module, XLSX
+# by iterparse over the first worksheet (no spreadsheet library). Each row is
+# validated as it is read; rows with errors are reported by line and skipped.
+# Valid rows are written with bulk_create, BULK_IMPORT_CHUNK_SIZE rows per
+# transaction, so a 10k-user upload costs a few queries per chunk instead of
+# a dozen per user.
+#
+# bulk_create sends no post_save/m2m_changed signals. What the receivers in
+# signals.py would do per row happens once per chunk instead:
+#   - staff profiles and their teams are written with the users
+#     (sync_user_to_profile_department)
+#   - role permissions are granted (update_user_permissions)
+#   - search entries are upserted and the tenant's autocomplete indexes dropped
+#
+#     report = bulk_import.import_file("users", upload, tenant, user=request.user)
+#     report.created, report.failed, report.errors     # errors: [(line, message), ...]
+#
+# Users get the hash of their `password` column (rows with the same initial
+# password share one hash, so each distinct password is hashed once) or, with
+# no password, an unusable one; they then sign in through password reset.
+
+import csv
+import io
+import logging
+import os
+import re
+import zipfile
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.contrib.admin.models import ADDITION, LogEntry
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from tenants.observability import log_event
+
+from . import autocomplete, search
+from .models import Contact, CustomUser, Department, Role, StaffProfile, Team
+
+MAX_REPORTED_ERRORS = 500
+TRUE_VALUES = {'1', 'y', 'yes', 'true'}
+FALSE_VALUES = {'0', 'n', 'no', 'false'}
+EXCEL_EPOCH = date(1899, 12, 30)
+
+
+class RowError(Exception):
+    pass
+
+
+@dataclass
+class ImportReport:
+    kind: str
+    dry_run: bool = False
+    rows: int = 0
+    created: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)  # First MAX_REPORTED_ERRORS (line, message)
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def _header(name):
+    return re.sub(r'[^a-z0-9]+', '_', str(name or '').strip().lower()).strip('_')
+
+
+def _csv_rows(stream):
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _column_index(reference):
+    letters = re.match(r'[A-Z]+', reference or '')
+    if not letters:
+        return None
+    index = 0
+    for letter in letters.group():
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def _shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as stream:
+        for _, element in ElementTree.iterparse(stream):
+            if _local(element.tag) == 'si':
+                strings.append(''.join(t.text or '' for t in element.iter() if _local(t.tag) == 't'))
+                element.clear()
+    return strings
+
+
+def _xlsx_cell(cell, strings):
+    kind = cell.get('t')
+    if kind == 'inlineStr':
+        return ''.join(t.text or '' for t in cell.iter() if _local(t.tag) == 't')
+    value = next((child.text or '' for child in cell if _local(child.tag) == 'v'), '')
+    if kind == 's':
+        return strings[int(value)] if value else ''
+    if kind in (None, 'n') and value.endswith('.0'):
+        return value[:-2]  # Whole numbers (phone numbers, ids) come back as floats
+    return value
+
+
+def _xlsx_rows(stream):
+    with zipfile.ZipFile(stream) as archive:
+        sheets = [name for name in archive.namelist() if re.fullmatch(r'xl/worksheets/sheet\d+\.xml', name)]
+        if not sheets:
+            raise RowError("The workbook has no worksheet.")
+        strings = _shared_strings(archive)
+        with archive.open(min(sheets, key=lambda name: int(re.search(r'\d+', name).group()))) as sheet:
+            line = 0
+            for _, element in ElementTree.iterparse(sheet):
+                if _local(element.tag) != 'row':
+                    continue
+                line = int(element.get('r') or line + 1)
+                row = []
+                for cell in element:
+                    index = _column_index(cell.get('r'))
+                    if index is not None and index > len(row):
+                        row.extend([''] * (index - len(row)))
+                    row.append(_xlsx_cell(cell, strings))
+                element.clear()
+                yield line, row
+
+
+def read_rows(stream, filename):
+    """(line, {header: value}) for each non-empty row after the header row of a .csv or .xlsx upload."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        rows = _csv_rows(stream)
+    elif extension == '.xlsx':
+        rows = _xlsx_rows(stream)
+    else:
+        raise RowError("Upload a .csv or .xlsx file.")
+    headers = None
+    for line, values in rows:
+        values = [str(value).strip() for value in values]
+        if not any(values):
+            continue
+        if headers is None:
+            headers = [_header(value) for value in values]
+            continue
+        yield line, dict(zip(headers, values))
+
+
+def _required(row, name):
+    value = row.get(name, '')
+    if not value:
+        raise RowError(f"{name} is required.")
+    return value
+
+
+def _text(row, name, max_length, required=False):
+    value = _required(row, name) if required else row.get(name, '')
+    if len(value) > max_length:
+        raise RowError(f"{name} is longer than {max_length} characters.")
+    return value
+
+
+def _email(row, name, required=False):
+    value = _required(row, name) if required else row.get(name, '')
+    if value:
+        try:
+            validate_email(value)
+        except ValidationError:
+            raise RowError(f"{name} '{value}' is not a valid email address.")
+    return value
+
+
+def _flag(row, name, default):
+    value = row.get(name, '').lower()
+    if not value:
+        return default
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise RowError(f"{name} must be yes or no.")
+
+
+def _date(row, name):
+    value = row.get(name, '')
+    if not value:
+        return None
+    if value.isdigit():
+        return EXCEL_EPOCH + timedelta(days=int(value))  # XLSX date cell without its style
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise RowError(f"{name} must be a date like 2024-01-31.")
+
+
+def _choice(row, name, choices, default=None):
+    value = row.get(name, '').lower()
+    if not value:
+        return default
+    by_label = {str(label).lower(): key for key, label in choices}
+    if value in dict(choices):
+        return value
+    if value in by_label:
+        return by_label[value]
+    raise RowError(f"{name} must be one of: {', '.join(str(label) for _, label in choices)}.")
+
+
+def _lookup(row, name, objects, kind):
+    value = row.get(name, '')
+    if not value:
+        return None
+    try:
+        return objects[value.lower()]
+    except KeyError:
+        raise RowError(f"Unknown {kind} '{value}'.")
+
+
+def _lookups(row, name, objects, kind):
+    return [_lookup({name: value.strip()}, name, objects, kind) for value in re.split(r'[;,]', row.get(name, ''))
+            if value.strip()]
+
+
+class UserImporter:
+    """CustomUser rows with their StaffProfile, team and role memberships."""
+
+    columns = ['username', 'email', 'first_name', 'last_name', 'middle_name', 'password', 'phone_number', 'is_active',
+               'department', 'teams', 'roles', 'designation', 'sex', 'date_of_birth', 'employment_date',
+               'official_email']
+
+    def __init__(self, tenant, user=None):
+        self.tenant = tenant
+        self.user = user
+        self.departments = {d.name.lower(): d for d in Department.objects.filter(tenant=tenant)}
+        self.teams = {t.name.lower(): t for t in Team.objects.filter(tenant=tenant)}
+        self.roles = {r.name.lower(): r for r in Role.objects.all()}
+        self.usernames = set()
+        self.passwords = {'': make_password(None)}  # Plain password -> hash; '' -> an unusable password
+
+    def validate(self, row):
+        username = _text(row, 'username', 150, required=True)
+        try:
+            UnicodeUsernameValidator()(username)
+        except ValidationError:
+            raise RowError(f"Username '{username}' may only contain letters, digits and @/./+/-/_.")
+        data = dict(
+            username=username, email=_email(row, 'email'),
+            first_name=_text(row, 'first_name', 150), last_name=_text(row, 'last_name', 150),
+            middle_name=_text(row, 'middle_name', 255), password=row.get('password', ''),
+            phone_number=_text(row, 'phone_number', 15), is_active=_flag(row, 'is_active', True),
+            department=_lookup(row, 'department', self.departments, 'department'),
+            teams=_lookups(row, 'teams', self.teams, 'team'), roles=_lookups(row, 'roles', self.roles, 'role'),
+            designation=_text(row, 'designation', 100), sex=_choice(row, 'sex', StaffProfile.SEX_CHOICES),
+            date_of_birth=_date(row, 'date_of_birth'), employment_date=_date(row, 'employment_date'),
+            official_email=_email(row, 'official_email'),
+        )
+        # Only once the whole row is valid, so a corrected copy of a rejected row further down still imports
+        if username in self.usernames:
+            raise RowError(f"Username '{username}' appears more than once in the file.")
+        self.usernames.add(username)
+        return data
+
+    def check(self, chunk):
+        """Errors of a chunk of validated rows that need the database: {line: message}."""
+        taken = set(CustomUser.objects.filter(username__in=[data['username'] for _, data in chunk]).values_list(
+            'username', flat=True))
+        return {line: f"Username '{data['username']}' is already taken." for line, data in chunk
+                if data['username'] in taken}
+
+    def _password(self, password):
+        if password not in self.passwords:
+            self.passwords[password] = make_password(password)
+        return self.passwords[password]
+
+    def write(self, chunk):
+        users = CustomUser.objects.bulk_create([
+            CustomUser(tenant=self.tenant, username=data['username'], email=data['email'],
+                       first_name=data['first_name'], last_name=data['last_name'],
+                       password=self._password(data['password']), phone_number=data['phone_number'] or None,
+                       is_active=data['is_active'], department=data['department'])
+            for data in chunk
+        ])
+        profiles = StaffProfile.objects.bulk_create([
+            StaffProfile(tenant=self.tenant, user=user, first_name=data['first_name'], last_name=data['last_name'],
+                         middle_name=data['middle_name'] or None, email=data['email'] or None,
+                         phone_number=data['phone_number'] or None, department=data['department'],
+                         designation=data['designation'] or None, sex=data['sex'],
+                         date_of_birth=data['date_of_birth'], employment_date=data['employment_date'],
+                         official_email=data['official_email'] or None)
+            for user, data in zip(users, chunk)
+        ])
+        CustomUser.teams.through.objects.bulk_create([
+            CustomUser.teams.through(customuser_id=user.id, team_id=team.id)
+            for user, data in zip(users, chunk) for team in data['teams']
+        ])
+        StaffProfile.team.through.objects.bulk_create([
+            StaffProfile.team.through(staffprofile_id=profile.id, team_id=team.id)
+            for profile, data in zip(profiles, chunk) for team in data['teams']
+        ])
+        CustomUser.roles.through.objects.bulk_create([
+            CustomUser.roles.through(customuser_id=user.id, role_id=role.id)
+            for user, data in zip(users, chunk) for role in data['roles']
+        ])
+        # update_user_permissions: users get the permissions of their roles
+        permissions = {}
+        for role_id, permission_id in Role.permissions.through.objects.filter(
+                role_id__in={role.id for data in chunk for role in data['roles']}).values_list('role_id', 'permission_id'):
+            permissions.setdefault(role_id, set()).add(permission_id)
+        CustomUser.user_permissions.through.objects.bulk_create([
+            CustomUser.user_permissions.through(customuser_id=user.id, permission_id=permission_id)
+            for user, data in zip(users, chunk)
+            for permission_id in set().union(*(permissions.get(role.id, ()) for role in data['roles']))
+        ], ignore_conflicts=True)
+
+        if self.user is not None:
+            # One audit entry per chunk, where create_user logs one per user
+            LogEntry.objects.log_action(
+                user_id=self.user.id,
+                content_type_id=ContentType.objects.get_for_model(CustomUser).pk,
+                object_id=None,
+                object_repr="Multiple users",
+                action_flag=ADDITION,
+                change_message=f"Bulk imported {len(users)} users: {', '.join(user.username for user in users)}",
+            )
+
+        for user, profile in zip(users, profiles):
+            user.staff_profile = profile
+        search.index_objects(users)
+        autocomplete.invalidate(autocomplete.PEOPLE, self.tenant.id)
+        return len(users)
+
+
+class ContactImporter:
+    """Contact rows, created by `user` and by default in their department and first team (like create_contact)."""
+
+    columns = ['name', 'email', 'phone', 'organization', 'designation', 'priority', 'is_public', 'department', 'team']
+
+    def __init__(self, tenant, user):
+        if user is None:
+            raise ValueError("Contacts are imported on behalf of a user.")
+        self.tenant = tenant
+        self.user = user
+        self.departments = {d.name.lower(): d for d in Department.objects.filter(tenant=tenant)}
+        self.teams = {t.name.lower(): t for t in Team.objects.filter(tenant=tenant)}
+        self.default_team = user.teams.first()
+
+    def validate(self, row):
+        return dict(
+            name=_text(row, 'name', 255, required=True), email=_email(row, 'email', required=True),
+            phone=_text(row, 'phone', 20), organization=_text(row, 'organization', 255),
+            designation=_text(row, 'designation', 255),
+            priority=_choice(row, 'priority', Contact.PRIORITY_CHOICES, default='medium'),
+            is_public=_flag(row, 'is_public', False),
+            department=_lookup(row, 'department', self.departments, 'department') or self.user.department,
+            team=_lookup(row, 'team', self.teams, 'team') or self.default_team,
+        )
+
+    def check(self, chunk):
+        return {}
+
+    def write(self, chunk):
+        contacts = Contact.objects.bulk_create([
+            Contact(tenant=self.tenant, created_by=self.user, name=data['name'], email=data['email'],
+                    phone=data['phone'] or None, organization=data['organization'] or None,
+                    designation=data['designation'] or None, priority=data['priority'], is_public=data['is_public'],
+                    department=data['department'], team=data['team'])
+            for data in chunk
+        ])
+        search.index_objects(contacts)
+        autocomplete.invalidate(autocomplete.CONTACTS, self.tenant.id)
+        return len(contacts)
+
+
+IMPORTERS = {'users': UserImporter, 'contacts': ContactImporter}
+
+
+def _flush(importer, pending, report):
+    problems = importer.check(pending)
+    for line, message in sorted(problems.items()):
+        report.error(line, message)
+    chunk = [(line, data) for line, data in pending if line not in problems]
+    if not chunk or report.dry_run:
+        return
+    try:
+        with transaction.atomic():
+            report.created += importer.write([data for _, data in chunk])
+    except IntegrityError as e:
+        # Lost a race with another writer (e.g. a username taken meanwhile); the whole chunk is rolled back
+        for line, _ in chunk:
+            report.error(line, f"Not imported: {e}")
+
+
+def import_rows(kind, rows, tenant, user=None, dry_run=False):
+    """Validate and write (line, row) pairs as `kind` records of `tenant`. Returns an ImportReport."""
+    importer = IMPORTERS[kind](tenant, user)
+    report = ImportReport(kind=kind, dry_run=dry_run)
+    chunk_size = getattr(settings, 'BULK_IMPORT_CHUNK_SIZE', 1000)
+    pending = []
+    try:
+        for line, row in rows:
+            report.rows += 1
+            try:
+                pending.append((line, importer.validate(row)))
+            except RowError as e:
+                report.error(line, str(e))
+            if len(pending) >= chunk_size:
+                _flush(importer, pending, report)
+                pending = []
+    except (RowError, zipfile.BadZipFile, ElementTree.ParseError, UnicodeDecodeError, csv.Error) as e:
+        report.error(0, f"Could not read the file: {e}")
+    _flush(importer, pending, report)
+    report.errors.sort(key=lambda error: error[0])
+    log_event("import.finished", level=logging.INFO, tenant_id=tenant.id, kind=kind, dry_run=dry_run,
+              rows=report.rows, created=report.created, failed=report.failed)
+    return report
+
+
+def import_file(kind, stream, tenant, user=None, dry_run=False, filename=None):
+    """import_rows() over a .csv/.xlsx file object (an upload, or a file opened in binary mode)."""
+    return import_rows(kind, read_rows(stream, filename or stream.name), tenant, user=user, dry_run=dry_run)
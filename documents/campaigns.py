@@ -0,0 +1,312 @@
+# Mass-mail campaigns: one Email draft, personalized for every Contact or
+# StaffProfile of a tenant.
+#
+# Recipients are streamed by primary key (keyset pagination), so memory use does
+# not grow with the audience. Each batch is personalized, rate limited with a
+# token bucket per (provider, sender) sized from SMTP_RATE_LIMITS, and sent over
+# one pooled connection with send_messages(). After every batch the campaign's
+# last_recipient_id is saved: a crashed or interrupted worker resumes after the
+# last checkpoint, so at most the batch in flight can be sent twice.
+#
+# Subject and body are personalized by plain substitution of {{ name }},
+# {{ first_name }}, {{ last_name }} and {{ email }}; nothing else in the text is
+# interpreted. start_campaign() rejects other placeholders and unreadable
+# attachments; if either turns up while running, the campaign fails instead of
+# being retried.
+#
+# Campaigns are run by MailCampaignCronJob (cron.py) or the run_campaigns command.
+
+import logging
+import mimetypes
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+
+from tenants.observability import log_event
+
+from .models import Contact, Email, EmailCampaign, StaffProfile
+from .outbox import STALE_LOCK, SMTPConnectionPool, SMTPUnavailable, backoff_delay
+from .viewfuncs.mail_connection import SMTP_RATE_LIMITS
+
+
+PLACEHOLDER = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+PLACEHOLDERS = ('name', 'first_name', 'last_name', 'email')
+
+
+class CampaignError(Exception):
+    """The campaign cannot be sent as it stands; retrying will not help."""
+
+
+class TokenBucket:
+    """`rate_per_minute` tokens refill continuously, up to `burst` tokens."""
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        current = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (current - self.updated) * self.rate)
+        self.updated = current
+
+    def acquire(self, n=1, sleep=time.sleep):
+        """Block until `n` (<= burst) tokens are available, then take them."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                wait = (n - self.tokens) / self.rate
+            sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_rate_limit(provider):
+    limits = getattr(settings, 'MAIL_RATE_LIMITS', None) or SMTP_RATE_LIMITS
+    return limits.get(provider, (10, 5))
+
+
+def get_bucket(provider, sender_email):
+    key = (provider, sender_email)
+    with _buckets_lock:
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(*get_rate_limit(provider))
+        return _buckets[key]
+
+
+def check_placeholders(*texts):
+    unknown = sorted({name for text in texts for name in PLACEHOLDER.findall(text or '')} - set(PLACEHOLDERS))
+    if unknown:
+        raise CampaignError(
+            f"Unknown placeholder(s): {', '.join(unknown)}. Use {', '.join(PLACEHOLDERS)}."
+        )
+
+
+def personalize(text, context):
+    return PLACEHOLDER.sub(lambda match: context.get(match.group(1), match.group(0)), text or '')
+
+
+def start_campaign(email, audience, sender):
+    """Queue a campaign for an Email draft, sent from `sender`'s configured mailbox.
+
+    Raises CampaignError when the draft uses an unknown placeholder or an attachment is missing.
+    """
+    check_placeholders(email.subject, email.body)
+    _load_attachments(email)
+    campaign = EmailCampaign(
+        tenant=email.tenant,
+        email=email,
+        created_by=sender,
+        audience=audience,
+        smtp_provider=(sender.email_provider or '').lower(),
+        from_email=sender.email_address,
+    )
+    campaign.set_smtp_password(sender.get_smtp_password())
+    campaign.save()
+    log_event("campaign.queued", level=logging.INFO, campaign_id=campaign.id, audience=audience)
+    return campaign
+
+
+def _recipients(campaign, after_id, limit):
+    """Next `limit` recipients after the checkpoint, as (id, context) pairs."""
+    if campaign.audience == 'contacts':
+        rows = Contact.objects.filter(
+            tenant_id=campaign.tenant_id, id__gt=after_id
+        ).exclude(email='').order_by('id').values_list('id', 'name', 'email')[:limit]
+        for pk, name, email in rows:
+            yield pk, {'name': name, 'first_name': (name or '').split(' ')[0], 'last_name': '', 'email': email}
+    else:
+        rows = StaffProfile.objects.filter(
+            tenant_id=campaign.tenant_id, id__gt=after_id
+        ).annotate(
+            address=Coalesce(NullIf('email', Value('')), 'user__email')
+        ).filter(
+            ~Q(address=''), address__isnull=False
+        ).order_by('id').values_list('id', 'first_name', 'last_name', 'address')[:limit]
+        for pk, first_name, last_name, email in rows:
+            name = f"{first_name or ''} {last_name or ''}".strip()
+            yield pk, {'name': name, 'first_name': first_name or '', 'last_name': last_name or '', 'email': email}
+
+
+def _load_attachments(email):
+    # Read once per run instead of once per recipient
+    attachments = []
+    for attachment in email.attachments.all():
+        path = attachment.file.path
+        try:
+            with open(path, 'rb') as f:
+                attachments.append((os.path.basename(path), f.read(), mimetypes.guess_type(path)[0]))
+        except OSError:
+            raise CampaignError(f"Attachment {os.path.basename(path)} cannot be read.")
+    return attachments
+
+
+def _finish(campaign, status, error=''):
+    campaign.status = status
+    campaign.finished_at = timezone.now()
+    campaign.smtp_password = ''
+    campaign.locked_at = None
+    campaign.last_error = error
+    campaign.save(update_fields=['status', 'attempts', 'finished_at', 'smtp_password', 'locked_at', 'last_error'])
+    if status == 'done':
+        Email.objects.filter(id=campaign.email_id).update(sent=True, sent_at=campaign.finished_at)
+    log_event("campaign.finished", level=logging.INFO, campaign_id=campaign.id, status=status,
+              sent=campaign.sent_count, failed=campaign.failed_count)
+
+
+def run_campaign(campaign, pool, deadline):
+    """Send batches until the audience is exhausted, a batch fails, or `deadline` (monotonic) passes."""
+    email = campaign.email
+    try:
+        # The draft may have changed since start_campaign() checked it
+        check_placeholders(email.subject, email.body)
+        attachments = _load_attachments(email)
+    except CampaignError as e:
+        _finish(campaign, 'failed', str(e))
+        return
+    password = campaign.get_smtp_password()
+    bucket = get_bucket(campaign.smtp_provider, campaign.from_email)
+    batch_size = min(getattr(settings, 'MAIL_CAMPAIGN_BATCH_SIZE', 50), bucket.capacity)
+    max_attempts = getattr(settings, 'MAIL_MAX_ATTEMPTS', 5)
+
+    if campaign.started_at is None:
+        campaign.started_at = timezone.now()
+        EmailCampaign.objects.filter(id=campaign.id).update(status='running', started_at=campaign.started_at)
+    campaign.status = 'running'
+
+    while time.monotonic() < deadline:
+        batch = list(_recipients(campaign, campaign.last_recipient_id, batch_size))
+        if not batch:
+            _finish(campaign, 'done')
+            return
+
+        messages = []
+        for _, context in batch:
+            message = EmailMessage(
+                subject=personalize(email.subject, context).strip(),
+                body=personalize(email.body, context),
+                from_email=campaign.from_email,
+                to=[context['email']],
+            )
+            for attachment in attachments:
+                message.attach(*attachment)
+            messages.append(message)
+
+        bucket.acquire(len(messages))
+        sent = 0
+        error = ''
+        try:
+            connection = pool.acquire(campaign.smtp_provider, campaign.from_email, password)
+        except SMTPUnavailable as e:
+            error = str(e)
+        else:
+            # Per-message failures (e.g. a refused address) are counted instead of aborting the batch
+            connection.fail_silently = True
+            try:
+                sent = connection.send_messages(messages) or 0
+            finally:
+                connection.fail_silently = False
+            if sent:
+                pool.release(campaign.smtp_provider, campaign.from_email, connection)
+            else:
+                pool.discard(campaign.smtp_provider, campaign.from_email, connection)
+                error = "No message in the batch was accepted"
+
+        if not sent:
+            # Connection-level failure: keep the checkpoint and retry the batch later
+            campaign.attempts += 1
+            log_event("campaign.batch_failed", level=logging.WARNING, campaign_id=campaign.id,
+                      attempts=campaign.attempts, error=error)
+            if campaign.attempts >= max_attempts:
+                _finish(campaign, 'failed', error)
+            else:
+                campaign.next_attempt_at = timezone.now() + backoff_delay(campaign.attempts)
+                EmailCampaign.objects.filter(id=campaign.id).update(
+                    attempts=campaign.attempts, next_attempt_at=campaign.next_attempt_at, last_error=error, locked_at=None,
+                )
+            return
+
+        # Checkpoint; the status filter makes a cancelled campaign stop here
+        checkpointed = EmailCampaign.objects.filter(id=campaign.id, status='running').update(
+            last_recipient_id=batch[-1][0],
+            sent_count=F('sent_count') + sent,
+            failed_count=F('failed_count') + len(messages) - sent,
+            attempts=0,
+            locked_at=timezone.now(),
+        )
+        if not checkpointed:
+            log_event("campaign.cancelled", level=logging.INFO, campaign_id=campaign.id)
+            return
+        campaign.last_recipient_id = batch[-1][0]
+        campaign.sent_count += sent
+        campaign.failed_count += len(messages) - sent
+        campaign.attempts = 0
+
+    # Out of time: release the lock, the next run resumes from the checkpoint
+    EmailCampaign.objects.filter(id=campaign.id).update(locked_at=None)
+
+
+def _claim():
+    current = timezone.now()
+    due = EmailCampaign.objects.filter(
+        Q(locked_at__isnull=True) | Q(locked_at__lt=current - STALE_LOCK),
+        status__in=['queued', 'running'],
+        next_attempt_at__lte=current,
+    ).order_by('next_attempt_at').values_list('id', flat=True)
+    for campaign_id in list(due):
+        won = EmailCampaign.objects.filter(
+            Q(locked_at__isnull=True) | Q(locked_at__lt=current - STALE_LOCK), id=campaign_id,
+        ).update(locked_at=current)
+        if won:
+            yield EmailCampaign.objects.select_related('email').get(id=campaign_id)
+
+
+def _record_error(campaign, error):
+    # Unexpected errors count as attempts too, so a campaign that always fails stops (and drops its password)
+    campaign.attempts += 1
+    if campaign.attempts >= getattr(settings, 'MAIL_MAX_ATTEMPTS', 5):
+        _finish(campaign, 'failed', error)
+        return
+    EmailCampaign.objects.filter(id=campaign.id).update(
+        attempts=campaign.attempts, locked_at=None, last_error=error,
+        next_attempt_at=timezone.now() + backoff_delay(campaign.attempts),
+    )
+
+
+def process_campaigns(time_budget=None, pool=None):
+    """Run due campaigns for at most `time_budget` seconds. Returns the number of campaigns touched."""
+    time_budget = time_budget or getattr(settings, 'MAIL_CAMPAIGN_TIME_BUDGET', 50)
+    deadline = time.monotonic() + time_budget
+    own_pool = pool is None
+    pool = pool or SMTPConnectionPool()
+    touched = 0
+    try:
+        for campaign in _claim():
+            touched += 1
+            try:
+                run_campaign(campaign, pool, deadline)
+            except Exception as e:
+                log_event("campaign.error", level=logging.ERROR, exc_info=True, campaign_id=campaign.id)
+                _record_error(campaign, str(e))
+            if time.monotonic() >= deadline:
+                break
+    finally:
+        if own_pool:
+            pool.close_all()
+        else:
+            pool.close_idle()
+    return touched
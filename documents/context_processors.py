@@ -1,127 +1,47 @@
-from django.utils.timezone import now, timedelta
-from .models import StaffProfile, Notification, UserNotification, CustomUser
+from django.utils.functional import SimpleLazyObject
+from .notifications import get_request_payload
+from tenants.observability import log_event
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _tenant_mismatch(request):
+    if not hasattr(request, 'tenant'):
+        return True
+    tenant_id = request.tenant.id if request.tenant else None
+    return not request.user.is_superuser and request.user.tenant_id != tenant_id
+
+
 def notification_count(request):
     # Validate tenant access
     if request.user.is_authenticated:
-        if not hasattr(request, 'tenant') or (not request.user.is_superuser and request.user.tenant != request.tenant):
+        if _tenant_mismatch(request):
             logger.error(f"Unauthorized access by user {request.user.username}: tenant mismatch")
             return {'unseen_notification_count': 0}
-    print("Meer>>>>>", request)
-        # Assuming this is in a view or similar context
-    if request.user.is_authenticated:
-        if request.user.is_superuser:
-            # Superuser: Ignore tenant filter
-            user = CustomUser.objects.get(username=request.user.username)
-        else:
-            # Regular user: Apply tenant filter
-            user = CustomUser.objects.get(username=request.user.username, tenant=request.tenant)
-        # active_notif = Notification.objects.filter(is_active=True)
-        count = UserNotification.objects.filter(user=user, dismissed=False).count()
-        return {'unseen_notification_count': count}
+        payload = get_request_payload(request)
+        return {'unseen_notification_count': SimpleLazyObject(lambda: payload.unseen_count)}
     return {'unseen_notification_count': 0}
 
 def notification_bar(request):
-    print("Yosh>>>>>", request)
-    print("Yosh>>>>>", request.user)
-    today = now().date()
     context = {
         'notification_bar_items': [],
         'birthday_self': False,
         'birthday_others': [],
     }
 
-    if request.user.is_authenticated:
-        if not hasattr(request, 'tenant') or (not request.user.is_superuser and request.user.tenant != request.tenant):
-            logger.error(f"Unauthorized access by user {request.user.username}: tenant mismatch")
-            return context
-
-    notifications = Notification.objects.filter(
-        tenant=request.user.tenant if request.user.is_authenticated else None,
-        is_active=True,
-        type__in=[Notification.NotificationType.NEWS, Notification.NotificationType.ALERT, Notification.NotificationType.EVENT]
-    ).order_by('-created_at')
-    
-    if request.user.is_authenticated:
-        # Filter out dismissed notifications for the current user
-        dismissed_ids = UserNotification.objects.filter(
-            notification__tenant=request.user.tenant,
-            user=request.user,
-            dismissed=True
-        ).values_list('notification_id', flat=True)
-        notifications = notifications.exclude(id__in=dismissed_ids)
-        # context['notification_bar_items'] = [n for n in notifications if n.is_visible()]
+    if not request.user.is_authenticated:
+        # Notifications are tenant-scoped and addressed to users, so anonymous pages have none
+        return context
 
-        # Check for Event Notification Participants
-        participants = UserNotification.objects.filter(
-            notification__tenant=request.user.tenant,
-            user=request.user,
-            notification__type=Notification.NotificationType.EVENT
-        ).values_list('notification_id', flat=True)
-        # non_participants = notifications.exclude(id__in=participants)
-        # notifications = notifications.exclude(id__in=non_participants)
-        context['notification_bar_items'] = [n for n in notifications if n.id in participants and n.is_visible()]
-
-        try:
-            user_profile = StaffProfile.objects.get(user=request.user, tenant=request.user.tenant)
-            user_birthday_today = (
-                user_profile.date_of_birth and 
-                user_profile.date_of_birth.month == today.month and 
-                user_profile.date_of_birth.day == today.day
-            )
-        except StaffProfile.DoesNotExist:
-            user_birthday_today = False
-
-        # Get other staff with birthdays today (excluding current user)
-        birthday_others_qs = StaffProfile.objects.filter(
-            tenant=request.user.tenant,
-            date_of_birth__month=today.month,
-            date_of_birth__day=today.day
-        ).exclude(user=request.user)
-
-        if user_birthday_today:
-            # Create or get birthday notification for self
-            notification, created = Notification.objects.get_or_create(
-                tenant=request.user.tenant,
-                type=Notification.NotificationType.BIRTHDAY,
-                title=f"Happy Birthday {user_profile.first_name}!",
-                expires_at=now() + timedelta(days=1),
-                defaults={
-                    'message': f"Happy birthday, {user_profile.first_name}!!! Have a great year ahead! 🎉🎉🎉",
-                    'created_at': now(),
-                    'is_active': True,
-                }
-            )
-            if notification.id not in dismissed_ids:
-                context['notification_bar_items'].insert(0, notification)
-            context['birthday_self'] = True
-
-        if birthday_others_qs.exists():
-            # Create or get birthday notification for others
-            celebrant_names = ", ".join(
-                f"{p.first_name} {p.last_name}" for p in birthday_others_qs
-            )
-            notification, created = Notification.objects.get_or_create(
-                tenant=request.user.tenant,
-                type=Notification.NotificationType.BIRTHDAY,
-                title="Today's Birthdays",
-                expires_at=now() + timedelta(days=1),
-                defaults={
-                    'message': f"It's {celebrant_names}'s birthday today! Wish them a happy birthday!",
-                    'created_at': now(),
-                    'is_active': True,
-                }
-            )
-            if notification.id not in dismissed_ids:
-                context['notification_bar_items'].insert(0, notification)
-            context['birthday_others'] = list(birthday_others_qs)
-
-    else:
-        context['notification_bar_items'] = [n for n in notifications if n.is_visible()]
+    if _tenant_mismatch(request):
+        logger.error(f"Unauthorized access by user {request.user.username}: tenant mismatch")
+        return context
 
+    log_event("notifications.bar", path=request.path, user=request.user.username)
+    # Nothing is queried until a template reads one of these values
+    payload = get_request_payload(request)
+    context['notification_bar_items'] = SimpleLazyObject(lambda: payload.bar_items)
+    context['birthday_self'] = SimpleLazyObject(lambda: payload.birthday_self)
+    context['birthday_others'] = SimpleLazyObject(lambda: payload.birthday_others)
     return context
-
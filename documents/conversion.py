@@ -0,0 +1,284 @@
+# DOCX -> PDF conversion through a pool of warm headless LibreOffice workers
+#
+# Usage:
+#     from documents.conversion import convert, ConversionError
+#     pdf_path = convert(docx_path, outdir)
+#
+# Each worker owns one soffice process, started once with its own user profile and
+# listening on a local UNO socket, so a conversion no longer pays soffice's cold
+# start. A worker serves one conversion at a time; callers wait for a free worker.
+# A conversion that exceeds DOC_CONVERSION_TIMEOUT kills the worker's soffice, and
+# a dead soffice is restarted before the worker is used again.
+#
+# UNO needs LibreOffice's Python bindings ("uno", e.g. the python3-uno package),
+# importable from the interpreter running Django; the Dockerfile links them in when
+# they load. Without them the pool falls back to one `soffice --convert-to` run per
+# document, still with a persistent per-worker profile (which skips profile
+# creation) and the same timeout and concurrency limits. A worker whose UNO soffice
+# cannot be started falls back the same way. The conversion.pool_started and
+# conversion.uno_unavailable events say which mode a process runs in.
+
+import atexit
+import logging
+import os
+import platform
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from tenants.observability import log_event
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+    from com.sun.star.connection import NoConnectException
+except Exception:  # Not installed, or built for another Python
+    uno = None
+
+
+class ConversionError(Exception):
+    pass
+
+
+def find_soffice():
+    configured = getattr(settings, 'LIBREOFFICE_PATH', None)
+    if configured:
+        return configured
+    if platform.system() == "Windows":
+        paths = [
+            r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
+            r"C:\Program Files\LibreOffice\program\soffice.exe"
+        ]
+        return next((p for p in paths if os.path.exists(p)), None)
+    return shutil.which("soffice") or shutil.which("libreoffice")
+
+
+def _free_port():
+    # Every process (e.g. each gunicorn worker) runs its own pool, so ports are picked, not configured
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _properties(**values):
+    properties = []
+    for name, value in values.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        properties.append(prop)
+    return tuple(properties)
+
+
+class SofficeWorker:
+    """One headless soffice process. Not thread-safe: the pool hands it to one caller at a time."""
+
+    def __init__(self, index, soffice_path):
+        self.index = index
+        self.soffice_path = soffice_path
+        self.port = None
+        self.profile_dir = os.path.join(tempfile.gettempdir(), f"raadaa_soffice_{os.getpid()}_{index}")
+        self.process = None
+        self.desktop = None
+        self.conversions = 0
+        self.use_uno = uno is not None
+
+    @property
+    def profile_url(self):
+        return "file:///" + self.profile_dir.replace(os.sep, "/").lstrip("/")
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        if not self.use_uno:
+            return  # Fallback mode: soffice is launched per conversion
+        self.port = _free_port()
+        self.process = subprocess.Popen(
+            [
+                self.soffice_path, "--headless", "--invisible", "--nologo", "--norestore", "--nodefault",
+                f"-env:UserInstallation={self.profile_url}",
+                f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        deadline = time.monotonic() + getattr(settings, 'DOC_CONVERSION_START_TIMEOUT', 30)
+        while True:
+            try:
+                context = resolver.resolve(
+                    f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+                )
+                break
+            except NoConnectException:
+                if not self.is_alive() or time.monotonic() > deadline:
+                    self.stop()
+                    raise ConversionError(f"LibreOffice worker {self.index} failed to start")
+                time.sleep(0.25)
+        self.desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+        log_event("conversion.worker_started", level=logging.INFO, worker=self.index, pid=self.process.pid)
+
+    def stop(self):
+        self.desktop = None
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    def restart(self):
+        log_event("conversion.worker_restart", level=logging.WARNING, worker=self.index)
+        self.stop()
+        self.start()
+
+    def convert(self, docx_path, pdf_path, timeout):
+        if self.use_uno and not self.is_alive():
+            self._restart_or_fall_back()
+        if self.use_uno:
+            self._convert_uno(docx_path, pdf_path, timeout)
+        else:
+            self._convert_subprocess(docx_path, pdf_path, timeout)
+        self.conversions += 1
+
+    def _restart_or_fall_back(self):
+        # A UNO soffice that cannot be started (broken bindings, no bridge) leaves
+        # this worker on `soffice --convert-to` for the rest of the process
+        try:
+            self.restart()
+        except Exception as e:
+            self.stop()
+            self.use_uno = False
+            log_event("conversion.uno_unavailable", level=logging.ERROR, worker=self.index, error=str(e))
+
+    def _convert_uno(self, docx_path, pdf_path, timeout):
+        result = {}
+
+        def run():
+            try:
+                document = self.desktop.loadComponentFromURL(
+                    uno.systemPathToFileUrl(docx_path), "_blank", 0, _properties(Hidden=True, ReadOnly=True)
+                )
+                try:
+                    document.storeToURL(uno.systemPathToFileUrl(pdf_path), _properties(FilterName="writer_pdf_Export"))
+                finally:
+                    document.close(True)
+            except Exception as e:
+                result['error'] = e
+
+        # UNO calls cannot be interrupted; run in a thread and kill soffice if it hangs
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(timeout)
+        if thread.is_alive():
+            self.stop()
+            thread.join(5)
+            raise ConversionError(f"Conversion timed out after {timeout}s")
+        if 'error' in result:
+            if not self.is_alive():
+                self.stop()  # Crashed mid-conversion; restarted on next use
+            raise ConversionError(str(result['error']))
+
+    def _convert_subprocess(self, docx_path, pdf_path, timeout):
+        outdir = os.path.dirname(pdf_path)
+        try:
+            subprocess.run(
+                [
+                    self.soffice_path, "--headless", "--norestore", f"-env:UserInstallation={self.profile_url}",
+                    "--convert-to", "pdf", "--outdir", outdir, docx_path,
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                check=True,
+                timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            raise ConversionError(f"Conversion timed out after {timeout}s")
+        except subprocess.CalledProcessError as e:
+            raise ConversionError(e.stderr.decode(errors='replace'))
+        # --convert-to always names the output after the input
+        produced = os.path.join(outdir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+        if produced != pdf_path and os.path.exists(produced):
+            os.replace(produced, pdf_path)
+
+
+class ConversionPool:
+    def __init__(self, size=None, soffice_path=None):
+        self.size = size or getattr(settings, 'DOC_CONVERSION_WORKERS', 2)
+        self.soffice_path = soffice_path or find_soffice()
+        if not self.soffice_path:
+            raise ConversionError("LibreOffice not found. Make sure it's installed and in PATH.")
+        self.workers = [SofficeWorker(i, self.soffice_path) for i in range(self.size)]
+        self._free = queue.Queue()
+        for worker in self.workers:
+            self._free.put(worker)
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if not self._started:
+                for worker in self.workers:
+                    try:
+                        worker.start()
+                    except Exception:
+                        # Retried by the worker's first conversion, which falls back if it fails again
+                        worker.stop()
+                        log_event("conversion.worker_start_failed", level=logging.ERROR, worker=worker.index)
+                self._started = True
+                log_event("conversion.pool_started", level=logging.INFO if uno else logging.WARNING,
+                          mode="uno" if uno else "convert-to", workers=self.size)
+
+    def shutdown(self):
+        for worker in self.workers:
+            worker.stop()
+
+    def convert(self, docx_path, outdir=None, timeout=None, wait=None):
+        """Convert `docx_path` to PDF in `outdir` (default: next to it). Returns the PDF path."""
+        timeout = timeout or getattr(settings, 'DOC_CONVERSION_TIMEOUT', 60)
+        wait = wait or getattr(settings, 'DOC_CONVERSION_QUEUE_TIMEOUT', 120)
+        docx_path = os.path.abspath(docx_path)
+        outdir = os.path.abspath(outdir or os.path.dirname(docx_path))
+        os.makedirs(outdir, exist_ok=True)
+        pdf_path = os.path.join(outdir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+
+        self.start()
+        try:
+            worker = self._free.get(timeout=wait)
+        except queue.Empty:
+            raise ConversionError("All document converters are busy, try again shortly")
+        started = time.monotonic()
+        try:
+            worker.convert(docx_path, pdf_path, timeout)
+        finally:
+            self._free.put(worker)
+        if not os.path.exists(pdf_path):
+            raise ConversionError("PDF file was not generated.")
+        log_event("conversion.done", worker=worker.index, ms=round((time.monotonic() - started) * 1000))
+        return pdf_path
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConversionPool()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def convert(docx_path, outdir=None, timeout=None):
+    """Convert a .docx to PDF with the process-wide pool. Returns the PDF path; raises ConversionError."""
+    return get_pool().convert(docx_path, outdir, timeout)
@@ -1,7 +1,14 @@
 from django_cron import CronJobBase, Schedule
-from datetime import date, timedelta
+from datetime import timedelta
 from django.utils.timezone import now
-from documents.models import StaffProfile, Notification, Event
+from documents.birthdays import generate_birthday_notifications
+from documents.campaigns import process_campaigns
+from documents.doc_jobs import process_document_jobs
+from documents.extraction import process_pending
+from documents.models import Event
+from documents.notifications import process_pending_fanouts
+from documents.outbox import process_outbox
+from documents.overdue import sweep_overdue_tasks
 
 class BirthdayNotificationCronJob(CronJobBase):
     RUN_AT_TIMES = ['00:00']  # 12 AM daily
@@ -10,25 +17,74 @@ class BirthdayNotificationCronJob(CronJobBase):
     code = 'documents.birthday_notification_cron'  # unique identifier
 
     def do(self):
-        today = date.today()
-        month = today.month
-        day = today.day
-
-        birthdays = StaffProfile.objects.filter(
-            date_of_birth__month=month,
-            date_of_birth__day=day
-        )
-
-        for staff in birthdays:
-            title = f"It's {staff.full_name}'s Birthday Today! 🎉"
-            if not Notification.objects.filter(title=title, type='birthday', created_at__date=today).exists():
-                Notification.objects.create(
-                    title=title,
-                    type='birthday',
-                    message='Wish them a happy birthday!',
-                    is_active=True,
-                    expires_at=now() + timedelta(hours=24)
-                )
+        # One grouped batch for all tenants; idempotent, so a re-run the same day is harmless
+        generate_birthday_notifications()
+
+
+class NotificationFanoutCronJob(CronJobBase):
+    RUN_EVERY_MINS = 1
+
+    schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
+    code = 'documents.notification_fanout_cron'
+
+    def do(self):
+        # Large notify_users() calls deferred from the request path
+        process_pending_fanouts()
+
+
+class MailOutboxCronJob(CronJobBase):
+    RUN_EVERY_MINS = 1
+
+    schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
+    code = 'documents.mail_outbox_cron'
+
+    def do(self):
+        # Fallback delivery when the run_mail_worker process is not running
+        process_outbox()
+
+
+class MailCampaignCronJob(CronJobBase):
+    RUN_EVERY_MINS = 1
+
+    schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
+    code = 'documents.mail_campaign_cron'
+
+    def do(self):
+        # Runs for at most MAIL_CAMPAIGN_TIME_BUDGET seconds, then resumes next run
+        process_campaigns()
+
+
+class DocumentJobCronJob(CronJobBase):
+    RUN_EVERY_MINS = 1
+
+    schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
+    code = 'documents.document_job_cron'
+
+    def do(self):
+        # Fallback generation when the run_document_worker process is not running
+        process_document_jobs()
+
+
+class ContentExtractionCronJob(CronJobBase):
+    RUN_EVERY_MINS = 1
+
+    schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
+    code = 'documents.content_extraction_cron'
+
+    def do(self):
+        # Fallback when the extract_document_text process is not running
+        process_pending()
+
+
+class OverdueTaskCronJob(CronJobBase):
+    RUN_EVERY_MINS = 60
+
+    schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
+    code = 'documents.overdue_task_cron'
+
+    def do(self):
+        # Replaces the UPDATE task_list used to run on every page view
+        sweep_overdue_tasks()
 
 
 class EventReminderCronJob(CronJobBase):
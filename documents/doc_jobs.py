@@ -0,0 +1,183 @@
+# Background generation of template documents (approval letters, SLAs)
+#
+# create_document saves the Document row, queues a DocumentJob and redirects; the
+# slow part (placeholder filling, DOCX -> PDF conversion, File rows, the BDM
+# approval request) runs here. Jobs are picked up by the run_document_worker
+# command (long-running, keeps its LibreOffice pool warm) or DocumentJobCronJob.
+# Several workers can run side by side: each job is claimed with a conditional
+# UPDATE. The document list polls document_job_status until the job is final.
+#
+# Every step checks what an earlier attempt already produced, so a retried job
+# does not regenerate the .docx or file a second copy.
+
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from tenants.observability import log_event
+
+from .conversion import ConversionError, convert
+from .models import CustomUser, DocumentJob, File, Folder
+from .placeholders import render_template
+from .viewfuncs.documents_path import upload_to_documents_pdf, upload_to_documents_word
+from .viewfuncs.send_mails import send_approval_request
+
+# A job left "running" this long belongs to a worker that died mid-conversion
+STALE_LOCK = timedelta(minutes=10)
+
+TEMPLATE_DIR = os.path.join(settings.BASE_DIR, "documents/templates/docx_templates")
+
+
+def enqueue_document_job(document, source='template'):
+    """Queue generation/conversion of a saved Document. Returns the DocumentJob."""
+    job = DocumentJob.objects.create(
+        tenant=document.tenant,
+        document=document,
+        created_by=document.created_by,
+        source=source,
+    )
+    log_event("document_job.queued", level=logging.INFO, job_id=job.id, document_id=document.id, source=source)
+    return job
+
+
+def document_dirs(document):
+    """Absolute-or-media (word_dir, pdf_dir) for a document, created if missing."""
+    if settings.DEBUG:
+        word_dir = os.path.join(settings.MEDIA_ROOT, upload_to_documents_word(document))
+        pdf_dir = os.path.join(settings.MEDIA_ROOT, upload_to_documents_pdf(document))
+    else:
+        word_dir = f"{settings.MEDIA_URL}{upload_to_documents_word(document).rstrip('/')}/"
+        pdf_dir = f"{settings.MEDIA_URL}{upload_to_documents_pdf(document).rstrip('/')}/"
+    os.makedirs(word_dir, exist_ok=True)
+    os.makedirs(pdf_dir, exist_ok=True)
+    return word_dir, pdf_dir
+
+
+def _fill_template(document, word_path):
+    template_filename = "Approval Letter Template.docx" if document.document_type == "approval" else "SLA Template.docx"
+    template_path = os.path.join(TEMPLATE_DIR, template_filename)
+    if not os.path.exists(template_path):
+        raise FileNotFoundError(f"Template not found at {template_path}")
+
+    # Compiled once per template file; {{Date}} is filled in by render_template
+    render_template(template_path, {
+        "{{Company Name}}": document.company_name,
+        "{{Company Address}}": document.company_address,
+        "{{Contact Person Name}}": document.contact_person_name,
+        "{{Contact Person Email}}": document.contact_person_email,
+        "{{Contact Person Designation}}": document.contact_person_designation + ",",
+        "{{Sales Rep}}": document.sales_rep,
+    }, document.document_type, word_path)
+
+
+def _file_copy(job, folder, name, path):
+    File.objects.get_or_create(
+        tenant=job.tenant,
+        folder=folder,
+        file=path,
+        defaults={'original_name': name, 'uploaded_by': job.created_by},
+    )
+
+
+def _request_approval(job):
+    document = job.document
+    bdm_emails = list(CustomUser.objects.filter(
+        tenant=document.tenant, roles__name="BDM"
+    ).values_list("email", flat=True))
+    if not bdm_emails:
+        return ''
+
+    sender = job.created_by
+    if not sender.email_address or not sender.email_password:
+        return "Approval request not sent: your email credentials are missing. Contact admin."
+    send_approval_request(document, sender.email_provider, sender.email_address, sender.email_password, bdm_emails, sender)
+    return ''
+
+
+def run_document_job(job):
+    """Generate and convert the job's document. Returns a note for the user ('' when nothing to report)."""
+    document = job.document
+    folder, _ = Folder.objects.get_or_create(
+        tenant=job.tenant,
+        name="Template Document",
+        defaults={'created_by': job.created_by, 'is_public': True},
+    )
+    word_dir, pdf_dir = document_dirs(document)
+    base_filename = f"{document.company_name}_{document.id}"
+
+    word_filename = f"{base_filename}.docx"
+    word_path = os.path.join(word_dir, word_filename)
+    relative_word_path = os.path.join(upload_to_documents_word(document), word_filename)
+    if job.source == 'template' and not (document.word_file and os.path.exists(word_path)):
+        _fill_template(document, word_path)
+        document.word_file = relative_word_path
+        document.save(update_fields=['word_file'])
+    _file_copy(job, folder, word_filename, relative_word_path)
+
+    pdf_filename = f"{base_filename}.pdf"
+    if settings.DEBUG:
+        relative_pdf_path = os.path.join(upload_to_documents_pdf(document), pdf_filename)
+        absolute_pdf_path = os.path.join(settings.MEDIA_ROOT, relative_pdf_path)
+    else:
+        relative_pdf_path = f"{settings.MEDIA_URL}{upload_to_documents_pdf(document).rstrip('/')}/{pdf_filename}"
+        absolute_pdf_path = f"{settings.MEDIA_URL}{relative_pdf_path.rstrip('/')}/"
+    if not document.pdf_file:
+        convert(word_path, os.path.dirname(os.path.abspath(absolute_pdf_path)))
+        if not os.path.exists(absolute_pdf_path):
+            raise ConversionError("PDF file was not generated.")
+        document.pdf_file = relative_pdf_path
+        document.save(update_fields=['pdf_file'])
+    _file_copy(job, folder, pdf_filename, relative_pdf_path)
+
+    return _request_approval(job)
+
+
+def _claim(limit):
+    current = timezone.now()
+    due = DocumentJob.objects.filter(
+        Q(status='queued', next_attempt_at__lte=current) |
+        Q(status='running', locked_at__lt=current - STALE_LOCK)
+    ).order_by('next_attempt_at').values_list('id', flat=True)[:limit]
+
+    for job_id in list(due):
+        won = DocumentJob.objects.filter(id=job_id).filter(
+            Q(status='queued') | Q(status='running', locked_at__lt=current - STALE_LOCK)
+        ).update(status='running', locked_at=current)
+        if won:
+            yield DocumentJob.objects.select_related('document__tenant', 'created_by', 'tenant').get(id=job_id)
+
+
+def process_document_jobs(limit=20):
+    """Run due jobs. Returns (done, failed_attempts)."""
+    max_attempts = getattr(settings, 'DOC_JOB_MAX_ATTEMPTS', 3)
+    done = failed = 0
+    for job in _claim(limit):
+        job.attempts += 1
+        job.started_at = job.started_at or timezone.now()
+        try:
+            job.error = run_document_job(job)
+        except Exception as e:
+            failed += 1
+            job.error = str(e)
+            # A missing template or broken .docx will not fix itself; only conversion is retried
+            if isinstance(e, ConversionError) and job.attempts < max_attempts:
+                job.status = 'queued'
+                job.next_attempt_at = timezone.now() + timedelta(seconds=30 * job.attempts)
+            else:
+                job.status = 'failed'
+                job.finished_at = timezone.now()
+            log_event("document_job.failed", level=logging.WARNING, exc_info=not isinstance(e, ConversionError),
+                      job_id=job.id, document_id=job.document_id, attempts=job.attempts, final=job.status == 'failed')
+        else:
+            done += 1
+            job.status = 'done'
+            job.finished_at = timezone.now()
+            log_event("document_job.done", level=logging.INFO, job_id=job.id, document_id=job.document_id,
+                      ms=round((job.finished_at - job.started_at).total_seconds() * 1000))
+        job.locked_at = None
+        job.save(update_fields=['status', 'attempts', 'next_attempt_at', 'locked_at', 'error', 'started_at', 'finished_at'])
+    return done, failed
@@ -0,0 +1,340 @@
+# Streaming CSV/XLSX exports of staff, contacts, tasks, payroll and vacancy applications
+#
+# An Exporter names a queryset scoped to the requesting user and its columns.
+# Rows are read with .iterator() in chunks of EXPORT_CHUNK_SIZE; many-to-many
+# columns (a profile's teams, a task's assignees) are resolved with one query
+# per chunk over the through table instead of one per row. The writers turn
+# rows into bytes as they go, so a StreamingHttpResponse sends a 50k-row
+# export without holding it in memory:
+#
+#     exporter = exports.EXPORTERS["contacts"]
+#     exports.response(exporter, exporter.queryset_for(request.user, request.GET), "xlsx")
+#
+# XLSX is written with zipfile (no spreadsheet library): one worksheet of
+# inline strings and numbers, deflated while it streams.
+
+import csv
+import io
+import re
+import zipfile
+from collections import defaultdict, namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Contact, Payment, Payroll, StaffProfile, Task, VacancyApplication
+from .viewfuncs.rba_decorators import is_admin, is_hr
+
+Column = namedtuple("Column", "header value")  # value(obj, related) -> cell
+
+
+class Many:
+    """A many-to-many column source: `label` of the related objects, per exported object."""
+
+    def __init__(self, field_name, label):
+        self.field_name = field_name
+        self.label = label
+
+    def resolve(self, model, ids):
+        field = model._meta.get_field(self.field_name)
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        pairs = field.remote_field.through.objects.filter(**{f"{source}_id__in": ids}).order_by(
+            f"{target}__{self.label}").values_list(f"{source}_id", f"{target}__{self.label}")
+        labels = defaultdict(list)
+        for object_id, label in pairs:
+            labels[object_id].append(label)
+        return labels
+
+
+class Exporter:
+    def __init__(self, name, queryset, columns, many=None, filters=None, ids_field="pk", allowed=None):
+        self.name = name
+        self.queryset = queryset  # queryset(user) -> the rows `user` may export
+        self.columns = columns
+        self.many = many or {}
+        self.filters = filters or {}  # request parameter -> lookup
+        self.ids_field = ids_field  # lookup the `ids` parameter selects rows by
+        self.allowed = allowed or (lambda user: True)
+
+    def queryset_for(self, user, params):
+        """queryset(user) narrowed by the request parameters. Raises ValueError/ValidationError on bad values."""
+        queryset = self.queryset(user)
+        ids = params.getlist("ids")
+        if ids:
+            queryset = queryset.filter(**{f"{self.ids_field}__in": ids})
+        for param, lookup in self.filters.items():
+            if params.get(param):
+                queryset = queryset.filter(**{lookup: params[param]})
+        return queryset
+
+    def rows(self, queryset):
+        """The header row, then one row per object."""
+        yield [column.header for column in self.columns]
+        chunk_size = getattr(settings, "EXPORT_CHUNK_SIZE", 2000)
+        objects = queryset.iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(objects, chunk_size))
+            if not chunk:
+                return
+            ids = [obj.pk for obj in chunk]
+            related = {name: many.resolve(queryset.model, ids) for name, many in self.many.items()}
+            for obj in chunk:
+                yield [column.value(obj, related) for column in self.columns]
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    if isinstance(value, datetime):
+        return (timezone.localtime(value) if timezone.is_aware(value) else value).strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def write_csv(rows, batch_size=500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_text(value) for value in row])
+        if count % batch_size == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+class _Sink:
+    """Write-only, unseekable file for zipfile; drain() hands out what was written since the last call."""
+
+    def __init__(self):
+        self._parts = []
+        self._offset = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+_XML_ILLEGAL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_XLSX_CELL_MAX = 32767
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_workbook(sheet_name):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name={quoteattr(sheet_name[:31])} sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    text = _XML_ILLEGAL.sub("", _text(value))[:_XLSX_CELL_MAX]
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def write_xlsx(rows, sheet_name="Export", batch_size=500):
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr("xl/workbook.xml", _xlsx_workbook(sheet_name))
+        with archive.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            for count, row in enumerate(rows, 1):
+                sheet.write(f"<row>{''.join(_xlsx_cell(value) for value in row)}</row>".encode())
+                if count % batch_size == 0:
+                    yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+WRITERS = {
+    "csv": ("text/csv", lambda exporter, rows: write_csv(rows)),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+             lambda exporter, rows: write_xlsx(rows, sheet_name=exporter.name.replace("_", " ").title())),
+}
+
+
+def response(exporter, queryset, fmt="csv", filename=None):
+    content_type, write = WRITERS[fmt]
+    streaming = StreamingHttpResponse(write(exporter, exporter.rows(queryset)), content_type=content_type)
+    streaming["Content-Disposition"] = f'attachment; filename="{filename or f"{exporter.name}_export.{fmt}"}"'
+    return streaming
+
+
+def _or_na(value):
+    return value or "N/A"
+
+
+def _names(related, name, obj):
+    return ", ".join(related[name].get(obj.pk, ()))
+
+
+def _staff(user):
+    return StaffProfile.objects.filter(user__tenant=user.tenant).select_related("department").only(
+        "first_name", "middle_name", "last_name", "phone_number", "email", "sex", "designation", "department__name",
+    ).order_by("first_name", "last_name", "id")
+
+
+def _contacts(user):
+    # Same rule as contact_list: public contacts of the user's department, and the user's own
+    return Contact.objects.filter(tenant=user.tenant).filter(
+        Q(department=user.department, is_public=True) | Q(created_by=user)
+    ).select_related("department", "team", "created_by").only(
+        "name", "email", "phone", "organization", "designation", "priority", "is_public", "created_at",
+        "department__name", "team__name", "created_by__username",
+    ).order_by("name", "id")
+
+
+def _tasks(user):
+    # Same rule as task_list: tasks assigned to or created by the user
+    mine = Task.objects.filter(Q(assigned_to=user) | Q(created_by=user)).values("id")
+    return Task.objects.filter(tenant=user.tenant, id__in=mine).select_related("created_by").only(
+        "title", "status", "due_date", "created_at", "completed_at", "created_by__username",
+    ).order_by("-created_at", "id")
+
+
+def _payments(user):
+    return Payment.objects.filter(tenant=user.tenant).select_related("payee", "payroll").order_by("-payment_date", "id")
+
+
+def _payrolls(user):
+    return Payroll.objects.filter(tenant=user.tenant).select_related("created_by").only(
+        "period_start", "period_end", "status", "total_amount", "notes", "created_at", "created_by__username",
+    ).annotate(payment_count=Count("payments")).order_by("-period_start", "id")
+
+
+def _vacancy_applications(user):
+    return VacancyApplication.objects.filter(tenant=user.tenant).select_related("vacancy").only(
+        "first_name", "middle_name", "last_name", "email", "phone", "country", "city", "status", "created_at",
+        "vacancy__title",
+    ).order_by("-created_at", "id")
+
+
+def _period(start, end):
+    return f"{_text(start)} to {_text(end)}" if start and end else ""
+
+
+EXPORTERS = {exporter.name: exporter for exporter in [
+    Exporter("staff", _staff, [
+        Column("Name", lambda p, r: f"{p.first_name} {p.middle_name or ''} {p.last_name}".strip()),
+        Column("Phone Number", lambda p, r: _or_na(p.phone_number)),
+        Column("Email", lambda p, r: _or_na(p.email)),
+        Column("Sex", lambda p, r: _or_na(p.sex)),
+        Column("Designation", lambda p, r: _or_na(p.designation)),
+        Column("Department", lambda p, r: p.department.name if p.department else "N/A"),
+        Column("Team", lambda p, r: _or_na(_names(r, "team", p))),
+    ], many={"team": Many("team", "name")}, filters={"dept": "department_id"}, ids_field="user_id"),
+    Exporter("contacts", _contacts, [
+        Column("Name", lambda c, r: c.name),
+        Column("Email", lambda c, r: c.email),
+        Column("Phone", lambda c, r: c.phone),
+        Column("Organization", lambda c, r: c.organization),
+        Column("Designation", lambda c, r: c.designation),
+        Column("Priority", lambda c, r: c.get_priority_display()),
+        Column("Department", lambda c, r: c.department.name if c.department else ""),
+        Column("Team", lambda c, r: c.team.name if c.team else ""),
+        Column("Public", lambda c, r: c.is_public),
+        Column("Created By", lambda c, r: c.created_by.username),
+        Column("Created At", lambda c, r: c.created_at),
+    ], filters={"priority": "priority"}),
+    Exporter("tasks", _tasks, [
+        Column("Title", lambda t, r: t.title),
+        Column("Status", lambda t, r: t.get_status_display()),
+        Column("Due Date", lambda t, r: t.due_date),
+        Column("Assigned To", lambda t, r: _names(r, "assigned_to", t)),
+        Column("Created By", lambda t, r: t.created_by.username),
+        Column("Created At", lambda t, r: t.created_at),
+        Column("Completed At", lambda t, r: t.completed_at),
+    ], many={"assigned_to": Many("assigned_to", "username")}, filters={"status": "status"}),
+    Exporter("payments", _payments, [
+        Column("Payee", lambda p, r: p.payee.name),
+        Column("Payee Type", lambda p, r: p.payee.get_payee_type_display()),
+        Column("Amount", lambda p, r: p.amount),
+        Column("Tax Deductions", lambda p, r: p.tax_deductions),
+        Column("Net Amount", lambda p, r: p.net_amount),
+        Column("Status", lambda p, r: p.get_status_display()),
+        Column("Payment Method", lambda p, r: p.payment_method),
+        Column("Transaction ID", lambda p, r: p.transaction_id),
+        Column("Period", lambda p, r: _period(p.payroll_period_start, p.payroll_period_end)),
+        Column("Payroll", lambda p, r: _period(p.payroll.period_start, p.payroll.period_end) if p.payroll else ""),
+        Column("Payment Date", lambda p, r: p.payment_date),
+    ], filters={"payroll": "payroll_id", "status": "status"}, allowed=is_admin),
+    Exporter("payrolls", _payrolls, [
+        Column("Period Start", lambda p, r: p.period_start),
+        Column("Period End", lambda p, r: p.period_end),
+        Column("Status", lambda p, r: p.get_status_display()),
+        Column("Total Amount", lambda p, r: p.total_amount),
+        Column("Payments", lambda p, r: p.payment_count),
+        Column("Notes", lambda p, r: p.notes),
+        Column("Created By", lambda p, r: p.created_by.username if p.created_by else ""),
+        Column("Created At", lambda p, r: p.created_at),
+    ], filters={"status": "status"}, allowed=is_admin),
+    Exporter("vacancy_applications", _vacancy_applications, [
+        Column("Vacancy", lambda a, r: a.vacancy.title),
+        Column("First Name", lambda a, r: a.first_name),
+        Column("Middle Name", lambda a, r: a.middle_name),
+        Column("Last Name", lambda a, r: a.last_name),
+        Column("Email", lambda a, r: a.email),
+        Column("Phone", lambda a, r: a.phone),
+        Column("Country", lambda a, r: a.country.name if a.country else ""),
+        Column("City", lambda a, r: a.city),
+        Column("Status", lambda a, r: a.get_status_display() if a.status else ""),
+        Column("Applied At", lambda a, r: a.created_at),
+    ], filters={"vacancy": "vacancy_id", "status": "status"}, allowed=is_hr),
+]}
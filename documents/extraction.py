@@ -0,0 +1,173 @@
+# Text extraction of uploaded documents into the search index
+#
+# SearchEntry rows of uploaded files (File, StaffDocument, CompanyDocument,
+# which includes the .docx/.pdf copies doc_jobs.py files for generated
+# documents) name their file in `source`. An entry is due while `source`
+# differs from `content_source`, the file its body came from, so uploads,
+# replacements and deletions are picked up incrementally. For each due entry
+# the file is read once and:
+#   - its SHA-256 equals the entry's content_hash (re-saved, not changed): only
+#     content_source moves on
+#   - another entry of the tenant has text for the same hash (a copy of the
+#     same upload): that body is reused
+#   - otherwise the text is extracted: .docx with docx2txt, falling back to
+#     mammoth and then python-docx; .pdf with pypdf; plain-text formats decoded
+# Files that are too large, of an unknown format or fail to parse get an empty
+# body and are not retried until they change. PDFs need pypdf: without it they
+# are left due, not emptied, and get extracted once it is installed.
+#
+# Runs off the request path: the extract_document_text command (long-running)
+# or ContentExtractionCronJob.
+
+import hashlib
+import io
+import logging
+import os
+from collections import Counter
+
+import docx
+import docx2txt
+import mammoth
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import F
+
+from tenants.observability import log_event
+
+from .models import SearchEntry
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+    log_event("extraction.pdf_unavailable", level=logging.WARNING, reason="pypdf is not installed; PDFs stay due")
+
+TEXT_EXTENSIONS = {'.txt', '.csv', '.md', '.json', '.xml', '.html', '.htm', '.rtf'}
+
+
+def _docx2txt(stream):
+    return docx2txt.process(stream)
+
+
+def _mammoth(stream):
+    return mammoth.extract_raw_text(stream).value
+
+
+def _python_docx(stream):
+    document = docx.Document(stream)
+    parts = [paragraph.text for paragraph in document.paragraphs]
+    for table in document.tables:
+        for row in table.rows:
+            parts.extend(cell.text for cell in row.cells)
+    return '\n'.join(parts)
+
+
+def _docx_text(data):
+    error = None
+    for extract in (_docx2txt, _mammoth, _python_docx):
+        try:
+            text = extract(io.BytesIO(data))
+        except Exception as e:  # Each library chokes on different malformed files
+            error = e
+            continue
+        if text and text.strip():
+            return text
+    if error is not None:
+        raise error
+    return ''
+
+
+def _pdf_text(data):
+    reader = PdfReader(io.BytesIO(data))
+    return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+
+def extract_text(name, data):
+    """Plain text of the file `name` with contents `data`; '' for formats we don't read."""
+    extension = os.path.splitext(name)[1].lower()
+    if extension == '.docx':
+        return _docx_text(data)
+    if extension == '.pdf':
+        return _pdf_text(data)
+    if extension in TEXT_EXTENSIONS:
+        return data.decode('utf-8', errors='replace')
+    return ''
+
+
+def _body(text):
+    return ' '.join(text.split()).lower()[:getattr(settings, 'SEARCH_BODY_MAX_CHARS', 200000)]
+
+
+def _read(source):
+    max_bytes = getattr(settings, 'SEARCH_EXTRACT_MAX_BYTES', 25 * 1024 * 1024)
+    if default_storage.size(source) > max_bytes:
+        return None
+    with default_storage.open(source, 'rb') as f:
+        return f.read()
+
+
+def _store(entry, **fields):
+    # Only if the file did not change again meanwhile; a newer source stays due
+    return SearchEntry.objects.filter(pk=entry.pk, source=entry.source).update(content_source=entry.source, **fields)
+
+
+def extract_entry(entry):
+    """Bring the body of one due entry up to date. Returns what happened, for the counters."""
+    if not entry.source:
+        _store(entry, body='', content_hash='')
+        return 'cleared'
+    if _waits_for_reader(entry.source):
+        return 'waiting'  # Still due; extracted once pypdf is installed
+    try:
+        data = _read(entry.source)
+    except (OSError, ValueError) as e:
+        # Missing from storage; retried once the file changes
+        log_event("extraction.missing", level=logging.WARNING, entry_id=entry.pk, source=entry.source, error=str(e))
+        _store(entry, body='', content_hash='')
+        return 'failed'
+    if data is None:
+        _store(entry, body='', content_hash='')
+        return 'skipped'
+
+    content_hash = hashlib.sha256(data).hexdigest()
+    if content_hash == entry.content_hash:
+        _store(entry)
+        return 'unchanged'
+    known = SearchEntry.objects.filter(tenant_id=entry.tenant_id, content_hash=content_hash).exclude(
+        pk=entry.pk).exclude(content_source='').values_list('body', flat=True).first()
+    if known is not None:
+        _store(entry, body=known, content_hash=content_hash)
+        return 'reused'
+
+    try:
+        text = extract_text(entry.source, data)
+    except Exception as e:
+        log_event("extraction.failed", level=logging.WARNING, entry_id=entry.pk, source=entry.source, error=str(e))
+        _store(entry, body='', content_hash=content_hash)
+        return 'failed'
+    _store(entry, body=_body(text), content_hash=content_hash)
+    return 'extracted'
+
+
+def _waits_for_reader(source):
+    return PdfReader is None and source.lower().endswith('.pdf')
+
+
+def due_entries():
+    entries = SearchEntry.objects.exclude(source=F('content_source'))
+    if PdfReader is None:
+        # Otherwise waiting PDFs would fill every batch
+        entries = entries.exclude(source__iendswith='.pdf')
+    return entries
+
+
+def process_pending(limit=None):
+    """Extract up to `limit` due entries (default SEARCH_EXTRACT_BATCH_SIZE). Returns a Counter of outcomes."""
+    limit = limit or getattr(settings, 'SEARCH_EXTRACT_BATCH_SIZE', 50)
+    outcomes = Counter()
+    entries = due_entries().order_by('id').only('id', 'tenant_id', 'source', 'content_hash')[:limit]
+    for entry in entries:
+        outcomes[extract_entry(entry)] += 1
+    if outcomes:
+        log_event("extraction.batch", level=logging.INFO, **outcomes)
+    return outcomes
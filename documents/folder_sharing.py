@@ -0,0 +1,96 @@
+# Recursive folder sharing with set-based updates
+#
+# Sharing a folder writes the folder itself and then, with one UPDATE per
+# table, every folder below it (share_subfolders) and every file in the shared
+# folders (share_files). Rows shared that way point at the folder they inherit
+# from through shared_via, so:
+#   - unsharing the folder clears exactly what it shared (one UPDATE per table)
+#     and leaves rows shared directly, or by another folder, alone
+#   - a folder moved out of the shared subtree drops the inherited share of
+#     its subtree without touching anything else (detach)
+#   - a folder created or moved below a folder that shares its subfolders
+#     picks up that share, with the same shared_via (inherit)
+#
+# The descendant set comes from one recursive query (folder_tree.load), so a
+# share costs the same handful of queries however deep the folder is. It is
+# not the cached tree: that may predate folders created through another worker,
+# which a recursive share would then silently leave out.
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import folder_tree
+from .models import File, Folder
+
+_CLEARED = dict(is_shared=False, shared_via=None)
+
+
+def _subtree_ids(folder):
+    tree = folder_tree.load(folder.tenant_id)
+    if folder.id not in tree:
+        return [folder.id]
+    return [folder.id, *tree.descendant_ids(folder.id)]
+
+
+@transaction.atomic
+def share(folder, user, end=None, subfolders=False, files=False):
+    """Share `folder` directly and, as requested, everything below it."""
+    now = timezone.now()
+    Folder.objects.filter(pk=folder.pk).update(
+        is_shared=True, shared_via=None, share_time=now, share_time_end=end, shared_by=user,
+        share_subfolders=subfolders, share_files=files,
+    )
+    # Drop what an earlier share of this folder granted; the options may have changed
+    unshare_inherited(folder)
+
+    fields = dict(is_shared=True, shared_via=folder, share_time=now, share_time_end=end, shared_by=user)
+    # Rows that are already shared some other way keep that share
+    free = Q(is_shared=False) | Q(shared_via=folder)
+    folder_ids = [folder.id]
+    if subfolders:
+        folder_ids = _subtree_ids(folder)
+        Folder.objects.filter(free, id__in=folder_ids[1:], tenant_id=folder.tenant_id).update(
+            share_subfolders=subfolders, share_files=files, **fields
+        )
+    if files:
+        File.objects.filter(free, folder_id__in=folder_ids, tenant_id=folder.tenant_id).update(**fields)
+
+
+@transaction.atomic
+def unshare(folder):
+    """Stop sharing `folder` and everything it shared."""
+    Folder.objects.filter(pk=folder.pk).update(**_CLEARED)
+    unshare_inherited(folder)
+
+
+def unshare_inherited(folder):
+    Folder.objects.filter(shared_via=folder).update(**_CLEARED)
+    File.objects.filter(shared_via=folder).update(**_CLEARED)
+
+
+def detach(folder):
+    """Drop shares the subtree of `folder` inherited from folders outside it (after a move)."""
+    ids = _subtree_ids(folder)
+    outside = Q(shared_via__isnull=False) & ~Q(shared_via_id__in=ids)
+    Folder.objects.filter(outside, id__in=ids).update(**_CLEARED)
+    File.objects.filter(outside, folder_id__in=ids).update(**_CLEARED)
+
+
+def inherit(folder):
+    """Extend the share of the parent of `folder` to its subtree (after a create or move)."""
+    parent = folder.parent
+    if not (parent and parent.is_shared and parent.share_subfolders):
+        return
+    fields = dict(is_shared=True, shared_via_id=parent.shared_via_id or parent.id, share_time=parent.share_time,
+                  share_time_end=parent.share_time_end, shared_by_id=parent.shared_by_id)
+    ids = _subtree_ids(folder)
+    Folder.objects.filter(is_shared=False, id__in=ids, tenant_id=folder.tenant_id).update(
+        share_subfolders=True, share_files=parent.share_files, **fields
+    )
+    if parent.share_files:
+        File.objects.filter(is_shared=False, folder_id__in=ids, tenant_id=folder.tenant_id).update(**fields)
+
+
+def is_expired(shared, now=None):
+    return bool(shared.share_time_end and shared.share_time_end < (now or timezone.now()))
@@ -0,0 +1,170 @@
+# Folder trees loaded in one query
+#
+# load(tenant_id) walks every folder of a tenant from its root folders with a
+# recursive CTE, joined to per-folder file counts and sizes, and indexes the
+# result so that lookups afterwards don't touch the database:
+#
+#     tree = folder_tree.get_tree(tenant.id)     # cached per tenant, for pages
+#     tree = folder_tree.load(tenant.id)         # fresh, for moves and shares
+#     tree.breadcrumbs(folder.id)                # [root node, ..., folder node]
+#     tree.descendant_ids(folder.id)             # every folder below it
+#     tree.subtree_file_count(folder.id), tree.subtree_size(folder.id)
+#
+# The cached tree is dropped by the Folder/File signals in signals.py. It only
+# holds structure (parent, name, owner, visibility) and file totals, so
+# QuerySet.update() of share flags doesn't need to invalidate it. Unless
+# FOLDER_TREE_CACHE_ALIAS is a shared backend, the drop only reaches the worker
+# that saved; others serve their copy until FOLDER_TREE_CACHE_TTL. So writes
+# that depend on the structure (cycle checks, recursive shares) use load(),
+# and pages pass the folders they just read to get_tree(), which reloads a
+# tree that is missing one of them.
+
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+from .models import File, Folder
+
+
+@dataclass
+class FolderNode:
+    id: int
+    parent_id: int
+    name: str
+    is_public: bool
+    created_by_id: int
+    depth: int
+    file_count: int
+    file_size: int
+    children: list = field(default_factory=list)
+
+
+class FolderTree:
+    def __init__(self, tenant_id, rows):
+        self.tenant_id = tenant_id
+        self.nodes = {}
+        for row in rows:
+            node = FolderNode(*row)
+            self.nodes[node.id] = node
+        self.roots = []
+        for node in self.nodes.values():
+            parent = self.nodes.get(node.parent_id)
+            (parent.children if parent else self.roots).append(node.id)
+
+        # Pre-order walk: a folder's descendants are the slice between its entry and exit
+        self._order = []
+        self._span = {}
+        self._path = {}
+        self._totals = {}
+        for root_id in self.roots:
+            self._walk(root_id)
+
+    def _walk(self, root_id):
+        stack = [(root_id, False)]
+        while stack:
+            folder_id, done = stack.pop()
+            node = self.nodes[folder_id]
+            if done:
+                start = self._span[folder_id][0]
+                self._span[folder_id] = (start, len(self._order))
+                count, size = node.file_count, node.file_size
+                for child_id in node.children:
+                    child_count, child_size = self._totals[child_id]
+                    count, size = count + child_count, size + child_size
+                self._totals[folder_id] = (count, size)
+                continue
+            parent_path = self._path.get(node.parent_id, ())
+            self._path[folder_id] = parent_path + (folder_id,)
+            self._span[folder_id] = (len(self._order), None)
+            self._order.append(folder_id)
+            stack.append((folder_id, True))
+            stack.extend((child_id, False) for child_id in reversed(node.children))
+
+    def __contains__(self, folder_id):
+        return folder_id in self.nodes
+
+    def get(self, folder_id):
+        return self.nodes.get(folder_id)
+
+    def breadcrumbs(self, folder_id):
+        """Nodes from the root folder down to `folder_id` (inclusive)."""
+        return [self.nodes[i] for i in self._path.get(folder_id, ())]
+
+    def descendant_ids(self, folder_id):
+        """Ids of every folder below `folder_id`, in pre-order."""
+        start, end = self._span[folder_id]
+        return self._order[start + 1:end]
+
+    def is_descendant(self, folder_id, ancestor_id):
+        return ancestor_id in self._path.get(folder_id, ())[:-1]
+
+    def subtree_file_count(self, folder_id):
+        return self._totals[folder_id][0]
+
+    def subtree_size(self, folder_id):
+        return self._totals[folder_id][1]
+
+    def folders(self, is_public=None):
+        """All nodes in pre-order, optionally only public or only personal ones."""
+        return [self.nodes[i] for i in self._order if is_public is None or self.nodes[i].is_public == is_public]
+
+
+def load(tenant_id):
+    """Build the FolderTree of a tenant with one query."""
+    qn = connection.ops.quote_name
+    folder_table, file_table = qn(Folder._meta.db_table), qn(File._meta.db_table)
+    sql = f"""
+        WITH RECURSIVE tree (id, depth) AS (
+            SELECT id, 0 FROM {folder_table} WHERE tenant_id = %s AND parent_id IS NULL
+            UNION ALL
+            SELECT child.id, tree.depth + 1
+            FROM {folder_table} child JOIN tree ON child.parent_id = tree.id
+            WHERE child.tenant_id = %s
+        )
+        SELECT folder.id, folder.parent_id, folder.name, folder.is_public, folder.created_by_id, tree.depth,
+               COALESCE(files.file_count, 0), COALESCE(files.file_size, 0)
+        FROM tree
+        JOIN {folder_table} folder ON folder.id = tree.id
+        LEFT JOIN (
+            SELECT folder_id, COUNT(*) AS file_count, SUM(COALESCE(size, 0)) AS file_size
+            FROM {file_table} WHERE tenant_id = %s AND folder_id IS NOT NULL GROUP BY folder_id
+        ) files ON files.folder_id = tree.id
+        ORDER BY tree.depth, folder.name, folder.id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [tenant_id, tenant_id, tenant_id])
+        rows = [(*row[:3], bool(row[3]), *row[4:]) for row in cursor.fetchall()]
+    return FolderTree(tenant_id, rows)
+
+
+def _cache():
+    return caches[getattr(settings, 'FOLDER_TREE_CACHE_ALIAS', 'default')]
+
+
+def _key(tenant_id):
+    return f"folder_tree:{tenant_id}"
+
+
+def _is_current(tree, folder):
+    node = tree.get(folder.id)
+    return node is not None and node.parent_id == folder.parent_id and node.name == folder.name
+
+
+def get_tree(tenant_id, current=()):
+    """
+    load(tenant_id), cached until a folder or file of the tenant changes (or FOLDER_TREE_CACHE_TTL).
+    `current` are Folder instances just read from the database; a cached tree that lacks one of them
+    or has it under another parent or name is reloaded.
+    """
+    cache = _cache()
+    tree = cache.get(_key(tenant_id))
+    if tree is None or not all(_is_current(tree, folder) for folder in current if folder is not None):
+        tree = load(tenant_id)
+        cache.set(_key(tenant_id), tree, getattr(settings, 'FOLDER_TREE_CACHE_TTL', 300))
+    return tree
+
+
+def invalidate(tenant_id):
+    _cache().delete(_key(tenant_id))
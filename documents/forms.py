@@ -277,6 +277,21 @@ class EditUserForm(forms.ModelForm):
             self.fields['department'].queryset = Department.objects.none()
             self.fields['teams'].queryset = Team.objects.none()
 
+class BulkImportForm(forms.Form):
+    KIND_CHOICES = [('users', 'Users (with staff profiles)'), ('contacts', 'Contacts')]
+
+    kind = forms.ChoiceField(choices=KIND_CHOICES, widget=forms.Select(attrs={'class': 'form-control'}))
+    file = forms.FileField(help_text="A .csv or .xlsx file; the first row holds the column names",
+                           widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'}))
+    dry_run = forms.BooleanField(required=False, label="Only check the file",
+                                 widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}))
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        if not upload.name.lower().endswith(('.csv', '.xlsx')):
+            raise ValidationError("Upload a .csv or .xlsx file.")
+        return upload
+
 class ForgotPasswordForm(forms.Form):
     email = forms.EmailField(label='Email', max_length=254)
 
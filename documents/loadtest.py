@@ -0,0 +1,294 @@
+# Load-testing dataset and view benchmarks.
+#
+#     python manage.py seed_loadtest --tenants 3 --scale 1
+#     python manage.py benchmark_views --output before.json
+#     ... change code ...
+#     python manage.py benchmark_views --output after.json --compare before.json
+#
+# Seeded tenants have slugs "<prefix>-1", "<prefix>-2", ...; rows are written
+# with bulk_create, so the Task rollup is rebuilt once at the end instead of by
+# the Task signals.
+
+import os
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, reset_queries, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from tenants.models import Tenant
+
+from . import search, task_stats
+from .models import (CustomUser, Department, Event, EventParticipant, File, Folder, Notification, Role, StaffProfile,
+                     Task, Team, UserNotification, Vacancy, VacancyApplication)
+
+PASSWORD = 'loadtest'
+
+# Rows per tenant at --scale 1
+SIZES = {
+    'users': 50,
+    'departments': 5,
+    'teams': 10,
+    'tasks': 2000,
+    'folders': 200,
+    'files': 1000,
+    'notifications': 100,
+    'events': 50,
+    'vacancies': 5,
+    'applications': 200,
+}
+
+FIRST_NAMES = ['Ada', 'Bola', 'Chidi', 'Dayo', 'Emeka', 'Funmi', 'Gbenga', 'Halima', 'Ife', 'Jide', 'Kemi', 'Lola',
+               'Musa', 'Ngozi', 'Ola', 'Tunde', 'Uche', 'Yemi', 'Zainab']
+LAST_NAMES = ['Adeyemi', 'Bello', 'Chukwu', 'Danjuma', 'Eze', 'Fashola', 'Ibrahim', 'Okafor', 'Okonkwo', 'Sanni', 'Usman']
+WORDS = ['quarterly', 'report', 'client', 'invoice', 'review', 'contract', 'onboarding', 'budget', 'audit', 'proposal',
+         'meeting', 'training', 'policy', 'sales', 'vendor', 'project', 'renewal', 'support', 'migration', 'plan']
+
+
+def _words(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n)).capitalize()
+
+
+def _scaled(scale):
+    return {name: max(1, int(size * scale)) for name, size in SIZES.items()}
+
+
+def seed_tenant(slug, scale=1.0, rng=None):
+    """Create one tenant with SIZES * scale rows of each kind. Returns {kind: rows created}."""
+    rng = rng or random.Random(slug)
+    sizes = _scaled(scale)
+    now = timezone.now()
+    today = timezone.localdate()
+    password = make_password(PASSWORD)  # Hashed once; every seeded user shares it
+    counts = {}
+
+    tenant = Tenant.objects.create(name=f"Load test {slug}", slug=slug, is_verified=True, subscription_status='active')
+
+    users = CustomUser.objects.bulk_create([
+        CustomUser(username=f"{slug}-user{i}", password=password, tenant=tenant, email=f"user{i}@{slug}.example.com",
+                   first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES))
+        for i in range(sizes['users'])
+    ])
+    counts['users'] = len(users)
+    admin, hods = users[0], users[1:1 + sizes['departments']]
+
+    departments = Department.objects.bulk_create([
+        Department(tenant=tenant, name=f"Department {i}", hod=hods[i % len(hods)] if hods else None)
+        for i in range(sizes['departments'])
+    ])
+    teams = Team.objects.bulk_create([
+        Team(tenant=tenant, name=f"Team {i}", department=departments[i % len(departments)])
+        for i in range(sizes['teams'])
+    ])
+    counts['departments'], counts['teams'] = len(departments), len(teams)
+
+    for user in users:
+        user.department = rng.choice(departments)
+    CustomUser.objects.bulk_update(users, ['department'])
+    CustomUser.teams.through.objects.bulk_create([
+        CustomUser.teams.through(customuser_id=user.id, team_id=rng.choice(teams).id) for user in users
+    ])
+    admin.roles.add(Role.objects.get_or_create(name='Admin')[0])
+    hod_role = Role.objects.get_or_create(name='HOD')[0]
+    for hod in hods:
+        hod.roles.add(hod_role)
+
+    StaffProfile.objects.bulk_create([
+        StaffProfile(tenant=tenant, user=user, first_name=user.first_name, last_name=user.last_name, email=user.email,
+                     department=user.department, designation=_words(rng, 2),
+                     date_of_birth=today - timedelta(days=rng.randint(20 * 365, 60 * 365)))
+        for user in users
+    ])
+
+    statuses = [status for status, _ in Task.STATUS_CHOICES]
+    tasks = []
+    for i in range(sizes['tasks']):
+        status = rng.choices(statuses, weights=[30, 25, 30, 5, 7, 3])[0]
+        tasks.append(Task(
+            tenant=tenant, title=_words(rng, 4), description=_words(rng, 20), created_by=rng.choice(users),
+            status=status, due_date=today + timedelta(days=rng.randint(-60, 60)),
+            completed_at=now - timedelta(days=rng.randint(0, 365)) if status == 'completed' else None,
+        ))
+    tasks = Task.objects.bulk_create(tasks)
+    Task.assigned_to.through.objects.bulk_create([
+        Task.assigned_to.through(task_id=task.id, customuser_id=user.id)
+        for task in tasks for user in rng.sample(users, min(len(users), rng.choice([1, 1, 1, 2, 3])))
+    ])
+    counts['tasks'] = len(tasks)
+
+    # Two levels: a public and a personal root per user, the rest nested under random roots
+    folders = Folder.objects.bulk_create([
+        Folder(tenant=tenant, name=f"{kind} {user.username}", created_by=user, is_public=kind == 'Public')
+        for user in users for kind in ('Public', 'Personal')
+    ])
+    folders += Folder.objects.bulk_create([
+        Folder(tenant=tenant, name=_words(rng, 2), parent=parent, created_by=parent.created_by, is_public=parent.is_public)
+        for parent in rng.choices(folders, k=max(0, sizes['folders'] - len(folders)))
+    ])
+    files = File.objects.bulk_create([
+        File(tenant=tenant, folder=folder, uploaded_by=folder.created_by, is_public=folder.is_public,
+             original_name=f"{_words(rng, 2)}.pdf", file=f"loadtest/{slug}/{i}.pdf")
+        for i, folder in enumerate(rng.choices(folders, k=sizes['files']))
+    ])
+    counts['folders'], counts['files'] = len(folders), len(files)
+
+    notification_types = [value for value, _ in Notification.NotificationType.choices]
+    notifications = Notification.objects.bulk_create([
+        Notification(tenant=tenant, title=_words(rng, 3), message=_words(rng, 15), type=rng.choice(notification_types),
+                     is_active=rng.random() < 0.7)
+        for _ in range(sizes['notifications'])
+    ])
+    UserNotification.objects.bulk_create([
+        UserNotification(tenant=tenant, user=user, notification=notification, dismissed=rng.random() < 0.5)
+        for notification in notifications for user in users
+    ], batch_size=1000)
+    counts['notifications'] = len(notifications)
+
+    events = []
+    for _ in range(sizes['events']):
+        start = now + timedelta(days=rng.randint(-30, 30), hours=rng.randint(8, 17))
+        events.append(Event(tenant=tenant, title=_words(rng, 3), description=_words(rng, 10), created_by=rng.choice(users),
+                            start_time=start, end_time=start + timedelta(hours=1)))
+    events = Event.objects.bulk_create(events)
+    EventParticipant.objects.bulk_create([
+        EventParticipant(tenant=tenant, event=event, user=user, response=rng.choice(['pending', 'accepted', 'declined']))
+        for event in events for user in rng.sample(users, min(len(users), 5))
+    ])
+    counts['events'] = len(events)
+
+    vacancies = Vacancy.objects.bulk_create([
+        Vacancy(tenant=tenant, title=_words(rng, 2), description=_words(rng, 30), created_by=admin, city='Lagos',
+                work_mode=rng.choice(['remote', 'onsite', 'hybrid']))
+        for _ in range(sizes['vacancies'])
+    ])
+    VacancyApplication.objects.bulk_create([
+        VacancyApplication(tenant=tenant, vacancy=vacancy, first_name=rng.choice(FIRST_NAMES),
+                           last_name=rng.choice(LAST_NAMES), phone='08000000000', email=f"applicant{i}@example.com",
+                           cv=f"loadtest/{slug}/cv{i}.pdf", status=rng.choice([None, 'accepted', 'rejected']))
+        for i, vacancy in enumerate(rng.choices(vacancies, k=sizes['applications']))
+    ], batch_size=1000)
+    counts['vacancy applications'] = sizes['applications']
+    return tenant, counts
+
+
+def seed(tenant_count, scale=1.0, prefix='loadtest', seed=0):
+    """Create `tenant_count` tenants and rebuild their Task rollup and search index. Returns {slug: counts}."""
+    rng = random.Random(seed)
+    created = {}
+    with transaction.atomic():
+        for i in range(1, tenant_count + 1):
+            tenant, counts = seed_tenant(f"{prefix}-{i}", scale, rng)
+            created[tenant] = counts
+        task_stats.rebuild([tenant.id for tenant in created])
+        search.rebuild([tenant.id for tenant in created])
+    return {tenant.slug: counts for tenant, counts in created.items()}
+
+
+def seeded_tenants(prefix='loadtest'):
+    return Tenant.objects.filter(slug__startswith=f"{prefix}-").order_by('id')
+
+
+def benchmark_users(tenant):
+    """The users each benchmarked view is requested as: {'user', 'admin', 'hod'}."""
+    users = CustomUser.objects.filter(tenant=tenant)
+    return {
+        'user': users.filter(roles__isnull=True).order_by('id').first(),
+        'admin': users.filter(roles__name='Admin').order_by('id').first(),
+        'hod': users.filter(roles__name='HOD', hod__isnull=False).order_by('id').first(),
+    }
+
+
+def superuser(prefix='loadtest'):
+    user, created = CustomUser.objects.get_or_create(
+        username=f"{prefix}-root", defaults={'is_superuser': True, 'is_staff': True}
+    )
+    if created:
+        user.set_password(PASSWORD)
+        user.save()
+    return user
+
+
+# (URL name, who requests it, tenant host or main domain)
+BENCHMARK_VIEWS = [
+    ('task_list', 'user', True),
+    ('folder_view', 'user', True),
+    ('staff_directory', 'admin', True),
+    ('hod_performance_dashboard', 'hod', True),
+    ('notifications', 'user', True),
+    ('superuser_dashboard', 'superuser', False),
+]
+
+
+def _host(tenant=None):
+    domain = settings.MAIN_DOMAIN.split('://')[-1].split(':')[0]
+    return f"{tenant.slug}.{domain}" if tenant else domain
+
+
+def measure(client, url, host, repeat):
+    """
+    Request `url` once to warm caches, then `repeat` timed runs, then one run
+    under tracemalloc for peak memory (kept out of the timed runs: it slows them).
+    """
+    client.get(url, HTTP_HOST=host)
+    timings = []
+    for _ in range(repeat):
+        reset_queries()  # With DEBUG on, a full queries_log would make the capture empty
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(url, HTTP_HOST=host)
+            timings.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    try:
+        client.get(url, HTTP_HOST=host)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'status': response.status_code,
+        'queries': len(queries),
+        'sql_ms': round(sum(float(q['time']) for q in queries.captured_queries) * 1000, 1),
+        'wall_ms': round(statistics.median(timings), 1),
+        'wall_ms_min': round(min(timings), 1),
+        'peak_memory_kb': round(peak / 1024),
+    }
+
+
+def run_benchmarks(tenant, repeat=5, views=None):
+    """Drive BENCHMARK_VIEWS for `tenant` with the test client. Returns the JSON-ready report."""
+    users = benchmark_users(tenant)
+    users['superuser'] = superuser(tenant.slug.rsplit('-', 1)[0])
+    results = {}
+    for name, role, on_tenant in BENCHMARK_VIEWS:
+        if views and name not in views:
+            continue
+        if users[role] is None:
+            results[name] = {'skipped': f"no {role} user in {tenant.slug}"}
+            continue
+        client = Client()
+        client.force_login(users[role])
+        results[name] = measure(client, reverse(name), _host(tenant if on_tenant else None), repeat)
+    return {
+        'commit': _git_commit(),
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'tenant': tenant.slug,
+        'repeat': repeat,
+        'views': results,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return os.getenv('GIT_COMMIT')
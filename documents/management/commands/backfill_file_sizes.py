@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from documents.models import File
+
+
+class Command(BaseCommand):
+    help = "Fill File.size from storage for files uploaded before sizes were recorded"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        updated = missing = 0
+        last_id = 0
+        while True:
+            batch = list(File.objects.filter(size__isnull=True, id__gt=last_id).order_by("id")[:options["batch_size"]])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            for file in batch:
+                try:
+                    file.size = file.file.size
+                except (OSError, ValueError):
+                    missing += 1
+            File.objects.bulk_update([f for f in batch if f.size is not None], ["size"])
+            updated += sum(1 for f in batch if f.size is not None)
+        self.stdout.write(f"Recorded {updated} file sizes; {missing} files missing from storage")
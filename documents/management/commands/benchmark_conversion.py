@@ -0,0 +1,102 @@
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from documents import conversion
+from documents.conversion import ConversionPool, find_soffice
+from documents.placeholders import render_template
+
+
+class Command(BaseCommand):
+    help = "Convert generated SLA documents to PDF and compare the warm LibreOffice pool with one soffice run per document"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=100, help="SLA documents converted by the pool")
+        parser.add_argument("--workers", type=int, default=getattr(settings, "DOC_CONVERSION_WORKERS", 2))
+        parser.add_argument("--cold", type=int, default=5, help="Documents converted the old way for comparison (0 to skip)")
+        parser.add_argument("--keep", action="store_true", help="Keep the generated files")
+
+    def handle(self, *args, **options):
+        soffice = find_soffice()
+        if not soffice:
+            self.stdout.write(self.style.ERROR("LibreOffice not found. Make sure it's installed and in PATH."))
+            return
+
+        workdir = tempfile.mkdtemp(prefix="raadaa_conversion_bench_")
+        try:
+            paths = self.generate(workdir, max(options["count"], options["cold"]))
+            if options["cold"]:
+                self.run_cold(soffice, paths[:options["cold"]], os.path.join(workdir, "cold"))
+            self.run_pool(soffice, paths[:options["count"]], os.path.join(workdir, "pool"), options["workers"])
+        finally:
+            if options["keep"]:
+                self.stdout.write(f"Files kept in {workdir}")
+            else:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    def generate(self, workdir, count):
+        template_path = os.path.join(settings.BASE_DIR, "documents/templates/docx_templates", "SLA Template.docx")
+        paths = []
+        for i in range(count):
+            path = os.path.join(workdir, f"sla_{i}.docx")
+            render_template(template_path, {
+                "{{Company Name}}": f"Benchmark Company {i}",
+                "{{Company Address}}": f"{i} Benchmark Street, Lagos",
+                "{{Contact Person Name}}": f"Contact {i}",
+                "{{Contact Person Email}}": f"contact{i}@example.com",
+                "{{Contact Person Designation}}": "Director,",
+                "{{Sales Rep}}": "bench",
+            }, "sla", path)
+            paths.append(path)
+        return paths
+
+    def report(self, label, timings, elapsed):
+        p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) >= 2 else timings[0]
+        self.stdout.write(
+            f"{label:<28} docs={len(timings)} total={elapsed:.1f}s throughput={len(timings) / elapsed:.2f} docs/s "
+            f"p50={statistics.median(timings):.0f}ms p95={p95:.0f}ms"
+        )
+
+    def run_cold(self, soffice, paths, outdir):
+        # What create_document used to do: a fresh soffice per document, serially, in the request
+        os.makedirs(outdir, exist_ok=True)
+        timings = []
+        started = time.perf_counter()
+        for path in paths:
+            t = time.perf_counter()
+            subprocess.run(
+                [soffice, "--headless", "--convert-to", "pdf", "--outdir", outdir, path],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True, timeout=120,
+            )
+            timings.append((time.perf_counter() - t) * 1000)
+        self.report("before (soffice per doc)", timings, time.perf_counter() - started)
+
+    def run_pool(self, soffice, paths, outdir, workers):
+        pool = ConversionPool(size=workers, soffice_path=soffice)
+        try:
+            t = time.perf_counter()
+            pool.start()
+            mode = "UNO" if conversion.uno else "subprocess fallback, no UNO bindings"
+            self.stdout.write(f"pool warm-up ({workers} workers, {mode}): {time.perf_counter() - t:.1f}s")
+
+            def timed(path):
+                t = time.perf_counter()
+                pool.convert(path, outdir)
+                return (time.perf_counter() - t) * 1000
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                timings = list(executor.map(timed, paths))
+            self.report(f"after (pool of {workers})", timings, time.perf_counter() - started)
+            idle = sum(1 for worker in pool.workers if worker.conversions == 0)
+            if idle:
+                self.stdout.write(self.style.WARNING(f"{idle} worker(s) converted nothing"))
+        finally:
+            pool.shutdown()
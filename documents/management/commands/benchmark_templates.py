@@ -0,0 +1,59 @@
+import io
+import os
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from docx import Document as DocxDocument
+
+from documents.placeholders import render_template, replace_placeholders, template_cache
+
+
+class Command(BaseCommand):
+    help = "Render template documents in memory: replace_placeholders on a freshly opened template vs the compiled template cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=1000)
+        parser.add_argument("--template", default="SLA Template.docx", help="File in documents/templates/docx_templates")
+        parser.add_argument("--baseline", type=int, default=100, help="Documents rendered the old way (0 to skip)")
+
+    def handle(self, *args, **options):
+        template_path = os.path.join(settings.BASE_DIR, "documents/templates/docx_templates", options["template"])
+        document_type = "approval" if options["template"].startswith("Approval") else "sla"
+
+        if options["baseline"]:
+            def old_way(replacements):
+                doc = replace_placeholders(DocxDocument(template_path), replacements, document_type)
+                doc.save(io.BytesIO())
+
+            self.run("before (parse + scan per doc)", old_way, options["baseline"])
+
+        template_cache.clear()
+        t = time.perf_counter()
+        compiled = template_cache.get(template_path)
+        self.stdout.write(f"compile: {(time.perf_counter() - t) * 1000:.0f}ms, placeholders: {', '.join(compiled.placeholders)}")
+        self.run("after (compiled template)",
+                 lambda replacements: render_template(template_path, replacements, document_type, io.BytesIO()),
+                 options["count"])
+
+    def run(self, label, render, count):
+        timings = []
+        started = time.perf_counter()
+        for i in range(count):
+            t = time.perf_counter()
+            render({
+                "{{Company Name}}": f"Benchmark Company {i}",
+                "{{Company Address}}": f"{i} Benchmark Street, Lagos",
+                "{{Contact Person Name}}": f"Contact {i}",
+                "{{Contact Person Email}}": f"contact{i}@example.com",
+                "{{Contact Person Designation}}": "Director,",
+                "{{Sales Rep}}": "bench",
+            })
+            timings.append((time.perf_counter() - t) * 1000)
+        elapsed = time.perf_counter() - started
+        p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) >= 2 else timings[0]
+        self.stdout.write(
+            f"{label:<30} docs={count} total={elapsed:.1f}s throughput={count / elapsed:.1f} docs/s "
+            f"p50={statistics.median(timings):.1f}ms p95={p95:.1f}ms"
+        )
@@ -0,0 +1,54 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.loadtest import BENCHMARK_VIEWS, run_benchmarks, seeded_tenants
+from tenants.models import Tenant
+
+
+class Command(BaseCommand):
+    help = "Request the main views with the test client against a seeded tenant and report query counts, wall time and peak memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tenant", help="Tenant slug (default: the first seed_loadtest tenant)")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed requests per view")
+        parser.add_argument("--view", action="append", choices=[name for name, _, _ in BENCHMARK_VIEWS],
+                            help="Only this view; repeat for several")
+        parser.add_argument("--output", help="Write the JSON report to this file")
+        parser.add_argument("--compare", help="A previous JSON report to compare against")
+
+    def handle(self, *args, **options):
+        if options["tenant"]:
+            tenant = Tenant.objects.filter(slug=options["tenant"]).first()
+        else:
+            tenant = seeded_tenants().first()
+        if tenant is None:
+            raise CommandError("No tenant to benchmark; run seed_loadtest or pass --tenant")
+
+        report = run_benchmarks(tenant, options["repeat"], options["view"])
+        baseline = {}
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)["views"]
+
+        self.stdout.write(f"{'view':<28}{'status':>7}{'queries':>9}{'sql ms':>9}{'wall ms':>9}{'peak KB':>9}")
+        for name, result in report["views"].items():
+            if "skipped" in result:
+                self.stdout.write(f"{name:<28} skipped: {result['skipped']}")
+                continue
+            self.stdout.write(
+                f"{name:<28}{result['status']:>7}{result['queries']:>9}{result['sql_ms']:>9}"
+                f"{result['wall_ms']:>9}{result['peak_memory_kb']:>9}"
+            )
+            old = baseline.get(name)
+            if old and "skipped" not in old:
+                self.stdout.write(
+                    f"{'  vs ' + options['compare']:<35}{result['queries'] - old['queries']:>+9}"
+                    f"{result['sql_ms'] - old['sql_ms']:>+9.1f}{result['wall_ms'] - old['wall_ms']:>+9.1f}"
+                    f"{result['peak_memory_kb'] - old['peak_memory_kb']:>+9}"
+                )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
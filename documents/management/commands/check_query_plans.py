@@ -0,0 +1,78 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from documents.models import CustomUser, Email, File, Folder, Notification, StaffProfile, Task, UserNotification
+from tenants.models import Tenant
+
+# Lines of EXPLAIN output that read a whole table
+SEQ_SCAN_RE = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    # "SCAN documents_task" without "USING [COVERING] INDEX"
+    'sqlite': re.compile(r'\bSCAN (\w+)(?!.*USING (?:COVERING )?INDEX)'),
+}
+
+
+def view_queries(tenant, user, folder, today):
+    """(label, queryset) for the main tenant-scoped view queries."""
+    return [
+        ('task list (assigned)', Task.objects.filter(tenant=tenant, assigned_to=user)),
+        ('tasks by status', Task.objects.filter(tenant=tenant, status='in_progress').order_by('due_date')),
+        ('overdue sweep', Task.objects.filter(tenant=tenant, status__in=Task.OPEN_STATUSES, due_date__lt=today)),
+        ('unseen notifications', UserNotification.objects.filter(user=user, dismissed=False)),
+        ('notification bar', Notification.objects.filter(tenant=tenant, is_active=True, type='news').order_by('-created_at')),
+        ('folder files', File.objects.filter(tenant=tenant, folder=folder)),
+        ('subfolders', Folder.objects.filter(tenant=tenant, parent=folder, is_public=True)),
+        ('email drafts', Email.objects.filter(tenant=tenant, sender=user, sent=False).order_by('-created_at')),
+        ('birthdays', StaffProfile.objects.filter(tenant=tenant, date_of_birth__month=today.month, date_of_birth__day=today.day)),
+    ]
+
+
+class Command(BaseCommand):
+    help = ("EXPLAIN the main view queries for a tenant and report the ones that scan a whole table. "
+            "On PostgreSQL sequential scans are disabled for the check, so a table that is too small "
+            "to need an index is not reported; run it against a seeded dataset for realistic plans.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', required=True, help='Tenant slug')
+        parser.add_argument('--user', help='Username to query as (default: the user with most tasks)')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan')
+
+    def handle(self, *args, **options):
+        seq_scan_re = SEQ_SCAN_RE.get(connection.vendor)
+        if seq_scan_re is None:
+            raise CommandError(f"Unsupported database backend: {connection.vendor}")
+        tenant = Tenant.objects.filter(slug=options['tenant']).first()
+        if tenant is None:
+            raise CommandError("Unknown tenant slug")
+        users = CustomUser.objects.filter(tenant=tenant)
+        if options['user']:
+            user = users.filter(username=options['user']).first()
+        else:
+            user = users.annotate(n=Count('task')).order_by('-n').first()
+        if user is None:
+            raise CommandError("No such user in this tenant")
+        folder = Folder.objects.filter(tenant=tenant, parent__isnull=True).first()
+
+        problems = 0
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            for label, queryset in view_queries(tenant, user, folder, timezone.localdate()):
+                plan = queryset.explain()
+                tables = sorted(set(seq_scan_re.findall(plan)))
+                if tables:
+                    problems += 1
+                    self.stdout.write(self.style.WARNING(f"{label}: sequential scan on {', '.join(tables)}"))
+                else:
+                    self.stdout.write(f"{label}: ok")
+                if options['verbose_plans'] or tables:
+                    self.stdout.write('    ' + plan.replace('\n', '\n    '))
+
+        if problems:
+            raise CommandError(f"{problems} queries scan a whole table")
+        self.stdout.write(self.style.SUCCESS("No sequential scans"))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from documents.extraction import process_pending
+
+class Command(BaseCommand):
+    help = 'Extract the text of new or changed uploaded documents into the search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the backlog once and exit')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when nothing is due')
+        parser.add_argument('--batch-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                outcomes = process_pending(limit=options['batch_size'])
+                if outcomes:
+                    self.stdout.write(', '.join(f"{outcome} {n}" for outcome, n in sorted(outcomes.items())))
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
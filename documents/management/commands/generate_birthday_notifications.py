@@ -1,28 +1,15 @@
-from django.core.management.base import BaseCommand
-from django.utils.timezone import now
-from documents.models import StaffProfile, Notification
 from datetime import date
 
-class Command(BaseCommand):
-    help = 'Generate birthday notifications for today'
+from django.core.management.base import BaseCommand
+from documents.birthdays import generate_birthday_notifications
 
-    def handle(self, *args, **kwargs):
-        today = date.today()
-        month = today.month
-        day = today.day
+class Command(BaseCommand):
+    help = 'Generate birthday notifications for today (all tenants)'
 
-        birthdays = StaffProfile.objects.filter(
-            date_of_birth__month=month,
-            date_of_birth__day=day
-        )
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Generate for this day instead of today (YYYY-MM-DD)')
 
-        for staff in birthdays:
-            title = f"It's {staff.full_name}'s Birthday Today! 🎉"
-            if not Notification.objects.filter(title=title, type='birthday', created_at__date=today).exists():
-                Notification.objects.create(
-                    title=title,
-                    type='birthday',
-                    message='Wish them a happy birthday!',
-                    is_active=True
-                )
-                self.stdout.write(f"Notification created for {staff.user.get_full_name()}")
+    def handle(self, *args, **options):
+        day = date.fromisoformat(options['date']) if options['date'] else None
+        notifications, user_notifications = generate_birthday_notifications(day)
+        self.stdout.write(f"Created {notifications} notifications and {user_notifications} user notifications")
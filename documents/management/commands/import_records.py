@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from documents.bulk_import import IMPORTERS, import_file
+from documents.models import CustomUser
+from tenants.models import Tenant
+
+class Command(BaseCommand):
+    help = 'Import users (with staff profiles) or contacts of a tenant from a .csv or .xlsx file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument('--tenant', required=True, help='Tenant slug')
+        parser.add_argument('--user', help='Username the records are imported by (required for contacts)')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the file')
+
+    def handle(self, *args, **options):
+        tenant = Tenant.objects.filter(slug=options['tenant']).first()
+        if tenant is None:
+            raise CommandError("Unknown tenant slug")
+        user = None
+        if options['user']:
+            user = CustomUser.objects.filter(username=options['user'], tenant=tenant).first()
+            if user is None:
+                raise CommandError("Unknown user for this tenant")
+        if options['kind'] == 'contacts' and user is None:
+            raise CommandError("--user is required for contacts")
+        with open(options['path'], 'rb') as f:
+            report = import_file(options['kind'], f, tenant, user=user, dry_run=options['dry_run'])
+        for line, message in report.errors:
+            self.stderr.write(f"line {line}: {message}")
+        if report.dry_run:
+            self.stdout.write(f"Checked {report.rows} rows; {report.failed} with errors")
+        else:
+            self.stdout.write(f"Created {report.created} of {report.rows} rows; {report.failed} with errors")
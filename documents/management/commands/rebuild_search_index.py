@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from documents.search import rebuild
+from tenants.models import Tenant
+
+class Command(BaseCommand):
+    help = 'Rebuild the SearchEntry index from the source tables (all tenants, or the given ones)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', action='append', help='Tenant slug; repeat for several')
+
+    def handle(self, *args, **options):
+        tenant_ids = None
+        if options['tenant']:
+            tenant_ids = list(Tenant.objects.filter(slug__in=options['tenant']).values_list('id', flat=True))
+            if len(tenant_ids) != len(set(options['tenant'])):
+                raise CommandError("Unknown tenant slug")
+        rows = rebuild(tenant_ids)
+        self.stdout.write(f"Wrote {rows} search entries")
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from documents.campaigns import process_campaigns
+from documents.outbox import SMTPConnectionPool
+
+class Command(BaseCommand):
+    help = 'Send queued email campaigns, resuming each from its last checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run due campaigns once and exit')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when nothing is due')
+
+    def handle(self, *args, **options):
+        pool = SMTPConnectionPool()
+        try:
+            while True:
+                touched = process_campaigns(pool=pool)
+                if options['once']:
+                    break
+                if not touched:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.close_all()
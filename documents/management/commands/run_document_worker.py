@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from documents.conversion import get_pool
+from documents.doc_jobs import process_document_jobs
+
+class Command(BaseCommand):
+    help = 'Generate queued template documents, converting them with a warm LibreOffice pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--batch-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        pool = get_pool()
+        pool.start()
+        try:
+            while True:
+                done, failed = process_document_jobs(limit=options['batch_size'])
+                if done or failed:
+                    self.stdout.write(f"Generated {done}, failed {failed}")
+                if options['once']:
+                    break
+                if not (done or failed):
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.shutdown()
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from documents.outbox import SMTPConnectionPool, process_outbox
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbound emails, reusing pooled SMTP connections between batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        pool = SMTPConnectionPool()
+        try:
+            while True:
+                sent, failed = process_outbox(limit=options['batch_size'], pool=pool)
+                if sent or failed:
+                    self.stdout.write(f"Sent {sent}, failed {failed}")
+                if options['once']:
+                    break
+                if not (sent or failed):
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.close_all()
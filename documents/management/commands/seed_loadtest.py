@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.loadtest import SIZES, seed, seeded_tenants
+
+
+class Command(BaseCommand):
+    help = "Create load-testing tenants (users, departments, teams, tasks, folders, files, notifications, events, vacancy applications)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tenants", type=int, default=3)
+        parser.add_argument("--scale", type=float, default=1.0,
+                            help="Multiplier for the rows per tenant: " + ", ".join(f"{n} {k}" for k, n in SIZES.items()))
+        parser.add_argument("--prefix", default="loadtest", help="Tenant slugs are <prefix>-1, <prefix>-2, ...")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, for a reproducible dataset")
+        parser.add_argument("--reset", action="store_true", help="Delete existing <prefix>-* tenants first")
+
+    def handle(self, *args, **options):
+        existing = seeded_tenants(options["prefix"])
+        if existing.exists():
+            if not options["reset"]:
+                raise CommandError(f"{existing.count()} {options['prefix']}-* tenants already exist; use --reset to replace them")
+            for tenant in existing:
+                tenant.delete()
+        created = seed(options["tenants"], options["scale"], options["prefix"], options["seed"])
+        for slug, counts in created.items():
+            self.stdout.write(f"{slug}: " + ", ".join(f"{n} {kind}" for kind, n in counts.items()))
@@ -0,0 +1,112 @@
+# Generated by Django 4.2.21 on 2026-10-18 08:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django_countries.fields
+import documents.models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0010_alter_tenantapplication_email_and_more'),
+        ('documents', '0074_populate_share_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Vacancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('skills', models.TextField(blank=True, null=True)),
+                ('eligibility', models.TextField(blank=True, null=True)),
+                ('min_salary', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_salary', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('country', django_countries.fields.CountryField(blank=True, max_length=2, null=True)),
+                ('city', models.CharField(blank=True, max_length=255, null=True)),
+                ('work_mode', models.CharField(blank=True, choices=[('remote', 'Remote'), ('onsite', 'On-Site'), ('hybrid', 'Hybrid')], max_length=20, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('withdrawn', 'Withdrawn'), ('closed', 'Closed')], default='active', max_length=20)),
+                ('share_token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('is_shared', models.BooleanField(default=False, help_text='Share/Post this vacancy.')),
+                ('share_time', models.DateTimeField(blank=True, null=True)),
+                ('share_time_end', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        # The provider-neutral settings keep the credentials stored under the Zoho-only names
+        migrations.RenameField(
+            model_name='customuser',
+            old_name='zoho_email',
+            new_name='email_address',
+        ),
+        migrations.RenameField(
+            model_name='customuser',
+            old_name='zoho_password',
+            new_name='email_password',
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='email_address',
+            field=models.EmailField(blank=True, help_text='Email address for email provider. To enable email sending.', max_length=254, null=True),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='email_password',
+            field=models.CharField(blank=True, help_text='Password for email provider or Send Token for Zepto Mail. To enable email sending.', max_length=1000, null=True),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='email_provider',
+            field=models.CharField(blank=True, choices=[('gmail', 'Gmail'), ('yahoo', 'Yahoo'), ('outlook', 'Outlook'), ('zoho', 'Zoho'), ('icloud', 'iCloud'), ('zeptomail', 'ZeptoMail')], max_length=20, null=True),
+        ),
+        migrations.AlterField(
+            model_name='department',
+            name='hod',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='hod', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='VacancyApplication',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_name', models.CharField(max_length=255)),
+                ('last_name', models.CharField(max_length=255)),
+                ('middle_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('phone', models.CharField(max_length=20)),
+                ('email', models.EmailField(max_length=254)),
+                ('country', django_countries.fields.CountryField(blank=True, max_length=2, null=True)),
+                ('city', models.CharField(blank=True, max_length=255, null=True)),
+                ('cv', models.FileField(upload_to=documents.models.upload_to_job_cvs)),
+                ('cover_letter', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(blank=True, choices=[('accepted', 'Accepted'), ('rejected', 'Rejected')], max_length=20, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vacancy_application', to='tenants.tenant')),
+                ('vacancy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='applications', to='documents.vacancy')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='vacancy',
+            name='created_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_vacancies', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='vacancy',
+            name='shared_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='shared_vacancy', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='vacancy',
+            name='tenant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vacancy', to='tenants.tenant'),
+        ),
+        migrations.AddField(
+            model_name='vacancy',
+            name='updated_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='updated_vacancies', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.21 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0075_vacancy_and_user_email_settings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='dedupe_key',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(fields=('tenant', 'dedupe_key'), name='unique_notification_dedupe_key'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.21 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0081_taskdailystat'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'in_progress', 'on_hold'])), fields=['tenant', 'status', 'due_date'], name='task_open_due_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.21 on 2026-10-18 16:20
+
+from django.db import migrations, models
+import django.db.models.functions.datetime
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0082_task_open_due_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='email',
+            index=models.Index(fields=['tenant', 'sender', 'sent', '-created_at'], name='email_tenant_sender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['tenant', 'folder'], name='file_tenant_folder_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='folder',
+            index=models.Index(fields=['tenant', 'parent', 'is_public'], name='folder_tenant_parent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['tenant', 'is_active', 'type', '-created_at'], name='notification_tenant_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='staffprofile',
+            index=models.Index(django.db.models.functions.datetime.ExtractMonth('date_of_birth'), django.db.models.functions.datetime.ExtractDay('date_of_birth'), models.F('tenant'), name='staff_birthday_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usernotification',
+            index=models.Index(fields=['user', 'dismissed'], name='usernotif_user_dismissed_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.21 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0083_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='size',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='Bytes; set on save', null=True),
+        ),
+    ]
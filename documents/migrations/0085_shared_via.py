@@ -0,0 +1,24 @@
+# Generated by Django 4.2.21 on 2026-10-18 18:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0084_file_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='shared_via',
+            field=models.ForeignKey(blank=True, help_text='Shared folder this folder inherits its share from; empty if shared directly', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='documents.folder'),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='shared_via',
+            field=models.ForeignKey(blank=True, help_text='Shared folder this file inherits its share from; empty if shared directly', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='documents.folder'),
+        ),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 4.2.21 on 2026-10-18 19:50
+
+from django.db import migrations, models
+
+FTS_TABLE = 'documents_searchentry_fts'
+
+
+def _fts_exists(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def _fts5_available(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def _drop_fts(schema_editor):
+    for trigger in ('insert', 'delete', 'update'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS documents_searchentry_fts_{trigger}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def _recreate_fts(schema_editor, columns):
+    """Drop and recreate the SQLite FTS5 table and its triggers over `columns`, then refill it."""
+    _drop_fts(schema_editor)
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{column}' for column in columns)
+    old = ', '.join(f'old.{column}' for column in columns)
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        f"{names}, content='documents_searchentry', content_rowid='id', tokenize='trigram')"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER documents_searchentry_fts_insert AFTER INSERT ON documents_searchentry BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {names}) VALUES (new.id, {new}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER documents_searchentry_fts_delete AFTER DELETE ON documents_searchentry BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {names}) VALUES ('delete', old.id, {old}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER documents_searchentry_fts_update AFTER UPDATE ON documents_searchentry BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {names}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {names}) VALUES (new.id, {new}); END"
+    )
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def restore_fts(apps, schema_editor):
+    # Reverse only, once the body column is gone (unindex_body dropped the FTS table that reads it)
+    if schema_editor.connection.vendor == 'sqlite' and _fts5_available(schema_editor):
+        _recreate_fts(schema_editor, ['title', 'text'])
+
+
+def index_body(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX search_entry_body_trgm_idx ON documents_searchentry USING gin (body gin_trgm_ops)'
+        )
+    elif vendor == 'sqlite' and _fts_exists(schema_editor):
+        _recreate_fts(schema_editor, ['title', 'text', 'body'])
+
+
+def unindex_body(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS search_entry_body_trgm_idx')
+    elif vendor == 'sqlite':
+        # Its triggers would break dropping the body column
+        _drop_fts(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0086_searchentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_fts),
+        migrations.AlterField(
+            model_name='searchentry',
+            name='kind',
+            field=models.CharField(choices=[('person', 'Person'), ('contact', 'Contact'), ('file', 'File'), ('folder', 'Folder'), ('task', 'Task'), ('vacancy', 'Vacancy'), ('staff_document', 'Staff Document'), ('company_document', 'Company Document')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='searchentry',
+            name='source',
+            field=models.CharField(blank=True, help_text='Storage name of the file whose contents are indexed', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='searchentry',
+            name='body',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='searchentry',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='searchentry',
+            name='content_source',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AddIndex(
+            model_name='searchentry',
+            index=models.Index(fields=['tenant', 'content_hash'], name='search_entry_content_hash_idx'),
+        ),
+        # After the fields: the FTS triggers read the body column
+        migrations.RunPython(index_body, unindex_body),
+    ]
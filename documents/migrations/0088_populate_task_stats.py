@@ -0,0 +1,56 @@
+# Generated by Django 4.2.21 on 2026-10-18 21:10
+
+from django.db import migrations
+from django.db.models import BooleanField, Case, Count, DateField, ExpressionWrapper, F, Q, When
+from django.db.models.functions import TruncDate
+
+
+def _stat_day(prefix=''):
+    # Same dating as task_stats.rebuild(): completion day for completed tasks, else creation day
+    return Case(
+        When(**{f'{prefix}status': 'completed', f'{prefix}completed_at__isnull': False},
+             then=TruncDate(f'{prefix}completed_at')),
+        default=TruncDate(f'{prefix}created_at'),
+        output_field=DateField(),
+    )
+
+
+def populate_task_stats(apps, schema_editor):
+    # The dashboards read only the rollup, so it must cover the tasks that exist
+    # before the signals start counting. A copy of task_stats.rebuild() on the
+    # historical models; later changes to that module do not affect this migration.
+    Task = apps.get_model('documents', 'Task')
+    TaskDailyStat = apps.get_model('documents', 'TaskDailyStat')
+    Assignment = Task.assigned_to.through
+
+    per_tenant = Task.objects.annotate(stat_day=_stat_day()).values(
+        'tenant_id', 'stat_day', 'status'
+    ).annotate(n=Count('id')).order_by()
+    assignments = Assignment.objects.annotate(
+        stat_day=_stat_day('task__'),
+        personal=ExpressionWrapper(Q(customuser_id=F('task__created_by_id')), output_field=BooleanField()),
+    ).values('task__tenant_id', 'customuser_id', 'personal', 'stat_day', 'task__status').annotate(
+        n=Count('task_id')
+    ).order_by()
+
+    rows = [
+        TaskDailyStat(tenant_id=row['tenant_id'], day=row['stat_day'], status=row['status'], entered=row['n'])
+        for row in per_tenant
+    ] + [
+        TaskDailyStat(tenant_id=row['task__tenant_id'], user_id=row['customuser_id'], personal=bool(row['personal']),
+                      day=row['stat_day'], status=row['task__status'], entered=row['n'])
+        for row in assignments
+    ]
+    TaskDailyStat.objects.all().delete()
+    TaskDailyStat.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0087_searchentry_body'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_task_stats, reverse_code=migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.db.models import Q
+from django.db.models.functions import ExtractDay, ExtractMonth
 from django.contrib.auth.models import User
 from django.contrib.auth.models import Permission
 from django_countries.fields import CountryField
@@ -9,6 +10,7 @@ import os, json, uuid
 from django.core.exceptions import ValidationError
 from cryptography.fernet import Fernet
 from tenants.models import Tenant
+from tenants.observability import log_event
 
 # Generate or load encryption key for SMTP password
 ENCRYPTION_KEY = settings.FERNET_KEY
@@ -113,7 +115,7 @@ class CustomUser(AbstractUser):
         """Decrypt and return SMTP password or SendMail Token."""
         try:
             if self.email_password:
-                print("Encoded Password:", self.email_password)
+                log_event("smtp.password_decrypt", user_id=self.pk)
                 return cipher.decrypt(self.email_password.encode()).decode()
             return None
         except Exception as e:
@@ -154,6 +156,10 @@ class Folder(models.Model):
     share_time_end = models.DateTimeField(null=True, blank=True)
     share_subfolders = models.BooleanField(default=False, null=True, blank=True)
     share_files = models.BooleanField(default=False, null=True, blank=True)
+    shared_via = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='+', help_text="Shared folder this folder inherits its share from; empty if shared directly")
+
+    class Meta:
+        indexes = [models.Index(fields=['tenant', 'parent', 'is_public'], name='folder_tenant_parent_idx')]
 
     def get_shareable_link(self):
         from django.urls import reverse
@@ -196,6 +202,7 @@ class File(models.Model):
     anon_phone = models.CharField(max_length=20, blank=True, null=True, help_text="Phone number of uploader if anonymous")
     file = models.FileField(upload_to=upload_to_folder)
     original_name = models.CharField(max_length=255)
+    size = models.BigIntegerField(null=True, blank=True, editable=False, help_text="Bytes; set on save")
     uploaded_at = models.DateTimeField(auto_now_add=True)
     is_public = models.BooleanField(default=False)
     share_token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
@@ -203,6 +210,18 @@ class File(models.Model):
     shared_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name='shared_files')
     share_time = models.DateTimeField(null=True, blank=True)
     share_time_end = models.DateTimeField(null=True, blank=True)
+    shared_via = models.ForeignKey(Folder, null=True, blank=True, on_delete=models.SET_NULL, related_name='+', help_text="Shared folder this file inherits its share from; empty if shared directly")
+
+    class Meta:
+        indexes = [models.Index(fields=['tenant', 'folder'], name='file_tenant_folder_idx')]
+
+    def save(self, *args, **kwargs):
+        if self.file and self.size is None:
+            try:
+                self.size = self.file.size
+            except (OSError, ValueError):
+                pass  # Missing from storage; backfill_file_sizes can retry
+        super().save(*args, **kwargs)
 
     def get_uploaded_by_display(self):
         if self.uploaded_by:
@@ -218,6 +237,10 @@ class File(models.Model):
     def __str__(self):
         return self.original_name
 
+# Statuses that become 'overdue' once due_date has passed (documents/overdue.py)
+OPEN_TASK_STATUSES = ['pending', 'in_progress', 'on_hold']
+
+
 class Task(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -227,6 +250,7 @@ class Task(models.Model):
         ('overdue', 'Overdue'),
         ('cancelled', 'Cancelled'),
     ]
+    OPEN_STATUSES = OPEN_TASK_STATUSES
 
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE)
     title = models.CharField(max_length=255, help_text="Required. Title of the task")
@@ -239,10 +263,47 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Only open tasks can go overdue; keeps the sweeper's index small. Changing
+            # OPEN_TASK_STATUSES changes this condition, and makemigrations picks it up.
+            models.Index(fields=['tenant', 'status', 'due_date'], condition=Q(status__in=OPEN_TASK_STATUSES),
+                         name='task_open_due_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
 
+class TaskDailyStat(models.Model):
+    """
+    Daily rollup of task status changes, maintained by documents/task_stats.py.
+    `entered`/`left` count tasks that moved into/out of `status` that day, so
+    SUM(entered - left) over all days is the current number of tasks in `status`.
+    Rows with no user count each task once for the tenant; per-user rows count the
+    tasks assigned to that user, split by whether the user also created them.
+    """
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='task_daily_stats')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='task_daily_stats')
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Task.STATUS_CHOICES)
+    personal = models.BooleanField(default=False)  # Task created by `user` themselves
+    entered = models.IntegerField(default=0)
+    left = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'user', 'day', 'status', 'personal'],
+                                    condition=models.Q(user__isnull=False), name='unique_task_daily_stat_user'),
+            models.UniqueConstraint(fields=['tenant', 'day', 'status'],
+                                    condition=models.Q(user__isnull=True), name='unique_task_daily_stat_tenant'),
+        ]
+        indexes = [models.Index(fields=['tenant', 'user', 'status', 'day'], name='task_daily_stat_lookup_idx')]
+
+    def __str__(self):
+        return f"{self.day} {self.status}: +{self.entered} -{self.left}"
+
+
 # class Organization(models.Model):
 #     name = models.CharField(max_length=255, unique=True)
 
@@ -346,6 +407,13 @@ class StaffProfile(models.Model):
     emergency_address = models.TextField(null=True, blank=True)
     emergency_email = models.EmailField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # date_of_birth__month/__day lookups (birthday notifications); month/day first
+            # so the cross-tenant birthday job can use it as well as per-tenant queries
+            models.Index(ExtractMonth('date_of_birth'), ExtractDay('date_of_birth'), 'tenant', name='staff_birthday_idx'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.user})"
 
@@ -369,6 +437,14 @@ class Notification(models.Model):
         EVENT = 'event', 'Event'
 
     type = models.CharField(max_length=20, choices=NotificationType.choices, default=NotificationType.NEWS)
+    # Idempotency key for generated notifications (e.g. "birthday:2025-01-31:others"), unique per tenant
+    dedupe_key = models.CharField(max_length=100, null=True, blank=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'dedupe_key'], name='unique_notification_dedupe_key'),
+        ]
+        indexes = [models.Index(fields=['tenant', 'is_active', 'type', '-created_at'], name='notification_tenant_active_idx')]
 
     def is_visible(self):
         now = timezone.now()
@@ -392,6 +468,30 @@ class UserNotification(models.Model):
 
     class Meta:
         unique_together = ('user', 'notification')
+        indexes = [models.Index(fields=['user', 'dismissed'], name='usernotif_user_dismissed_idx')]
+
+
+class NotificationFanout(models.Model):
+    """A large notify_users() call deferred to the NotificationFanoutCronJob worker."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name="notification_fanouts")
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name="fanouts")
+    user_ids = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'], name='notif_fanout_status_idx')]
+
+    def __str__(self):
+        return f"Fan-out of {self.notification_id} to {len(self.user_ids)} users ({self.status})"
 
 
 def upload_to_staff_documents(instance, filename):
@@ -512,6 +612,9 @@ class Email(models.Model):
     sent = models.BooleanField(default=False)
     sent_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['tenant', 'sender', 'sent', '-created_at'], name='email_tenant_sender_idx')]
+
     def set_to_emails(self, emails):
         """Helper to store list of emails as JSON."""
         self.to_emails = json.dumps(emails)
@@ -547,7 +650,133 @@ class Attachment(models.Model):
 
     def __str__(self):
         return self.file.name
-    
+
+
+class OutboundEmail(models.Model):
+    """Outbox row: queued by documents/outbox.py:enqueue_email, delivered by the mail worker."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, null=True, blank=True, related_name='outbound_emails')
+    email = models.ForeignKey(Email, on_delete=models.SET_NULL, null=True, blank=True, related_name='deliveries')  # Marked sent on delivery
+    kind = models.CharField(max_length=50, blank=True)
+    smtp_provider = models.CharField(max_length=20)
+    from_email = models.EmailField()
+    smtp_password = models.CharField(max_length=1000, blank=True)  # Encrypted; cleared once the row is final
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html = models.BooleanField(default=False)
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list, blank=True)
+    bcc = models.JSONField(default=list, blank=True)
+    attachments = models.JSONField(default=list, blank=True)  # File paths
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_due_idx')]
+
+    def set_smtp_password(self, password):
+        self.smtp_password = cipher.encrypt(password.encode()).decode() if password else ''
+
+    def get_smtp_password(self):
+        return cipher.decrypt(self.smtp_password.encode()).decode() if self.smtp_password else None
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+
+class EmailCampaign(models.Model):
+    """
+    Personalized mass mailing of an Email draft to every Contact or StaffProfile of a tenant.
+    Sent in batches by documents/campaigns.py; last_recipient_id is the resume checkpoint.
+    """
+    AUDIENCE_CHOICES = [
+        ('contacts', 'Contacts'),
+        ('staff', 'Staff'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='email_campaigns')
+    email = models.ForeignKey(Email, on_delete=models.CASCADE, related_name='campaigns')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='email_campaigns')
+    audience = models.CharField(max_length=10, choices=AUDIENCE_CHOICES)
+    smtp_provider = models.CharField(max_length=20)
+    from_email = models.EmailField()
+    smtp_password = models.CharField(max_length=1000, blank=True)  # Encrypted; cleared once the campaign is final
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    last_recipient_id = models.BigIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)  # Consecutive failed batches
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'], name='email_campaign_due_idx')]
+
+    def set_smtp_password(self, password):
+        self.smtp_password = cipher.encrypt(password.encode()).decode() if password else ''
+
+    def get_smtp_password(self):
+        return cipher.decrypt(self.smtp_password.encode()).decode() if self.smtp_password else None
+
+    def __str__(self):
+        return f"{self.email.subject} to {self.get_audience_display()} ({self.status})"
+
+
+class DocumentJob(models.Model):
+    """
+    Background generation of a template/uploaded Document: fill placeholders, convert to PDF,
+    file both copies and request BDM approval. Run by documents/doc_jobs.py.
+    """
+    SOURCE_CHOICES = [
+        ('template', 'Use Template'),
+        ('upload', 'Upload Document'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='document_jobs')
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='jobs')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='document_jobs')
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='template')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'], name='document_job_due_idx')]
+
+    def __str__(self):
+        return f"{self.document} ({self.status})"
+
+
 class Payee(models.Model):
     PAYEE_TYPE_CHOICES = [
         ('employee', 'Employee'),  # Internal, linked to CustomUser
@@ -725,3 +954,47 @@ class VacancyApplication(models.Model):
     status = models.CharField(max_length=20, choices=VACANCY_APPLICATION_STATUS, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+
+class SearchEntry(models.Model):
+    """
+    One searchable row per person, contact, file, folder, task, vacancy or
+    staff/company document, maintained by documents/search.py. `text` is the
+    lower-cased text matched against queries; `owner` limits the row to one user
+    (personal files/folders). For uploaded files, `body` holds the lower-cased
+    text extracted from `source` by documents/extraction.py; `content_source` is
+    the file it was extracted from, so the two differ while extraction is due.
+    """
+    KIND_CHOICES = [
+        ('person', 'Person'),
+        ('contact', 'Contact'),
+        ('file', 'File'),
+        ('folder', 'Folder'),
+        ('task', 'Task'),
+        ('vacancy', 'Vacancy'),
+        ('staff_document', 'Staff Document'),
+        ('company_document', 'Company Document'),
+    ]
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='search_entries')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    title = models.CharField(max_length=255)
+    detail = models.CharField(max_length=255, blank=True)
+    url = models.CharField(max_length=255, blank=True)
+    text = models.TextField()
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    source = models.CharField(max_length=500, blank=True, help_text="Storage name of the file whose contents are indexed")
+    body = models.TextField(blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    content_source = models.CharField(max_length=500, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_entry_object')]
+        indexes = [
+            models.Index(fields=['tenant', 'kind'], name='search_entry_tenant_kind_idx'),
+            models.Index(fields=['tenant', 'content_hash'], name='search_entry_content_hash_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}: {self.title}"
@@ -0,0 +1,213 @@
+# Notification bar / badge data shared by the context processors in context_processors.py.
+#
+# The payload is built at most once per request, only when a template actually reads one
+# of its values, and is cached per (tenant, user, date). Any Notification write bumps the
+# tenant's version and any UserNotification write bumps the user's version (see signals.py),
+# which makes the cached payload unreachable. Building the payload never writes.
+#
+# notify_users() is the write side: it links a Notification to many users with batched
+# bulk_create, and hands very large fan-outs to NotificationFanoutCronJob (cron.py).
+
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils.functional import SimpleLazyObject
+from django.utils.timezone import localdate, localtime, now
+
+from tenants.observability import log_event
+
+from .models import Notification, NotificationFanout, StaffProfile, UserNotification
+
+BAR_TYPES = [Notification.NotificationType.BIRTHDAY, Notification.NotificationType.EVENT]
+
+
+def _cache():
+    return caches[getattr(settings, 'NOTIFICATION_CACHE_ALIAS', 'default')]
+
+
+def _tenant_version_key(tenant_id):
+    return f"notifications:tenant:{tenant_id}:v"
+
+
+def _user_version_key(user_id):
+    return f"notifications:user:{user_id}:v"
+
+
+def _bump(key):
+    try:
+        _cache().incr(key)
+    except ValueError:
+        # Key missing (never set or evicted): any new value invalidates old payload keys
+        _cache().set(key, int(now().timestamp() * 1000), None)
+
+
+def invalidate_tenant(tenant_id):
+    """Call after writing Notification rows without going through Model.save()."""
+    _bump(_tenant_version_key(tenant_id))
+
+
+def invalidate_users(user_ids):
+    """Call after writing UserNotification rows with update()/bulk_create()."""
+    for user_id in set(user_ids):
+        _bump(_user_version_key(user_id))
+
+
+class NotificationPayload:
+    def __init__(self, bar_items=None, unseen_count=0, birthday_self=False, birthday_others=None, expires_at=None):
+        self.bar_items = bar_items or []
+        self.unseen_count = unseen_count
+        self.birthday_self = birthday_self
+        self.birthday_others = birthday_others or []
+        self.expires_at = expires_at
+
+    @classmethod
+    def build(cls, user, tenant_id):
+        current = now()
+        today = localdate()
+        bar_items = []
+        birthday_self = False
+        birthday_others = []
+
+        if tenant_id is not None:
+            # Query 1: visible birthday/event notifications addressed to this user and not dismissed.
+            # unique_together(user, notification) keeps the join to one row per notification.
+            bar_items = list(
+                Notification.objects.filter(
+                    Q(expires_at__isnull=True) | Q(expires_at__gt=current),
+                    tenant_id=tenant_id,
+                    is_active=True,
+                    type__in=BAR_TYPES,
+                    usernotification__user=user,
+                    usernotification__dismissed=False,
+                ).order_by(
+                    Case(
+                        When(type=Notification.NotificationType.BIRTHDAY, then=Value(0)),
+                        default=Value(1),
+                        output_field=IntegerField(),
+                    ),
+                    '-created_at',
+                )
+            )
+
+            # Query 2: today's celebrants in the tenant
+            for profile in StaffProfile.objects.filter(
+                tenant_id=tenant_id,
+                date_of_birth__month=today.month,
+                date_of_birth__day=today.day,
+            ).only('id', 'user_id', 'tenant_id', 'first_name', 'last_name'):
+                if profile.user_id == user.id:
+                    birthday_self = True
+                else:
+                    birthday_others.append(profile)
+
+        # Query 3: badge count
+        unseen_count = UserNotification.objects.filter(user=user, dismissed=False).count()
+
+        expiries = [n.expires_at for n in bar_items if n.expires_at]
+        return cls(bar_items, unseen_count, birthday_self, birthday_others, min(expiries) if expiries else None)
+
+    def timeout(self):
+        """Seconds this payload may be cached: never past an item's expiry or the end of the day."""
+        current = localtime()
+        timeout = getattr(settings, 'NOTIFICATION_CACHE_TTL', 60)
+        midnight = current.replace(hour=0, minute=0, second=0, microsecond=0)
+        seconds_left_today = 86400 - (current - midnight).total_seconds()
+        timeout = min(timeout, seconds_left_today)
+        if self.expires_at:
+            timeout = min(timeout, (self.expires_at - current).total_seconds())
+        return max(int(timeout), 1)
+
+
+def get_payload(user, tenant_id):
+    cache = _cache()
+    tenant_v_key = _tenant_version_key(tenant_id)
+    user_v_key = _user_version_key(user.id)
+    versions = cache.get_many([tenant_v_key, user_v_key])
+    key = (
+        f"notifications:payload:{tenant_id}:{user.id}:{localdate().isoformat()}:"
+        f"{versions.get(tenant_v_key, 0)}:{versions.get(user_v_key, 0)}"
+    )
+    payload = cache.get(key)
+    if payload is None:
+        payload = NotificationPayload.build(user, tenant_id)
+        cache.set(key, payload, payload.timeout())
+    return payload
+
+
+def get_request_payload(request):
+    """Memoised per request so both context processors share one load."""
+    payload = getattr(request, '_notification_payload', None)
+    if payload is None:
+        payload = SimpleLazyObject(lambda: get_payload(request.user, request.user.tenant_id))
+        request._notification_payload = payload
+    return payload
+
+
+def _fan_out(tenant_id, notification_id, user_ids):
+    batch_size = getattr(settings, 'NOTIFICATION_FANOUT_BATCH_SIZE', 500)
+    for start in range(0, len(user_ids), batch_size):
+        # unique_together(user, notification) turns repeats into no-ops
+        UserNotification.objects.bulk_create(
+            [
+                UserNotification(tenant_id=tenant_id, user_id=user_id, notification_id=notification_id)
+                for user_id in user_ids[start:start + batch_size]
+            ],
+            ignore_conflicts=True,
+        )
+    # bulk_create skips the post_save receivers in signals.py
+    invalidate_users(user_ids)
+
+
+def notify_users(tenant, notification, user_ids, defer=None):
+    """
+    Deliver `notification` to every user in `user_ids` (one UserNotification each).
+
+    Fan-outs larger than NOTIFICATION_FANOUT_SYNC_LIMIT (or any, with defer=True) are queued
+    as a NotificationFanout and written by the cron worker instead of inside the request.
+    Returns the number of users notified now (0 when deferred).
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return 0
+
+    if defer is None:
+        defer = len(user_ids) > getattr(settings, 'NOTIFICATION_FANOUT_SYNC_LIMIT', 1000)
+    if defer:
+        NotificationFanout.objects.create(tenant=tenant, notification=notification, user_ids=user_ids)
+        log_event("notifications.fanout_deferred", level=logging.INFO,
+                  notification_id=notification.id, users=len(user_ids))
+        return 0
+
+    _fan_out(tenant.id, notification.id, user_ids)
+    return len(user_ids)
+
+
+def process_pending_fanouts(limit=50, max_attempts=5):
+    """Drain queued NotificationFanout rows. Returns the number processed."""
+    processed = 0
+    pending = NotificationFanout.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True)
+    for fanout_id in list(pending[:limit]):
+        with transaction.atomic():
+            fanout = NotificationFanout.objects.select_for_update().filter(id=fanout_id, status='pending').first()
+            if fanout is None:  # taken by another worker
+                continue
+            fanout.attempts += 1
+            try:
+                with transaction.atomic():
+                    _fan_out(fanout.tenant_id, fanout.notification_id, fanout.user_ids)
+            except Exception as e:
+                fanout.last_error = str(e)
+                if fanout.attempts >= max_attempts:
+                    fanout.status = 'failed'
+                log_event("notifications.fanout_failed", level=logging.ERROR, exc_info=True,
+                          fanout_id=fanout.id, attempts=fanout.attempts)
+            else:
+                fanout.status = 'done'
+                fanout.last_error = ''
+                processed += 1
+            fanout.processed_at = now()
+            fanout.save(update_fields=['status', 'attempts', 'last_error', 'processed_at'])
+    return processed
@@ -0,0 +1,250 @@
+# Outbound email queue
+#
+# Views call enqueue_email() and return immediately; nothing touches SMTP inside
+# the request. Rows are delivered by process_outbox(), run either by the
+# run_mail_worker command (long-running, keeps its connections warm) or by
+# MailOutboxCronJob (cron.py).
+#
+# The worker keeps a small pool of authenticated SMTP connections per
+# (provider, sender), so consecutive messages from the same sender reuse one
+# TLS session instead of doing a handshake + login each time. Failed sends are
+# retried with exponential backoff until MAIL_MAX_ATTEMPTS.
+
+import logging
+import random
+import smtplib
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from tenants.observability import log_event
+
+from .models import Email, OutboundEmail
+from .viewfuncs.mail_connection import get_email_smtp_connection
+
+# A row left in "sending" this long belongs to a worker that died mid-send
+STALE_LOCK = timedelta(minutes=10)
+
+
+class SMTPUnavailable(Exception):
+    pass
+
+
+def enqueue_email(subject, body, to, sender_provider, sender_email, sender_password, cc=None, bcc=None,
+                  html=False, attachments=None, tenant=None, kind='', email=None):
+    """Queue a message for the mail worker. Returns the OutboundEmail row."""
+    message = OutboundEmail(
+        tenant=tenant,
+        email=email,
+        kind=kind,
+        smtp_provider=(sender_provider or '').lower(),
+        from_email=sender_email,
+        subject=subject,
+        body=body,
+        html=html,
+        to=list(to),
+        cc=list(cc or []),
+        bcc=list(bcc or []),
+        attachments=list(attachments or []),
+    )
+    message.set_smtp_password(sender_password)
+    message.save()
+    log_event("mail.queued", level=logging.INFO, kind=kind, outbound_id=message.id, to=message.to)
+    return message
+
+
+class SMTPConnectionPool:
+    """
+    Authenticated SMTP connections keyed by (provider, sender).
+    At most `max_per_sender` connections exist per key; idle ones are closed after `idle_timeout` seconds.
+    """
+
+    def __init__(self, max_per_sender=None, idle_timeout=None):
+        self.max_per_sender = max_per_sender or getattr(settings, 'MAIL_POOL_MAX_PER_SENDER', 2)
+        self.idle_timeout = idle_timeout or getattr(settings, 'MAIL_POOL_IDLE_TIMEOUT', 60)
+        self._idle = {}    # key -> [(connection, last_used), ...]
+        self._in_use = {}  # key -> count
+        self._cond = threading.Condition()
+
+    def acquire(self, provider, sender_email, password, timeout=30):
+        key = (provider, sender_email)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                idle = self._idle.get(key, [])
+                while idle:
+                    connection, last_used = idle.pop()
+                    if time.monotonic() - last_used < self.idle_timeout:
+                        self._in_use[key] = self._in_use.get(key, 0) + 1
+                        return connection
+                    self._close(connection)
+                if self._in_use.get(key, 0) < self.max_per_sender:
+                    self._in_use[key] = self._in_use.get(key, 0) + 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise SMTPUnavailable(f"No free SMTP connection for {sender_email}")
+
+        # Connect outside the lock: the handshake can take seconds
+        connection, error_message = get_email_smtp_connection(provider, sender_email, password)
+        if connection is None:
+            self._release_slot(key)
+            raise SMTPUnavailable(error_message)
+        return connection
+
+    def release(self, provider, sender_email, connection):
+        key = (provider, sender_email)
+        with self._cond:
+            self._idle.setdefault(key, []).append((connection, time.monotonic()))
+            self._in_use[key] -= 1
+            self._cond.notify()
+
+    def discard(self, provider, sender_email, connection):
+        """Drop a connection that failed mid-send."""
+        self._close(connection)
+        self._release_slot((provider, sender_email))
+
+    def close_idle(self):
+        now = time.monotonic()
+        with self._cond:
+            for key, idle in self._idle.items():
+                keep = []
+                for connection, last_used in idle:
+                    if now - last_used < self.idle_timeout:
+                        keep.append((connection, last_used))
+                    else:
+                        self._close(connection)
+                self._idle[key] = keep
+
+    def close_all(self):
+        with self._cond:
+            for idle in self._idle.values():
+                for connection, _ in idle:
+                    self._close(connection)
+            self._idle.clear()
+
+    def _release_slot(self, key):
+        with self._cond:
+            self._in_use[key] -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def backoff_delay(attempts):
+    base = getattr(settings, 'MAIL_RETRY_BASE_DELAY', 30)
+    cap = getattr(settings, 'MAIL_RETRY_MAX_DELAY', 3600)
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _claim(limit):
+    """Lock up to `limit` due rows for this worker. Returns their ids."""
+    current = timezone.now()
+    due = OutboundEmail.objects.filter(
+        Q(status='queued', next_attempt_at__lte=current) |
+        Q(status='sending', locked_at__lt=current - STALE_LOCK)
+    ).order_by('next_attempt_at').values_list('id', flat=True)[:limit]
+
+    claimed = []
+    for outbound_id in list(due):
+        # Conditional UPDATE: only one worker wins each row
+        won = OutboundEmail.objects.filter(id=outbound_id).filter(
+            Q(status='queued') | Q(status='sending', locked_at__lt=current - STALE_LOCK)
+        ).update(status='sending', locked_at=current)
+        if won:
+            claimed.append(outbound_id)
+    return claimed
+
+
+def _build_message(outbound, connection):
+    message = EmailMessage(
+        subject=outbound.subject,
+        body=outbound.body,
+        from_email=outbound.from_email,
+        to=outbound.to,
+        cc=outbound.cc,
+        bcc=outbound.bcc,
+        connection=connection,
+    )
+    if outbound.html:
+        message.content_subtype = "html"
+    for path in outbound.attachments:
+        message.attach_file(path)
+    return message
+
+
+def _deliver(outbound, pool):
+    password = outbound.get_smtp_password()
+    connection = pool.acquire(outbound.smtp_provider, outbound.from_email, password)
+    try:
+        _build_message(outbound, connection).send()
+    except smtplib.SMTPServerDisconnected:
+        # Pooled session timed out on the server side; retry once on a fresh one
+        pool.discard(outbound.smtp_provider, outbound.from_email, connection)
+        connection = pool.acquire(outbound.smtp_provider, outbound.from_email, password)
+        try:
+            _build_message(outbound, connection).send()
+        except Exception:
+            pool.discard(outbound.smtp_provider, outbound.from_email, connection)
+            raise
+    except Exception:
+        pool.discard(outbound.smtp_provider, outbound.from_email, connection)
+        raise
+    pool.release(outbound.smtp_provider, outbound.from_email, connection)
+
+
+def process_outbox(limit=100, pool=None):
+    """Deliver due messages. Returns (sent, failed_attempts)."""
+    own_pool = pool is None
+    pool = pool or SMTPConnectionPool()
+    max_attempts = getattr(settings, 'MAIL_MAX_ATTEMPTS', 5)
+    sent = failed = 0
+    try:
+        for outbound_id in _claim(limit):
+            outbound = OutboundEmail.objects.get(id=outbound_id)
+            outbound.attempts += 1
+            try:
+                _deliver(outbound, pool)
+            except Exception as e:
+                failed += 1
+                outbound.last_error = str(e)
+                if outbound.attempts >= max_attempts:
+                    outbound.status = 'failed'
+                    outbound.smtp_password = ''
+                else:
+                    outbound.status = 'queued'
+                    outbound.next_attempt_at = timezone.now() + backoff_delay(outbound.attempts)
+                log_event("mail.send_failed", level=logging.WARNING, kind=outbound.kind, outbound_id=outbound.id,
+                          attempts=outbound.attempts, final=outbound.status == 'failed', error=str(e))
+            else:
+                sent += 1
+                outbound.status = 'sent'
+                outbound.sent_at = timezone.now()
+                outbound.smtp_password = ''
+                outbound.last_error = ''
+                log_event("mail.sent", level=logging.INFO, kind=outbound.kind, outbound_id=outbound.id, to=outbound.to)
+            outbound.locked_at = None
+            with transaction.atomic():
+                outbound.save(update_fields=[
+                    'status', 'attempts', 'next_attempt_at', 'locked_at', 'last_error', 'sent_at', 'smtp_password',
+                ])
+                if outbound.status == 'sent' and outbound.email_id:
+                    Email.objects.filter(id=outbound.email_id).update(sent=True, sent_at=outbound.sent_at)
+    finally:
+        if own_pool:
+            pool.close_all()
+        else:
+            pool.close_idle()
+    return sent, failed
@@ -0,0 +1,40 @@
+# Overdue sweeper: moves open tasks whose due_date has passed to 'overdue'.
+#
+# Run by OverdueTaskCronJob (cron.py). Works one tenant at a time in batches of
+# OVERDUE_SWEEP_BATCH_SIZE, each its own short transaction, through
+# task_stats.update_status() so the TaskDailyStat rollup stays current.
+# The task_open_due_idx partial index covers the lookups.
+
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from tenants.observability import log_event
+
+from .models import Task
+from .task_stats import update_status
+
+
+def sweep_overdue_tasks(today=None, batch_size=None):
+    """Mark every open task due before `today` as overdue. Returns the number of tasks updated."""
+    today = today or timezone.localdate()
+    batch_size = batch_size or getattr(settings, 'OVERDUE_SWEEP_BATCH_SIZE', 500)
+    due = Task.objects.filter(status__in=Task.OPEN_STATUSES, due_date__lt=today)
+
+    total = 0
+    tenant_ids = list(due.order_by().values_list('tenant_id', flat=True).distinct())
+    for tenant_id in tenant_ids:
+        swept = 0
+        while True:
+            ids = list(due.filter(tenant_id=tenant_id).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            # Re-checked under the row locks taken by update_status
+            swept += update_status(due.filter(id__in=ids), 'overdue')
+            if len(ids) < batch_size:
+                break
+        if swept:
+            log_event("tasks.overdue_swept", level=logging.INFO, tenant_id=tenant_id, tasks=swept)
+        total += swept
+    return total
@@ -1,5 +1,32 @@
+import copy
+import io
+import os
+import re
+import threading
+import zipfile
+from collections import OrderedDict
 from datetime import datetime
-from docx import Document as DocxDocument
+
+from django.conf import settings
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from docx.text.run import Run
+from lxml import etree
+
+PLACEHOLDER_RE = re.compile(r"\{\{[^{}]+\}\}")
+
+# Parts of a .docx whose text can hold placeholders
+TEXT_PART_RE = re.compile(r"^word/(document|header\d*|footer\d*)\.xml$")
+
+
+def format_date(document_type):
+    today = datetime.now()
+    if document_type == "approval":
+        day = today.day
+        suffix = "th" if 11 <= day <= 13 else {1: "st", 2: "nd", 3: "rd"}.get(day % 10, "th")
+        return f"{day}{suffix} {today.strftime('%B, %Y')}"  # e.g., "25th March, 2025"
+    return today.strftime("%m/%d/%Y")  # e.g., "03/25/2025"
+
 
 def replace_placeholders(doc, replacements, document_type):
     """
@@ -7,19 +34,13 @@ def replace_placeholders(doc, replacements, document_type):
     - Ensures 'Company Address' is bold.
     - Formats the date correctly.
     - Replaces text in paragraphs, tables, headers, and footers.
-    """
 
-    # Format date based on document type
-    today = datetime.now()
-    if document_type == "approval":
-        day = today.day
-        suffix = "th" if 11 <= day <= 13 else {1: "st", 2: "nd", 3: "rd"}.get(day % 10, "th")
-        formatted_date = f"{day}{suffix} {today.strftime('%B, %Y')}"  # e.g., "25th March, 2025"
-    else:
-        formatted_date = today.strftime("%m/%d/%Y")  # e.g., "03/25/2025"
+    Re-scans the whole document on every call; to generate from a template file
+    use render_template(), which does the scan once per template.
+    """
 
     # Add formatted date to replacements
-    replacements["{{Date}}"] = formatted_date
+    replacements["{{Date}}"] = format_date(document_type)
 
     # Function to replace text inside runs while keeping formatting
     def replace_text_in_runs(runs):
@@ -27,10 +48,10 @@ def replace_placeholders(doc, replacements, document_type):
             for key, value in replacements.items():
                 if key in run.text:
                     run.text = run.text.replace(key, value)
-                    
+
                     # Apply bold formatting only to Company Address
                     if key == "{{Company Name}}":
-                        run.bold = True  
+                        run.bold = True
 
     # Replace in paragraphs
     for para in doc.paragraphs:
@@ -50,4 +71,172 @@ def replace_placeholders(doc, replacements, document_type):
         for footer_para in section.footer.paragraphs:
             replace_text_in_runs(footer_para.runs)
 
-    return doc
\ No newline at end of file
+    return doc
+
+
+def _path_to(element, root):
+    """Child indexes leading from `root` to `element`."""
+    path = []
+    while element is not root:
+        parent = element.getparent()
+        path.append(parent.index(element))
+        element = parent
+    return tuple(reversed(path))
+
+
+def _follow(root, path):
+    element = root
+    for index in path:
+        element = element[index]
+    return element
+
+
+def _own_texts(paragraph):
+    # w:t of this paragraph only, not of paragraphs nested in it (e.g. text boxes)
+    p_tag = qn('w:p')
+    for t in paragraph.iter(qn('w:t')):
+        ancestor = t.getparent()
+        while ancestor.tag != p_tag:
+            ancestor = ancestor.getparent()
+        if ancestor is paragraph:
+            yield t
+
+
+def _join_split_placeholders(paragraph):
+    """
+    Word often splits "{{Company Name}}" over several runs (spell check, edits).
+    Move each placeholder wholly into the w:t where it starts; the paragraph's
+    text is unchanged, only the run boundaries move.
+    """
+    texts = list(_own_texts(paragraph))
+    if len(texts) < 2:
+        return
+    full = ''.join(t.text or '' for t in texts)
+    for match in reversed(list(PLACEHOLDER_RE.finditer(full))):
+        start, end = match.span()
+        offset = 0
+        first = None
+        for t in texts:
+            text = t.text or ''
+            t_start, t_end = offset, offset + len(text)
+            offset = t_end
+            if t_end <= start or t_start >= end:
+                continue
+            if first is None:
+                if t_end >= end:
+                    break  # Already inside one run
+                first = t
+                t.text = text[:start - t_start] + match.group()
+            else:
+                t.text = text[max(end - t_start, 0):] if t_end > end else ''
+            if t.text != t.text.strip():
+                t.set(qn('xml:space'), 'preserve')
+
+
+class CompiledTemplate:
+    """
+    A .docx template parsed once, with the location of every placeholder.
+
+    Rendering copies only the parts that contain placeholders, substitutes the
+    recorded w:t elements, and appends those parts to a prebuilt archive holding
+    every other part (images, styles, ...) as already-compressed bytes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.parts = {}      # part name -> parsed root
+        self.slots = {}      # part name -> [(path to w:t, text, keys)]
+        unchanged = io.BytesIO()
+        with zipfile.ZipFile(path) as source, zipfile.ZipFile(unchanged, 'w', zipfile.ZIP_DEFLATED) as base:
+            for info in source.infolist():
+                data = source.read(info.filename)
+                if TEXT_PART_RE.match(info.filename) and b'{{' in data:
+                    self._compile_part(info.filename, data)
+                else:
+                    base.writestr(info, data, compress_type=info.compress_type)
+        self.base = unchanged.getvalue()
+        self.placeholders = sorted({key for slots in self.slots.values() for _, _, keys in slots for key in keys})
+
+    def _compile_part(self, name, data):
+        root = parse_xml(data)
+        for paragraph in root.iter(qn('w:p')):
+            _join_split_placeholders(paragraph)
+        slots = []
+        for t in root.iter(qn('w:t')):
+            keys = PLACEHOLDER_RE.findall(t.text or '')
+            if keys:
+                slots.append((_path_to(t, root), t.text, tuple(set(keys))))
+        self.parts[name] = root
+        self.slots[name] = slots
+
+    def render(self, replacements, output):
+        """Write the filled document to `output` (a path or a binary file object)."""
+        archive = io.BytesIO(self.base)
+        archive.seek(0, io.SEEK_END)
+        with zipfile.ZipFile(archive, 'a', zipfile.ZIP_DEFLATED) as target:
+            for name, root in self.parts.items():
+                root = copy.deepcopy(root)
+                for path, text, keys in self.slots[name]:
+                    t = _follow(root, path)
+                    for key in keys:
+                        if key in replacements:
+                            text = text.replace(key, replacements[key])
+                    t.text = text
+                    t.set(qn('xml:space'), 'preserve')
+                    # Apply bold formatting only to Company Name
+                    if "{{Company Name}}" in keys and "{{Company Name}}" in replacements:
+                        Run(t.getparent(), None).bold = True
+                target.writestr(name, _serialize(root))
+        data = archive.getvalue()
+        if hasattr(output, 'write'):
+            output.write(data)
+        else:
+            with open(output, 'wb') as f:
+                f.write(data)
+
+
+def _serialize(root):
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+class _TemplateCache:
+    """LRU of compiled templates keyed by (path, mtime); an edited template is recompiled."""
+
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        path = os.path.abspath(path)
+        key = (path, os.stat(path).st_mtime_ns)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        compiled = CompiledTemplate(path)  # Outside the lock: compiling takes a while
+        with self._lock:
+            for stale in [k for k in self._items if k[0] == path and k != key]:
+                del self._items[stale]
+            self._items[key] = compiled
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+template_cache = _TemplateCache(getattr(settings, 'DOCX_TEMPLATE_CACHE_SIZE', 16))
+
+
+def render_template(template_path, replacements, document_type, output):
+    """
+    Fill a .docx template into `output` (path or binary file object).
+    Same result as replace_placeholders() on a freshly opened template, but the
+    template is parsed once per (path, mtime).
+    """
+    replacements = dict(replacements, **{"{{Date}}": format_date(document_type)})
+    template_cache.get(template_path).render(replacements, output)
+
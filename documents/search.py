@@ -0,0 +1,297 @@
+# Tenant-scoped search over people, contacts, files, folders, tasks and vacancies
+#
+# Every searchable object has one SearchEntry row (title, detail, url and the
+# lower-cased text to match), kept current by the signals in signals.py.
+# rebuild() refills the rows from the source tables (the rebuild_search_index
+# command). No migration fills the index for existing rows: run the command
+# once after migrating to 0086, and again after bulk loads that bypass
+# signals. Entries of uploaded files also carry the file's text in `body`,
+# filled in the background by extraction.py; neither index() nor rebuild()
+# touches it.
+#
+# Matching goes through an index on each backend:
+#   - PostgreSQL: trigram GIN index on SearchEntry.text (pg_trgm), which serves
+#     LIKE '%query%'; results are ranked by word_similarity
+#   - SQLite: an FTS5 table with the trigram tokenizer, kept in sync by triggers
+#   - other backends, or queries shorter than 3 characters: LIKE on the rows of
+#     the tenant
+# Both indexes are created by migrations 0086/0087 and cover `body` too. Ranking: title starts with the
+# query, then title contains it, then anything else; ties go to the closer
+# trigram match (PostgreSQL) or the shorter title.
+#
+#     search.search(request.user, "ada", kinds=["person"], limit=10)
+
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+from django.db import connection, transaction
+from django.db.models import Case, FloatField, Func, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Length
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (CompanyDocument, Contact, CustomUser, File, Folder, SearchEntry, StaffDocument, StaffProfile, Task,
+                     Vacancy)
+
+FTS_TABLE = "documents_searchentry_fts"
+MIN_INDEXED_LENGTH = 3  # Shortest query a trigram index can serve
+BATCH_SIZE = 1000
+
+Source = namedtuple("Source", "model queryset build")
+
+
+class WordSimilarity(Func):
+    function = "word_similarity"
+    output_field = FloatField()
+
+
+def _text(*parts):
+    return " ".join(str(part) for part in parts if part).lower()
+
+
+def _person(user):
+    if not user.tenant_id:
+        return None
+    try:
+        profile = user.staff_profile
+    except StaffProfile.DoesNotExist:
+        profile = None
+    name = f"{user.first_name} {user.last_name}".strip() or user.username
+    # The profile's own names too: staff_list filters on them, and they can differ from the user's
+    extra = (profile.first_name, profile.middle_name, profile.last_name, profile.designation,
+             profile.official_email) if profile else ()
+    return dict(
+        tenant_id=user.tenant_id, title=name[:255], detail=user.email or "",
+        url=reverse("view_staff_profile", args=[user.pk]),
+        text=_text(user.username, user.first_name, user.last_name, user.email, *extra),
+    )
+
+
+def _contact(contact):
+    return dict(
+        tenant_id=contact.tenant_id, title=contact.name, detail=contact.email,
+        url=reverse("view_contact_detail", args=[contact.pk]),
+        text=_text(contact.name, contact.email, contact.organization, contact.designation, contact.phone),
+        # Private contacts are only listed to their creator; public ones per department (visible_entries)
+        owner_id=None if contact.is_public else contact.created_by_id,
+    )
+
+
+def _folder_url(folder_id, is_public):
+    if folder_id is None:
+        return f"{reverse('folder_view')}?tab={'public' if is_public else 'personal'}"
+    if is_public:
+        return f"{reverse('folder_view_public', args=[folder_id])}?tab=public"
+    return f"{reverse('folder_view_personal', args=[folder_id])}?tab=personal"
+
+
+def _folder(folder):
+    return dict(
+        tenant_id=folder.tenant_id, title=folder.name, detail=folder.description[:255],
+        url=_folder_url(folder.pk, folder.is_public), text=_text(folder.name),
+        # Personal folders are only listed to their creator
+        owner_id=None if folder.is_public else folder.created_by_id,
+    )
+
+
+def _file(file):
+    folder = file.folder
+    if file.is_public or (folder is not None and folder.is_public):
+        owner_id = None
+    else:
+        # folder_view lists personal files by the folder they are in
+        owner_id = folder.created_by_id if folder is not None else file.uploaded_by_id
+    return dict(
+        tenant_id=file.tenant_id, title=file.original_name, detail=folder.name if folder else "",
+        url=_folder_url(file.folder_id, owner_id is None), text=_text(file.original_name),
+        owner_id=owner_id, source=file.file.name or "",
+    )
+
+
+def _task(task):
+    return dict(
+        tenant_id=task.tenant_id, title=task.title, detail=task.get_status_display(),
+        url=reverse("task_detail", args=[task.pk]), text=_text(task.title),
+    )
+
+
+def _vacancy(vacancy):
+    return dict(
+        tenant_id=vacancy.tenant_id, title=vacancy.title, detail=vacancy.get_status_display() if vacancy.status else "",
+        url=reverse("vacancy_detail", args=[vacancy.pk]), text=_text(vacancy.title),
+    )
+
+
+def _staff_document(document):
+    profile = document.staff_profile
+    name = os.path.basename(document.file.name or "") or document.get_document_type_display()
+    return dict(
+        tenant_id=document.tenant_id, title=name[:255],
+        detail=f"{document.get_document_type_display()} - {profile.full_name}"[:255],
+        url=reverse("view_staff_profile", args=[profile.user_id]),
+        text=_text(name, document.description, document.get_document_type_display()),
+        # Staff documents are personal; only listed to the staff member
+        owner_id=profile.user_id, source=document.file.name or "",
+    )
+
+
+def _company_document(document):
+    name = os.path.basename(document.file.name or "") or document.get_document_type_display()
+    return dict(
+        tenant_id=document.tenant_id, title=name[:255], detail=document.get_document_type_display(),
+        url=reverse("view_company_profile"),
+        text=_text(name, document.description, document.get_document_type_display()),
+        source=document.file.name or "",
+    )
+
+
+SOURCES = {
+    "person": Source(CustomUser, lambda: CustomUser.objects.select_related("staff_profile"), _person),
+    "contact": Source(Contact, lambda: Contact.objects.all(), _contact),
+    "file": Source(File, lambda: File.objects.select_related("folder"), _file),
+    "folder": Source(Folder, lambda: Folder.objects.all(), _folder),
+    "task": Source(Task, lambda: Task.objects.all(), _task),
+    "vacancy": Source(Vacancy, lambda: Vacancy.objects.all(), _vacancy),
+    "staff_document": Source(StaffDocument, lambda: StaffDocument.objects.select_related("staff_profile"), _staff_document),
+    "company_document": Source(CompanyDocument, lambda: CompanyDocument.objects.all(), _company_document),
+}
+# Fields index()/rebuild() write; body and the content_* fields belong to extraction.py
+INDEXED_FIELDS = ["tenant", "title", "detail", "url", "text", "owner", "source", "updated_at"]
+KIND_BY_MODEL = {source.model: kind for kind, source in SOURCES.items()}
+
+
+def _entry_fields(fields):
+    return {"detail": "", "owner_id": None, "source": "", **fields}
+
+
+def index(instance):
+    """Create, update or (when the object is no longer searchable) drop the entry of `instance`."""
+    kind = KIND_BY_MODEL[type(instance)]
+    fields = SOURCES[kind].build(instance)
+    if fields is None:
+        unindex(kind, instance.pk)
+        return
+    SearchEntry.objects.update_or_create(kind=kind, object_id=instance.pk, defaults=_entry_fields(fields))
+
+
+def index_objects(objects):
+    """index() for objects written with bulk_create (no signals), one upsert per BATCH_SIZE. Returns the rows written."""
+    written, batch = 0, []
+    for obj in objects:
+        kind = KIND_BY_MODEL[type(obj)]
+        fields = SOURCES[kind].build(obj)
+        if fields is not None:
+            batch.append(SearchEntry(kind=kind, object_id=obj.pk, **_entry_fields(fields)))
+        if len(batch) >= BATCH_SIZE:
+            written += _upsert(batch)
+            batch = []
+    return written + _upsert(batch)
+
+
+def unindex(kind, object_id):
+    SearchEntry.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def _upsert(batch):
+    # Existing rows keep their extracted body
+    return len(SearchEntry.objects.bulk_create(
+        batch, update_conflicts=True, unique_fields=["kind", "object_id"], update_fields=INDEXED_FIELDS,
+    ))
+
+
+@transaction.atomic
+def rebuild(tenant_ids=None):
+    """Rewrite the entries of the given tenants (default: all) from the source tables. Returns the rows written."""
+    started = timezone.now()
+    written = 0
+    for kind, source in SOURCES.items():
+        objects = source.queryset()
+        if tenant_ids is not None:
+            objects = objects.filter(tenant_id__in=tenant_ids)
+        batch = []
+        for obj in objects.iterator(chunk_size=BATCH_SIZE):
+            fields = source.build(obj)
+            if fields is None:
+                continue
+            batch.append(SearchEntry(kind=kind, object_id=obj.pk, **_entry_fields(fields)))
+            if len(batch) >= BATCH_SIZE:
+                written += _upsert(batch)
+                batch = []
+        written += _upsert(batch)
+    # Entries not rewritten belong to objects that no longer exist (or are no longer searchable)
+    stale = SearchEntry.objects.filter(updated_at__lt=started)
+    if tenant_ids is not None:
+        stale = stale.filter(tenant_id__in=tenant_ids)
+    stale.delete()
+    return written
+
+
+@lru_cache(maxsize=None)
+def _has_fts(alias):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def _normalize(query):
+    return " ".join(query.split()).lower()
+
+
+def matching(entries, query):
+    """`entries` narrowed to those whose text contains `query`."""
+    query = _normalize(query)
+    if len(query) >= MIN_INDEXED_LENGTH and connection.vendor == "sqlite" and _has_fts(connection.alias):
+        phrase = '"%s"' % query.replace('"', '""')
+        return entries.filter(id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [phrase]))
+    # On PostgreSQL the trigram indexes serve these LIKEs
+    return entries.filter(Q(text__contains=query) | Q(body__contains=query))
+
+
+def visible_entries(user, kinds=None):
+    """Entries of the user's tenant (optionally only of `kinds`) that the user may see."""
+    entries = SearchEntry.objects.filter(tenant_id=user.tenant_id).filter(Q(owner__isnull=True) | Q(owner=user))
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+    if (not kinds or "task" in kinds) and not user.is_hod():
+        # Same rule as task_detail: assignees, the creator and HODs
+        tasks = Task.objects.filter(tenant_id=user.tenant_id).filter(Q(assigned_to=user) | Q(created_by=user))
+        entries = entries.exclude(Q(kind="task") & ~Q(object_id__in=tasks.values("id")))
+    if not kinds or "contact" in kinds:
+        # Same rule as contact_list: public contacts of the user's department, and the user's own
+        contacts = Contact.objects.filter(tenant_id=user.tenant_id, is_public=True).filter(
+            Q(department_id=user.department_id) | Q(created_by=user)
+        )
+        entries = entries.exclude(Q(kind="contact", owner__isnull=True) & ~Q(object_id__in=contacts.values("id")))
+    return entries
+
+
+def entries(user, query, kinds=None):
+    """Unranked queryset of the visible entries matching `query`."""
+    return matching(visible_entries(user, kinds), query)
+
+
+def search(user, query, kinds=None, limit=20):
+    """Best `limit` entries matching `query`, as dicts for JSON."""
+    query = _normalize(query)
+    if not query or not user.tenant_id:
+        return []
+    rank = Case(
+        When(title__istartswith=query, then=Value(3)),
+        When(title__icontains=query, then=Value(2)),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
+    result = entries(user, query, kinds).annotate(rank=rank)
+    ordering = ["-rank"]
+    if connection.vendor == "postgresql":
+        result = result.annotate(similarity=WordSimilarity(Value(query), "text"))
+        ordering.append("-similarity")
+    ordering += [Length("title").asc(), "title"]
+    return [
+        {"kind": kind, "id": object_id, "title": title, "detail": detail, "url": url}
+        for kind, object_id, title, detail, url in result.order_by(*ordering).values_list(
+            "kind", "object_id", "title", "detail", "url"
+        )[:limit]
+    ]
@@ -1,7 +1,9 @@
-from django.db.models.signals import post_save, m2m_changed
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.conf import settings
-from .models import StaffProfile, Role, CustomUser
+from tenants.models import Tenant
+from .models import StaffProfile, Role, CustomUser, Notification, UserNotification, Task, Folder, File, Contact, Vacancy, StaffDocument, CompanyDocument
+from . import autocomplete, folder_tree, notifications, search, task_stats
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def sync_user_to_profile_department(sender, instance, created, **kwargs):
@@ -58,3 +60,151 @@ def update_user_permissions(sender, instance, action, pk_set, **kwargs):
             instance.user_permissions.remove(*role.permissions.all())
     elif action == 'post_clear':
         instance.user_permissions.clear()
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def invalidate_tenant_notifications(sender, instance, **kwargs):
+    """
+    A Notification change can affect the notification bar of every user in the tenant.
+    """
+    notifications.invalidate_tenant(instance.tenant_id)
+
+@receiver(post_save, sender=UserNotification)
+@receiver(post_delete, sender=UserNotification)
+def invalidate_user_notifications(sender, instance, **kwargs):
+    """
+    Drop the cached notification bar/badge of the user this row belongs to.
+    """
+    notifications.invalidate_users([instance.user_id])
+
+@receiver(post_save, sender=Folder)
+@receiver(post_delete, sender=Folder)
+@receiver(post_save, sender=File)
+@receiver(post_delete, sender=File)
+def invalidate_folder_tree(sender, instance, **kwargs):
+    """
+    Folder structure and file totals are cached per tenant (folder_tree.get_tree).
+    """
+    if instance.tenant_id:
+        folder_tree.invalidate(instance.tenant_id)
+
+@receiver(post_init, sender=Task)
+def remember_task_status(sender, instance, **kwargs):
+    # __dict__: reading a deferred status here would cost a query per loaded task
+    instance._rollup_status = instance.__dict__.get('status')
+
+@receiver(post_save, sender=Task)
+def roll_up_task_status(sender, instance, created, **kwargs):
+    """
+    Count the task's status change in the TaskDailyStat rollup (documents/task_stats.py).
+    """
+    old_status = None if created else instance._rollup_status
+    if created or old_status is not None:
+        task_stats.record_change(instance, old_status, instance.status)
+    instance._rollup_status = instance.status
+
+@receiver(pre_delete, sender=Task)
+def roll_up_task_delete(sender, instance, origin=None, **kwargs):
+    """
+    A deleted task leaves its status. Skipped when its tenant is being deleted,
+    and the rows of a user being deleted are left to that user's cascade.
+    """
+    origin_model = getattr(origin, 'model', type(origin))
+    if origin_model is Tenant:
+        return
+    deleted_users = _origin_pks(origin) if origin_model is CustomUser else set()
+    user_ids = [user_id for user_id in instance.assigned_to.values_list('id', flat=True) if user_id not in deleted_users]
+    task_stats.record_change(instance, instance.status, None, user_ids=user_ids)
+
+def _origin_pks(origin):
+    return {origin.pk} if isinstance(origin, CustomUser) else set(origin.values_list('pk', flat=True))
+
+@receiver(m2m_changed, sender=Task.assigned_to.through)
+def roll_up_task_assignment(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Assigned users enter the task's current status; unassigned users leave it.
+    """
+    if action == 'pre_clear':
+        pk_set = set(instance.assigned_to.values_list('id', flat=True) if not reverse
+                     else instance.task_set.values_list('id', flat=True))
+    elif action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    joining = action == 'post_add'
+    if reverse:
+        # instance is a user, pk_set are tasks
+        for task in Task.objects.filter(id__in=pk_set).only('id', 'tenant_id', 'created_by_id', 'status'):
+            task_stats.record_change(task, None if joining else task.status, task.status if joining else None,
+                                     user_ids=[instance.pk], tenant_level=False)
+    else:
+        task_stats.record_change(instance, None if joining else instance.status, instance.status if joining else None,
+                                 user_ids=pk_set, tenant_level=False)
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_save, sender=Contact)
+@receiver(post_save, sender=Folder)
+@receiver(post_save, sender=File)
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Vacancy)
+@receiver(post_save, sender=StaffDocument)
+@receiver(post_save, sender=CompanyDocument)
+def update_search_entry(sender, instance, raw=False, **kwargs):
+    """
+    Keep the SearchEntry of the saved object current (documents/search.py). A new
+    or replaced file leaves the entry due for text extraction (documents/extraction.py).
+    """
+    if not raw:
+        search.index(instance)
+
+@receiver(post_save, sender=StaffProfile)
+def update_person_search_entry(sender, instance, raw=False, **kwargs):
+    # A person's entry includes their staff profile
+    if not raw:
+        search.index(instance.user)
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=Contact)
+@receiver(post_delete, sender=Folder)
+@receiver(post_delete, sender=File)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Vacancy)
+@receiver(post_delete, sender=StaffDocument)
+@receiver(post_delete, sender=CompanyDocument)
+def drop_search_entry(sender, instance, **kwargs):
+    search.unindex(search.KIND_BY_MODEL[sender], instance.pk)
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_save, sender=Contact)
+def update_autocomplete(sender, instance, raw=False, **kwargs):
+    """
+    Keep the in-memory people/contact pickers of this worker current (documents/autocomplete.py).
+    """
+    if raw:
+        return
+    if sender is Contact:
+        autocomplete.update_contact(instance)
+    else:
+        autocomplete.update_person(instance)
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=Contact)
+def drop_autocomplete(sender, instance, **kwargs):
+    if sender is Contact:
+        autocomplete.remove_contact(instance.pk)
+    else:
+        autocomplete.remove_person(instance.pk)
+
+@receiver(m2m_changed, sender=CustomUser.roles.through)
+def update_autocomplete_sales_reps(sender, instance, action, reverse, **kwargs):
+    # The sales rep picker lists users by role
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        autocomplete.invalidate(autocomplete.PEOPLE)
+    else:
+        autocomplete.update_person(instance)
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_autocomplete_roles(sender, instance, **kwargs):
+    # A renamed or deleted role can change who counts as a sales rep in every tenant
+    autocomplete.invalidate(autocomplete.PEOPLE)
@@ -0,0 +1,81 @@
+# Task completion metrics for the performance dashboards.
+#
+# Every figure is computed with conditional aggregation (COUNT ... FILTER / CASE),
+# so a dashboard costs one query for its summary and one grouped query for its
+# per-user table, however many users it covers.
+#
+#     metrics = TaskMetrics.for_user(tenant, user, category='overall')
+#     metrics.summary()    # {'total_tasks': ..., 'weekly_completed': ..., ...}
+#
+#     metrics = TaskMetrics.corporate(tenant, creator_ids)
+#     metrics.per_user(user_ids)   # {user_id: {'total_tasks': ..., ...}}
+
+from datetime import timedelta
+
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Task
+
+
+def completion_percentage(completed, total):
+    return round(completed / total * 100, 2) if total else 0
+
+
+class TaskMetrics:
+    def __init__(self, tasks, exclude_self_assigned=False):
+        self.tasks = tasks
+        self.exclude_self_assigned = exclude_self_assigned
+
+    @classmethod
+    def for_user(cls, tenant, user, category='overall'):
+        """Tasks assigned to `user`; 'personal' = created by them, 'corporate' = created by others."""
+        tasks = Task.objects.filter(tenant=tenant, assigned_to=user)
+        if category == 'personal':
+            tasks = tasks.filter(created_by=user)
+        elif category == 'corporate':
+            tasks = tasks.exclude(created_by=user)
+        return cls(tasks)
+
+    @classmethod
+    def corporate(cls, tenant, creator_ids):
+        """Tasks created by `creator_ids` for someone else (self-assigned tasks excluded)."""
+        return cls(
+            Task.objects.filter(tenant=tenant, created_by__in=creator_ids).exclude(created_by=F('assigned_to')),
+            exclude_self_assigned=True,
+        )
+
+    def summary(self):
+        """Totals, completion counts by period and overdue count, in one query."""
+        now = timezone.now()
+        completed = Q(status='completed')
+        # distinct: a join through assigned_to can repeat a task
+        counts = self.tasks.aggregate(
+            total_tasks=Count('id', distinct=True),
+            completed_tasks=Count('id', filter=completed, distinct=True),
+            weekly_completed=Count('id', filter=completed & Q(completed_at__gte=now - timedelta(days=7)), distinct=True),
+            monthly_completed=Count('id', filter=completed & Q(completed_at__gte=now - timedelta(days=30)), distinct=True),
+            yearly_completed=Count('id', filter=completed & Q(completed_at__gte=now - timedelta(days=365)), distinct=True),
+            overdue_tasks=Count('id', filter=Q(status='overdue', due_date__lt=timezone.localdate()), distinct=True),
+        )
+        counts['completion_percentage'] = completion_percentage(counts['completed_tasks'], counts['total_tasks'])
+        return counts
+
+    def per_user(self, user_ids):
+        """Assigned/completed counts for each of `user_ids`, in one grouped query. Users without tasks get zeros."""
+        # Grouped on the assignment rows, so a task shared by several users counts once for each of them
+        assignments = Task.assigned_to.through.objects.filter(task__in=self.tasks, customuser_id__in=user_ids)
+        if self.exclude_self_assigned:
+            assignments = assignments.exclude(customuser_id=F('task__created_by_id'))
+        rows = assignments.values('customuser_id').annotate(
+            total_tasks=Count('task_id', distinct=True),
+            completed_tasks=Count('task_id', filter=Q(task__status='completed'), distinct=True),
+        ).order_by()
+        metrics = {user_id: {'total_tasks': 0, 'completed_tasks': 0, 'completion_percentage': 0} for user_id in user_ids}
+        for row in rows:
+            metrics[row['customuser_id']] = {
+                'total_tasks': row['total_tasks'],
+                'completed_tasks': row['completed_tasks'],
+                'completion_percentage': completion_percentage(row['completed_tasks'], row['total_tasks']),
+            }
+        return metrics
@@ -0,0 +1,173 @@
+# TaskDailyStat rollup: task status changes counted per (tenant, user, day, status).
+#
+# Kept current by the Task signals in signals.py (save, delete, assigned_to
+# changes). Code that changes status with QuerySet.update() bypasses them and
+# must go through update_status() instead. rebuild() recomputes the rollup from
+# the Task table (the backfill_task_stats command).
+#
+# Dashboards read the rollup instead of scanning Task:
+#   - current count in a status  = SUM(entered - left) over all days
+#   - completions in a period    = SUM(entered) for 'completed' since the start day
+
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Case, Count, DateField, ExpressionWrapper, F, Q, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Task, TaskDailyStat
+from .task_metrics import completion_percentage
+
+BATCH_SIZE = 1000
+
+
+def _apply(entered, left):
+    """Add Counter deltas keyed by (tenant_id, user_id, personal, day, status) to the rollup."""
+    for key in set(entered) | set(left):
+        tenant_id, user_id, personal, day, status = key
+        lookup = dict(tenant_id=tenant_id, user_id=user_id, personal=personal, day=day, status=status)
+        changes = dict(entered=F('entered') + entered[key], left=F('left') + left[key])
+        if TaskDailyStat.objects.filter(**lookup).update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                TaskDailyStat.objects.create(**lookup, entered=entered[key], left=left[key])
+        except IntegrityError:
+            # Another request created the row first
+            TaskDailyStat.objects.filter(**lookup).update(**changes)
+
+
+def _keys(tenant_id, created_by_id, user_ids, day, status):
+    yield (tenant_id, None, False, day, status)
+    for user_id in user_ids:
+        yield (tenant_id, user_id, user_id == created_by_id, day, status)
+
+
+def _assignees(task_ids):
+    assignees = {}
+    for task_id, user_id in Task.assigned_to.through.objects.filter(
+        task_id__in=task_ids
+    ).values_list('task_id', 'customuser_id'):
+        assignees.setdefault(task_id, []).append(user_id)
+    return assignees
+
+
+def record_change(task, old_status, new_status, user_ids=None, tenant_level=True):
+    """
+    Record one task moving from `old_status` to `new_status` today (either may be
+    None for created/deleted). `user_ids` defaults to the task's assignees.
+    """
+    if old_status == new_status:
+        return
+    if user_ids is None:
+        user_ids = _assignees([task.pk]).get(task.pk, []) if task.pk else []
+    day = timezone.localdate()
+    entered, left = Counter(), Counter()
+    for status, counter in ((new_status, entered), (old_status, left)):
+        if status:
+            for key in _keys(task.tenant_id, task.created_by_id, user_ids, day, status):
+                if tenant_level or key[1] is not None:
+                    counter[key] += 1
+    _apply(entered, left)
+
+
+def update_status(tasks, new_status, **fields):
+    """QuerySet.update(status=new_status, **fields) that keeps the rollup current. Returns the number of rows updated."""
+    with transaction.atomic():
+        rows = list(tasks.exclude(status=new_status).select_for_update().values_list(
+            'id', 'tenant_id', 'created_by_id', 'status'
+        ))
+        if not rows:
+            return 0
+        updated = Task.objects.filter(id__in=[row[0] for row in rows]).update(status=new_status, **fields)
+        assignees = _assignees([row[0] for row in rows])
+        day = timezone.localdate()
+        entered, left = Counter(), Counter()
+        for task_id, tenant_id, created_by_id, old_status in rows:
+            for key in _keys(tenant_id, created_by_id, assignees.get(task_id, []), day, new_status):
+                entered[key] += 1
+            for key in _keys(tenant_id, created_by_id, assignees.get(task_id, []), day, old_status):
+                left[key] += 1
+        _apply(entered, left)
+    return updated
+
+
+def rebuild(tenant_ids=None):
+    """
+    Replace the rollup with one entry per task in its current status, dated on its
+    completion day (completed tasks) or creation day. Returns the rows written.
+    """
+    tasks = Task.objects.all()
+    stats = TaskDailyStat.objects.all()
+    if tenant_ids is not None:
+        tasks = tasks.filter(tenant_id__in=tenant_ids)
+        stats = stats.filter(tenant_id__in=tenant_ids)
+    day = Case(
+        When(status='completed', completed_at__isnull=False, then=TruncDate('completed_at')),
+        default=TruncDate('created_at'),
+        output_field=DateField(),
+    )
+
+    per_tenant = tasks.annotate(stat_day=day).values('tenant_id', 'stat_day', 'status').annotate(n=Count('id')).order_by()
+    assignments = Task.assigned_to.through.objects.filter(task__in=tasks).annotate(
+        stat_day=Case(
+            When(task__status='completed', task__completed_at__isnull=False, then=TruncDate('task__completed_at')),
+            default=TruncDate('task__created_at'),
+            output_field=DateField(),
+        ),
+        personal=ExpressionWrapper(Q(customuser_id=F('task__created_by_id')), output_field=BooleanField()),
+    ).values('task__tenant_id', 'customuser_id', 'personal', 'stat_day', 'task__status').annotate(n=Count('task_id')).order_by()
+
+    rows = [
+        TaskDailyStat(tenant_id=row['tenant_id'], day=row['stat_day'], status=row['status'], entered=row['n'])
+        for row in per_tenant
+    ] + [
+        TaskDailyStat(tenant_id=row['task__tenant_id'], user_id=row['customuser_id'], personal=bool(row['personal']),
+                      day=row['stat_day'], status=row['task__status'], entered=row['n'])
+        for row in assignments
+    ]
+    with transaction.atomic():
+        stats.delete()
+        TaskDailyStat.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
+
+
+def _net(status=None):
+    return Sum(F('entered') - F('left'), filter=Q(status=status) if status else None, default=0)
+
+
+def user_summary(tenant, user, category='overall'):
+    """Same figures as TaskMetrics.for_user(...).summary(), read from the rollup."""
+    stats = TaskDailyStat.objects.filter(tenant=tenant, user=user)
+    if category == 'personal':
+        stats = stats.filter(personal=True)
+    elif category == 'corporate':
+        stats = stats.filter(personal=False)
+    today = timezone.localdate()
+
+    def completed_since(days):
+        return Sum('entered', filter=Q(status='completed', day__gt=today - timedelta(days=days)), default=0)
+
+    counts = stats.aggregate(
+        total_tasks=_net(),
+        completed_tasks=_net('completed'),
+        weekly_completed=completed_since(7),
+        monthly_completed=completed_since(30),
+        yearly_completed=completed_since(365),
+        overdue_tasks=_net('overdue'),
+    )
+    counts['completion_percentage'] = completion_percentage(counts['completed_tasks'], counts['total_tasks'])
+    return counts
+
+
+def tenant_status_counts():
+    """Current number of tasks per (tenant, status), as dicts with tenant__id, tenant__name, status, count."""
+    return list(
+        TaskDailyStat.objects.filter(user__isnull=True)
+        .values('tenant__id', 'tenant__name', 'status')
+        .annotate(count=_net())
+        .filter(count__gt=0)
+        .order_by()
+    )
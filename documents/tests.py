@@ -1,3 +1,1444 @@
-from django.test import TestCase
+import importlib
+import io
+import os
+import smtplib
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.contrib.admin.models import ADDITION, LogEntry
+from django.core import mail
+from django.core.cache import caches
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import CommandError, call_command
+from django.http import QueryDict
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from docx import Document as DocxDocument
+
+from documents import (autocomplete, birthdays, bulk_import, campaigns, context_processors, conversion, doc_jobs,
+                       exports, extraction, folder_sharing, folder_tree, loadtest, notifications, outbox, overdue,
+                       placeholders, search, task_metrics, task_stats)
+from documents.models import (Contact, CustomUser, Department, Document, DocumentJob, Email, EmailCampaign, File,
+                              Folder, Notification, NotificationFanout, OutboundEmail, Role, SearchEntry, StaffProfile,
+                              Task, TaskDailyStat, Team, UserNotification)
+from documents.viewfuncs import email_views, folder_views
+from tenants.models import Tenant
+
+
+def make_tenant(name='Acme'):
+    tenant = Tenant.objects.create(name=name, slug=name.lower())
+    user = CustomUser.objects.create_user(username=f'{name.lower()}-admin', password='x', tenant=tenant)
+    return tenant, user
+
+
+class NotificationPayloadTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.tenant, self.user = make_tenant()
+        self.other = CustomUser.objects.create_user(username='ada', tenant=self.tenant)
+
+    def notify(self, title, user=None, type=Notification.NotificationType.EVENT, **fields):
+        notification = Notification.objects.create(tenant=self.tenant, title=title, type=type, **fields)
+        UserNotification.objects.create(tenant=self.tenant, user=user or self.user, notification=notification)
+        return notification
+
+    def payload(self):
+        return notifications.get_payload(self.user, self.tenant.id)
+
+    def test_bar_lists_the_users_undismissed_items_birthdays_first(self):
+        event = self.notify('Standup')
+        birthday = self.notify('Birthdays', type=Notification.NotificationType.BIRTHDAY)
+        self.notify('Expired', expires_at=timezone.now() - timedelta(minutes=1))
+        self.notify('News', type=Notification.NotificationType.NEWS)
+        self.notify('For Ada', user=self.other)
+        UserNotification.objects.filter(notification__title='Standup').update(dismissed=True)
+        self.notify('Retro')
+        with self.assertNumQueries(3):
+            payload = notifications.NotificationPayload.build(self.user, self.tenant.id)
+        self.assertEqual([n.title for n in payload.bar_items], ['Birthdays', 'Retro'])
+        self.assertNotIn(event, payload.bar_items)
+        self.assertIn(birthday, payload.bar_items)
+        self.assertEqual(payload.unseen_count, 4)
+
+    def test_todays_celebrants_split_into_self_and_others(self):
+        today = timezone.localdate()
+        StaffProfile.objects.create(tenant=self.tenant, user=self.user, first_name='Al', last_name='A',
+                                    date_of_birth=today.replace(year=1990))
+        StaffProfile.objects.create(tenant=self.tenant, user=self.other, first_name='Ada', last_name='L',
+                                    date_of_birth=today.replace(year=1985))
+        payload = self.payload()
+        self.assertTrue(payload.birthday_self)
+        self.assertEqual([p.first_name for p in payload.birthday_others], ['Ada'])
+
+    def test_payload_is_cached_until_a_notification_changes(self):
+        self.notify('Standup')
+        self.assertEqual(self.payload().unseen_count, 1)
+        with self.assertNumQueries(0):
+            self.payload()
+        self.notify('Retro')
+        self.assertEqual([n.title for n in self.payload().bar_items], ['Retro', 'Standup'])
+
+    def test_dismissing_invalidates_only_that_user(self):
+        self.notify('Standup')
+        self.notify('Standup for Ada', user=self.other)
+        self.payload()
+        notifications.get_payload(self.other, self.tenant.id)
+        UserNotification.objects.filter(user=self.user).update(dismissed=True)
+        # update() sends no signal; callers invalidate explicitly
+        self.assertEqual(self.payload().unseen_count, 1)
+        notifications.invalidate_users([self.user.id])
+        self.assertEqual(self.payload().unseen_count, 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(notifications.get_payload(self.other, self.tenant.id).unseen_count, 1)
+
+    def test_timeout_stops_at_the_earliest_expiry(self):
+        expires_at = timezone.now() + timedelta(seconds=20)
+        payload = notifications.NotificationPayload(expires_at=expires_at)
+        self.assertLessEqual(payload.timeout(), 20)
+        self.assertGreaterEqual(notifications.NotificationPayload().timeout(), 1)
+
+    def test_context_processors_query_only_when_read(self):
+        self.notify('Standup')
+        request = RequestFactory().get('/')
+        request.user, request.tenant = self.user, self.tenant
+        with self.assertNumQueries(0):
+            count = context_processors.notification_count(request)['unseen_notification_count']
+            context_processors.notification_bar(request)
+        self.assertEqual(count, 1)
+
+
+class BirthdayNotificationTests(TestCase):
+    DAY = date(2024, 3, 14)
+
+    def setUp(self):
+        caches['default'].clear()
+        self.tenant, self.user = make_tenant()
+        self.ada = self.celebrant('ada', 'Ada', date(1990, 3, 14))
+        self.bob = self.celebrant('bob', 'Bob', date(1985, 3, 14))
+        self.celebrant('cy', 'Cy', date(1985, 3, 15))
+        CustomUser.objects.create_user(username='gone', tenant=self.tenant, is_active=False)
+        other_tenant, self.other_user = make_tenant('Other')
+        StaffProfile.objects.create(tenant=other_tenant, user=self.other_user, first_name='Zed', last_name='',
+                                    date_of_birth=date(2000, 3, 14))
+
+    def celebrant(self, username, first_name, born):
+        user = CustomUser.objects.create_user(username=username, tenant=self.tenant)
+        StaffProfile.objects.create(tenant=self.tenant, user=user, first_name=first_name, last_name='', date_of_birth=born)
+        return user
+
+    def titles_for(self, user):
+        return sorted(UserNotification.objects.filter(user=user).values_list('notification__title', flat=True))
+
+    def test_celebrants_get_their_own_and_everyone_else_the_list(self):
+        self.assertEqual(birthdays.generate_birthday_notifications(self.DAY), (4, 5))
+        self.assertEqual(self.titles_for(self.ada), ['Happy Birthday, Ada!'])
+        self.assertEqual(self.titles_for(self.user), ['Birthdays Today! 🎉'])
+        self.assertEqual(Notification.objects.get(tenant=self.tenant, title='Birthdays Today! 🎉').message,
+                         "Today is Ada and Bob's birthday. Wish them a happy birthday!")
+        self.assertFalse(UserNotification.objects.filter(user__username='gone').exists())
+        # The other tenant's only user is its celebrant, so it has no list to send
+        self.assertEqual(self.titles_for(self.other_user), ['Happy Birthday, Zed!'])
+
+    def test_rerunning_the_same_day_creates_nothing(self):
+        birthdays.generate_birthday_notifications(self.DAY)
+        self.assertEqual(birthdays.generate_birthday_notifications(self.DAY), (0, 0))
+        self.assertEqual((Notification.objects.count(), UserNotification.objects.count()), (4, 5))
+
+    def test_generation_invalidates_the_cached_bar(self):
+        self.assertEqual(notifications.get_payload(self.user, self.tenant.id).unseen_count, 0)
+        birthdays.generate_birthday_notifications(self.DAY)
+        self.assertEqual(notifications.get_payload(self.user, self.tenant.id).unseen_count, 1)
+
+    def test_days_without_celebrants_write_nothing(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(birthdays.generate_birthday_notifications(date(2024, 1, 1)), (0, 0))
+
+
+class NotifyUsersTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.tenant, self.user = make_tenant()
+        self.users = [CustomUser.objects.create_user(username=f'user{i}', tenant=self.tenant) for i in range(5)]
+        self.ids = [user.id for user in self.users]
+        self.notification = Notification.objects.create(tenant=self.tenant, title='Task assigned')
+
+    def recipients(self):
+        return sorted(UserNotification.objects.filter(notification=self.notification).values_list('user_id', flat=True))
+
+    @override_settings(NOTIFICATION_FANOUT_BATCH_SIZE=2)
+    def test_small_fan_outs_are_written_in_batches(self):
+        with self.assertNumQueries(3):
+            self.assertEqual(notifications.notify_users(self.tenant, self.notification, self.ids + self.ids[:2]), 5)
+        self.assertEqual(self.recipients(), self.ids)
+        # Repeats are no-ops
+        self.assertEqual(notifications.notify_users(self.tenant, self.notification, self.ids[:1]), 1)
+        self.assertEqual(len(self.recipients()), 5)
+        self.assertEqual(notifications.notify_users(self.tenant, self.notification, []), 0)
+
+    def test_fan_out_invalidates_the_recipients_bars(self):
+        self.assertEqual(notifications.get_payload(self.users[0], self.tenant.id).unseen_count, 0)
+        notifications.notify_users(self.tenant, self.notification, self.ids)
+        self.assertEqual(notifications.get_payload(self.users[0], self.tenant.id).unseen_count, 1)
+
+    @override_settings(NOTIFICATION_FANOUT_SYNC_LIMIT=3)
+    def test_large_fan_outs_are_deferred_to_the_worker(self):
+        self.assertEqual(notifications.notify_users(self.tenant, self.notification, self.ids), 0)
+        self.assertEqual(self.recipients(), [])
+        self.assertEqual(notifications.process_pending_fanouts(), 1)
+        self.assertEqual(self.recipients(), self.ids)
+        self.assertEqual(NotificationFanout.objects.get().status, 'done')
+        self.assertEqual(notifications.process_pending_fanouts(), 0)
+
+    def test_failed_fan_outs_are_retried_then_given_up(self):
+        notifications.notify_users(self.tenant, self.notification, self.ids, defer=True)
+        with mock.patch.object(notifications, '_fan_out', side_effect=RuntimeError('boom')):
+            for _ in range(2):
+                self.assertEqual(notifications.process_pending_fanouts(max_attempts=2), 0)
+        fanout = NotificationFanout.objects.get()
+        self.assertEqual((fanout.status, fanout.attempts, fanout.last_error), ('failed', 2, 'boom'))
+        self.assertEqual(self.recipients(), [])
+
+
+class FlakyBackend(EmailBackend):
+    """A pooled SMTP connection whose next sends raise the queued errors (shared between connections)."""
+
+    def __init__(self, errors=None, **kwargs):
+        super().__init__(**kwargs)
+        self.errors = [] if errors is None else errors
+        self.closed = False
+
+    def send_messages(self, messages):
+        if self.errors:
+            raise self.errors.pop(0)
+        return super().send_messages(messages)
+
+    def close(self):
+        self.closed = True
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.connections = []
+        self.errors = []
+        patcher = mock.patch.object(outbox, 'get_email_smtp_connection', side_effect=self.connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def connect(self, provider, sender_email, password):
+        self.assertEqual(password, 'app-password')
+        connection = FlakyBackend(self.errors)
+        self.connections.append(connection)
+        return connection, None
+
+    def enqueue(self, sender='ada@example.com', subject='Hello'):
+        return outbox.enqueue_email(subject, 'Body', ['bob@example.com'], 'Gmail', sender, 'app-password')
+
+    def test_queued_mail_is_sent_over_one_pooled_connection_per_sender(self):
+        first, second = self.enqueue(), self.enqueue(subject='Again')
+        self.enqueue(sender='cy@example.com')
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(outbox.process_outbox(), (3, 0))
+        self.assertEqual(len(self.connections), 2)
+        self.assertEqual(sorted(message.subject for message in mail.outbox), ['Again', 'Hello', 'Hello'])
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts, first.smtp_password), ('sent', 1, ''))
+        self.assertEqual(outbox.process_outbox(), (0, 0))
+
+    def test_failures_back_off_then_give_up(self):
+        self.errors.extend([smtplib.SMTPException('busy')] * 2)
+        message = self.enqueue()
+        with self.settings(MAIL_MAX_ATTEMPTS=2, MAIL_RETRY_BASE_DELAY=60):
+            self.assertEqual(outbox.process_outbox(), (0, 1))
+            message.refresh_from_db()
+            self.assertEqual((message.status, message.attempts, message.last_error), ('queued', 1, 'busy'))
+            self.assertGreater(message.next_attempt_at, timezone.now() + timedelta(seconds=45))
+            # Not due yet
+            self.assertEqual(outbox.process_outbox(), (0, 0))
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(outbox.process_outbox(), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts, message.smtp_password), ('failed', 2, ''))
+
+    def test_a_dropped_session_is_retried_once_on_a_fresh_connection(self):
+        self.errors.append(smtplib.SMTPServerDisconnected())
+        self.enqueue()
+        self.assertEqual(outbox.process_outbox(), (1, 0))
+        self.assertEqual(len(self.connections), 2)
+        self.assertTrue(self.connections[0].closed)
+
+    def test_rows_of_a_dead_worker_are_reclaimed(self):
+        stale, fresh = self.enqueue(), self.enqueue()
+        OutboundEmail.objects.filter(id=stale.id).update(status='sending', locked_at=timezone.now() - timedelta(hours=1))
+        OutboundEmail.objects.filter(id=fresh.id).update(status='sending', locked_at=timezone.now())
+        self.assertEqual(outbox.process_outbox(), (1, 0))
+        self.assertEqual(OutboundEmail.objects.get(id=fresh.id).status, 'sending')
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        with self.settings(MAIL_RETRY_BASE_DELAY=10, MAIL_RETRY_MAX_DELAY=100):
+            self.assertTrue(8 <= outbox.backoff_delay(1).total_seconds() <= 12)
+            self.assertTrue(32 <= outbox.backoff_delay(3).total_seconds() <= 48)
+            self.assertTrue(80 <= outbox.backoff_delay(10).total_seconds() <= 120)
+
+
+class SMTPConnectionPoolTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(outbox, 'get_email_smtp_connection',
+                                    side_effect=lambda *args: (FlakyBackend(), None))
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = outbox.SMTPConnectionPool(max_per_sender=1, idle_timeout=60)
+
+    def test_released_connections_are_reused(self):
+        connection = self.pool.acquire('gmail', 'ada@example.com', 'x')
+        self.pool.release('gmail', 'ada@example.com', connection)
+        self.assertIs(self.pool.acquire('gmail', 'ada@example.com', 'x'), connection)
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_a_sender_waits_for_its_connection_limit(self):
+        connection = self.pool.acquire('gmail', 'ada@example.com', 'x')
+        with self.assertRaises(outbox.SMTPUnavailable):
+            self.pool.acquire('gmail', 'ada@example.com', 'x', timeout=0.01)
+        # Other senders have their own limit
+        self.pool.acquire('gmail', 'bob@example.com', 'x')
+        self.pool.discard('gmail', 'ada@example.com', connection)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(self.pool.acquire('gmail', 'ada@example.com', 'x', timeout=0.01), connection)
+
+    def test_idle_connections_are_closed(self):
+        pool = outbox.SMTPConnectionPool(max_per_sender=1, idle_timeout=0.001)
+        connection = pool.acquire('gmail', 'ada@example.com', 'x')
+        pool.release('gmail', 'ada@example.com', connection)
+        time.sleep(0.01)
+        pool.close_idle()
+        self.assertTrue(connection.closed)
+
+    def test_connect_failures_free_the_slot(self):
+        self.connect.side_effect = lambda *args: (None, 'Authentication failed')
+        with self.assertRaisesMessage(outbox.SMTPUnavailable, 'Authentication failed'):
+            self.pool.acquire('gmail', 'ada@example.com', 'x')
+        self.connect.side_effect = lambda *args: (FlakyBackend(), None)
+        self.pool.acquire('gmail', 'ada@example.com', 'x', timeout=0.01)
+
+
+@override_settings(MAIL_RATE_LIMITS={'gmail': (6000, 100)}, MAIL_CAMPAIGN_BATCH_SIZE=2)
+class CampaignTests(TestCase):
+    def setUp(self):
+        campaigns._buckets.clear()
+        self.tenant, self.user = make_tenant()
+        self.user.email_provider, self.user.email_address = 'gmail', 'ada@acme.com'
+        self.user.set_smtp_password('app-password')
+        self.user.save()
+        self.email = Email.objects.create(tenant=self.tenant, sender=self.user, to_emails='[]',
+                                          subject='News for {{ first_name }}', body='Dear {{ name }} <{{ email }}>')
+        for i, name in enumerate(['Ada Lovelace', 'Bob Stone', 'Cy Young', 'Dee Dee', 'Eve Moss']):
+            Contact.objects.create(tenant=self.tenant, created_by=self.user, name=name, email=f'c{i}@example.com')
+        other_tenant, other_user = make_tenant('Other')
+        Contact.objects.create(tenant=other_tenant, created_by=other_user, name='Zed', email='zed@example.com')
+        self.backend_class = FlakyBackend
+        patcher = mock.patch.object(outbox, 'get_email_smtp_connection',
+                                    side_effect=lambda *args: (self.backend_class(), None))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def start(self, audience='contacts'):
+        return campaigns.start_campaign(self.email, audience, self.user)
+
+    def test_only_admins_can_start_a_campaign(self):
+        def post():
+            request = RequestFactory().post('/', {'audience': 'contacts'})
+            request.user, request.tenant = self.user, self.tenant
+            return email_views.send_email_campaign(request, self.email.id)
+
+        self.assertTrue(post().url.startswith(settings.LOGIN_URL))
+        self.assertFalse(EmailCampaign.objects.exists())
+        self.user.roles.add(Role.objects.get_or_create(name='Admin')[0])
+        post()
+        self.assertEqual(EmailCampaign.objects.get().audience, 'contacts')
+
+    def test_campaign_sends_personalized_messages_to_the_tenant_audience(self):
+        campaign = self.start()
+        self.assertEqual(campaigns.process_campaigns(), 1)
+        self.assertEqual([message.to for message in mail.outbox], [[f'c{i}@example.com'] for i in range(5)])
+        self.assertEqual((mail.outbox[0].subject, mail.outbox[0].body),
+                         ('News for Ada', 'Dear Ada Lovelace <c0@example.com>'))
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.status, campaign.sent_count, campaign.smtp_password), ('done', 5, ''))
+        self.email.refresh_from_db()
+        self.assertTrue(self.email.sent)
+        self.assertEqual(campaigns.process_campaigns(), 0)
+
+    def test_staff_audience_falls_back_to_the_user_email(self):
+        for username, profile_email in [('bob', ''), ('cy', 'cy@work.example.com'), ('dee', '')]:
+            user = CustomUser.objects.create_user(username=username, tenant=self.tenant,
+                                                  email='' if username == 'dee' else f'{username}@example.com')
+            StaffProfile.objects.create(tenant=self.tenant, user=user, first_name=username.title(), last_name='X',
+                                        email=profile_email)
+        self.start('staff')
+        campaigns.process_campaigns()
+        self.assertEqual([message.to for message in mail.outbox], [['bob@example.com'], ['cy@work.example.com']])
+
+    def test_an_interrupted_campaign_resumes_after_its_checkpoint(self):
+        class CrashOnSecondBatch(FlakyBackend):
+            batches = 0
+
+            def send_messages(backend, messages):
+                CrashOnSecondBatch.batches += 1
+                if CrashOnSecondBatch.batches == 2:
+                    raise RuntimeError('worker died')
+                return super().send_messages(messages)
+
+        self.backend_class = CrashOnSecondBatch
+        campaign = self.start()
+        campaigns.process_campaigns()
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.status, campaign.sent_count, campaign.locked_at), ('running', 2, None))
+        self.assertEqual(campaign.last_recipient_id, Contact.objects.get(name='Bob Stone').id)
+        # Not retried before its next attempt
+        self.assertEqual(campaigns.process_campaigns(), 0)
+        EmailCampaign.objects.update(next_attempt_at=timezone.now())
+        campaigns.process_campaigns()
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.status, campaign.sent_count), ('done', 5))
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(len({message.to[0] for message in mail.outbox}), 5)
+
+    def test_rejected_batches_back_off_and_keep_the_checkpoint(self):
+        class Refusing(FlakyBackend):
+            def send_messages(backend, messages):
+                return 0
+
+        self.backend_class = Refusing
+        campaign = self.start()
+        with self.settings(MAIL_MAX_ATTEMPTS=2):
+            campaigns.process_campaigns()
+            campaign.refresh_from_db()
+            self.assertEqual((campaign.status, campaign.attempts, campaign.last_recipient_id), ('running', 1, 0))
+            self.assertGreater(campaign.next_attempt_at, timezone.now())
+            EmailCampaign.objects.update(next_attempt_at=timezone.now())
+            campaigns.process_campaigns()
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.status, campaign.last_error), ('failed', 'No message in the batch was accepted'))
+
+    def test_a_cancelled_campaign_stops_at_the_next_checkpoint(self):
+        class CancelDuringSend(FlakyBackend):
+            def send_messages(backend, messages):
+                EmailCampaign.objects.update(status='cancelled')
+                return super().send_messages(messages)
+
+        self.backend_class = CancelDuringSend
+        campaign = self.start()
+        campaigns.process_campaigns()
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.status, campaign.sent_count, len(mail.outbox)), ('cancelled', 0, 2))
+
+    def test_only_the_known_placeholders_are_substituted(self):
+        self.email.subject = '{% if x %}Hi{% endif %} {{first_name}}'
+        self.email.body = '{{ name }} {{ missing'
+        self.email.save()
+        self.start()
+        campaigns.process_campaigns()
+        self.assertEqual((mail.outbox[0].subject, mail.outbox[0].body),
+                         ('{% if x %}Hi{% endif %} Ada', 'Ada Lovelace {{ missing'))
+
+    def test_unknown_placeholders_are_rejected(self):
+        self.email.body = 'Dear {{ user.password }} {{ phone }}'
+        with self.assertRaisesMessage(campaigns.CampaignError, 'Unknown placeholder(s): phone.'):
+            self.start()
+        self.assertFalse(EmailCampaign.objects.exists())
+
+    def test_a_draft_broken_after_queueing_fails_the_campaign(self):
+        campaign = self.start()
+        Email.objects.filter(pk=self.email.pk).update(subject='{{ salary }}')
+        campaigns.process_campaigns()
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.status, campaign.smtp_password), ('failed', ''))
+        self.assertIn('salary', campaign.last_error)
+        self.assertEqual(mail.outbox, [])
+
+    def test_unexpected_errors_stop_after_max_attempts(self):
+        class Broken(FlakyBackend):
+            def send_messages(backend, messages):
+                raise RuntimeError('bug')
+
+        self.backend_class = Broken
+        campaign = self.start()
+        with self.settings(MAIL_MAX_ATTEMPTS=2):
+            campaigns.process_campaigns()
+            campaign.refresh_from_db()
+            self.assertEqual((campaign.status, campaign.attempts, campaign.last_error), ('running', 1, 'bug'))
+            EmailCampaign.objects.update(next_attempt_at=timezone.now())
+            campaigns.process_campaigns()
+        campaign.refresh_from_db()
+        self.assertEqual((campaign.status, campaign.attempts, campaign.smtp_password), ('failed', 2, ''))
+
+    def test_token_bucket_waits_for_refill(self):
+        bucket = campaigns.TokenBucket(rate_per_minute=60, burst=2)
+        waits = []
+
+        def sleep(seconds):
+            waits.append(seconds)
+            bucket.updated -= seconds  # Let the time pass
+
+        bucket.acquire(2, sleep=sleep)
+        self.assertEqual(waits, [])
+        bucket.acquire(1, sleep=sleep)
+        self.assertEqual(len(waits), 1)
+        self.assertAlmostEqual(waits[0], 1, places=2)
+
+
+FAKE_SOFFICE = """#!%s
+import os, sys, time
+args = sys.argv[1:]
+outdir, source = args[args.index('--outdir') + 1], args[-1]
+with open(source) as f:
+    content = f.read()
+if content == 'hang':
+    time.sleep(30)
+if content == 'fail':
+    sys.exit('cannot read ' + source)
+with open(os.path.join(outdir, os.path.splitext(os.path.basename(source))[0] + '.pdf'), 'w') as f:
+    f.write('%%PDF ' + content)
+"""
+
+
+@mock.patch.object(conversion, 'uno', None)
+class ConversionPoolTests(SimpleTestCase):
+    """Runs the `soffice --convert-to` path against a stand-in soffice, so no LibreOffice is needed."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.soffice = os.path.join(self.dir, 'soffice')
+        with open(self.soffice, 'w') as f:
+            f.write(FAKE_SOFFICE % sys.executable)
+        os.chmod(self.soffice, 0o755)
+
+    def docx(self, content, name='Offer.docx'):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_converts_next_to_the_source_or_into_outdir(self):
+        pool = conversion.ConversionPool(size=1, soffice_path=self.soffice)
+        pdf = pool.convert(self.docx('hello'))
+        self.assertEqual(pdf, os.path.join(self.dir, 'Offer.pdf'))
+        outdir = os.path.join(self.dir, 'pdf')
+        pdf = pool.convert(self.docx('again'), outdir)
+        with open(pdf) as f:
+            self.assertEqual((os.path.dirname(pdf), f.read()), (outdir, '%PDF again'))
+        self.assertEqual(pool.workers[0].conversions, 2)
+
+    def test_failures_and_timeouts_raise_conversion_error(self):
+        pool = conversion.ConversionPool(size=1, soffice_path=self.soffice)
+        with self.assertRaisesMessage(conversion.ConversionError, 'cannot read'):
+            pool.convert(self.docx('fail'))
+        with self.assertRaisesMessage(conversion.ConversionError, 'timed out'):
+            pool.convert(self.docx('hang'), timeout=0.5)
+        # The worker went back to the pool
+        self.assertTrue(os.path.exists(pool.convert(self.docx('ok'))))
+
+    def test_callers_wait_for_a_free_worker(self):
+        pool = conversion.ConversionPool(size=1, soffice_path=self.soffice)
+        worker = pool._free.get()
+        with self.assertRaisesMessage(conversion.ConversionError, 'busy'):
+            pool.convert(self.docx('queued'), wait=0.1)
+        threading.Timer(0.2, pool._free.put, [worker]).start()
+        self.assertTrue(os.path.exists(pool.convert(self.docx('queued'), wait=5)))
+
+    def test_a_worker_whose_uno_soffice_cannot_start_falls_back_to_convert_to(self):
+        broken_uno = mock.Mock(**{'getComponentContext.side_effect': RuntimeError('no UNO bridge')})
+        with mock.patch.object(conversion, 'uno', broken_uno):
+            pool = conversion.ConversionPool(size=1, soffice_path=self.soffice)
+            with open(pool.convert(self.docx('hello'))) as f:
+                self.assertEqual(f.read(), '%PDF hello')
+            pool.convert(self.docx('again'))
+        # Tried at pool start and once more on first use, then no more
+        self.assertEqual(broken_uno.getComponentContext.call_count, 2)
+        self.assertFalse(pool.workers[0].use_uno)
+        self.assertFalse(pool.workers[0].is_alive())
+
+    def test_missing_libreoffice_is_reported(self):
+        with mock.patch.object(conversion, 'find_soffice', return_value=None):
+            with self.assertRaisesMessage(conversion.ConversionError, 'LibreOffice not found'):
+                conversion.ConversionPool(size=1)
+
+
+class DocumentJobTests(TestCase):
+    def setUp(self):
+        self.tenant, self.user = make_tenant()
+        self.document = Document.objects.create(
+            tenant=self.tenant, document_type='approval', company_name='Globex', company_address='1 Main St',
+            contact_person_name='Hank', contact_person_email='hank@globex.com', contact_person_designation='CEO',
+            sales_rep='Ada', created_by=self.user,
+        )
+        self.job = doc_jobs.enqueue_document_job(self.document)
+
+    def run_jobs(self, side_effect=None, return_value=''):
+        with mock.patch.object(doc_jobs, 'run_document_job', side_effect=side_effect, return_value=return_value) as run:
+            result = doc_jobs.process_document_jobs()
+        self.job.refresh_from_db()
+        return result, run
+
+    def test_a_finished_job_records_the_note_and_is_not_rerun(self):
+        result, run = self.run_jobs(return_value='Approval request not sent')
+        self.assertEqual(result, (1, 0))
+        self.assertEqual((self.job.status, self.job.attempts, self.job.error), ('done', 1, 'Approval request not sent'))
+        self.assertIsNone(self.job.locked_at)
+        result, run = self.run_jobs()
+        self.assertEqual(result, (0, 0))
+        run.assert_not_called()
+
+    def test_conversion_errors_are_retried_with_backoff(self):
+        with self.settings(DOC_JOB_MAX_ATTEMPTS=2):
+            result, _ = self.run_jobs(side_effect=conversion.ConversionError('busy'))
+            self.assertEqual(result, (0, 1))
+            self.assertEqual((self.job.status, self.job.attempts, self.job.error), ('queued', 1, 'busy'))
+            self.assertGreater(self.job.next_attempt_at, timezone.now())
+            # Not due yet
+            self.assertEqual(self.run_jobs()[0], (0, 0))
+            DocumentJob.objects.update(next_attempt_at=timezone.now())
+            self.run_jobs(side_effect=conversion.ConversionError('busy'))
+        self.assertEqual((self.job.status, self.job.attempts), ('failed', 2))
+        self.assertIsNotNone(self.job.finished_at)
+
+    def test_other_errors_fail_at_once(self):
+        self.run_jobs(side_effect=FileNotFoundError('Template not found'))
+        self.assertEqual((self.job.status, self.job.attempts, self.job.error), ('failed', 1, 'Template not found'))
+
+    def test_jobs_of_a_dead_worker_are_reclaimed(self):
+        DocumentJob.objects.update(status='running', locked_at=timezone.now())
+        self.assertEqual(self.run_jobs()[0], (0, 0))
+        DocumentJob.objects.update(locked_at=timezone.now() - doc_jobs.STALE_LOCK - timedelta(seconds=1))
+        self.assertEqual(self.run_jobs()[0], (1, 0))
+        self.assertEqual(self.job.status, 'done')
+
+
+def docx_content(doc):
+    """Text of every paragraph (body, tables, headers, footers) with the bold runs marked."""
+    paragraphs = list(doc.paragraphs)
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                paragraphs.extend(cell.paragraphs)
+    for section in doc.sections:
+        paragraphs.extend(section.header.paragraphs)
+        paragraphs.extend(section.footer.paragraphs)
+    return [[(run.text, bool(run.bold)) for run in paragraph.runs] for paragraph in paragraphs]
+
+
+class CompiledTemplateTests(SimpleTestCase):
+    REPLACEMENTS = {
+        "{{Company Name}}": "Globex & Sons",
+        "{{Company Address}}": "1 Main St <Suite 2>",
+        "{{Contact Person Name}}": "Hank Scorpio",
+        "{{Contact Person Email}}": "hank@globex.com",
+        "{{Contact Person Designation}}": "CEO,",
+        "{{Sales Rep}}": "Ada",
+    }
+
+    def setUp(self):
+        placeholders.template_cache.clear()
+
+    def test_rendered_templates_match_replace_placeholders(self):
+        for name, document_type in [("Approval Letter Template.docx", "approval"), ("SLA Template.docx", "sla")]:
+            path = os.path.join(settings.BASE_DIR, "documents/templates/docx_templates", name)
+            with self.subTest(name):
+                expected = placeholders.replace_placeholders(DocxDocument(path), dict(self.REPLACEMENTS), document_type)
+                output = io.BytesIO()
+                placeholders.render_template(path, self.REPLACEMENTS, document_type, output)
+                rendered = DocxDocument(io.BytesIO(output.getvalue()))
+                self.assertEqual(
+                    [''.join(text for text, _ in runs) for runs in docx_content(rendered)],
+                    [''.join(text for text, _ in runs) for runs in docx_content(expected)],
+                )
+                bold = lambda doc: [text for runs in docx_content(doc) for text, is_bold in runs
+                                    if is_bold and "Globex & Sons" in text]
+                self.assertEqual(bold(rendered), bold(expected))
+
+    def test_placeholders_split_over_runs_are_joined(self):
+        doc = DocxDocument()
+        paragraph = doc.add_paragraph("Dear {{Contact ")
+        paragraph.add_run("Person Name}}, from ")
+        paragraph.add_run("{{Company Name}}")
+        path = os.path.join(self.tmpdir(), "split.docx")
+        doc.save(path)
+        compiled = placeholders.template_cache.get(path)
+        self.assertEqual(compiled.placeholders, ["{{Company Name}}", "{{Contact Person Name}}"])
+        output = io.BytesIO()
+        compiled.render(self.REPLACEMENTS, output)
+        [paragraph] = DocxDocument(io.BytesIO(output.getvalue())).paragraphs
+        self.assertEqual(paragraph.text, "Dear Hank Scorpio, from Globex & Sons")
+        self.assertEqual([run.bold for run in paragraph.runs], [None, None, True])
+
+    def test_edited_templates_are_recompiled(self):
+        path = os.path.join(self.tmpdir(), "letter.docx")
+        doc = DocxDocument()
+        doc.add_paragraph("{{Sales Rep}}")
+        doc.save(path)
+        first = placeholders.template_cache.get(path)
+        self.assertIs(placeholders.template_cache.get(path), first)
+        doc.add_paragraph("{{Company Name}}")
+        doc.save(path)
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+        second = placeholders.template_cache.get(path)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.placeholders, ["{{Company Name}}", "{{Sales Rep}}"])
+        self.assertEqual(len(placeholders.template_cache._items), 1)
+
+    def tmpdir(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        return tmp.name
+
+
+class TaskMetricsTests(TestCase):
+    def setUp(self):
+        self.tenant, self.boss = make_tenant()
+        self.ada = CustomUser.objects.create_user(username='ada', tenant=self.tenant)
+        self.bob = CustomUser.objects.create_user(username='bob', tenant=self.tenant)
+        now = timezone.now()
+        self.task('Shared report', [self.ada, self.bob], status='completed', completed_at=now - timedelta(days=2))
+        self.task('Old audit', [self.ada], status='completed', completed_at=now - timedelta(days=60))
+        self.task('Late invoice', [self.ada], status='overdue', due_date=timezone.localdate() - timedelta(days=1))
+        self.task('Own notes', [self.ada], created_by=self.ada)
+        self.task('Boss chores', [self.boss])
+
+    def task(self, title, assignees, created_by=None, **fields):
+        task = Task.objects.create(tenant=self.tenant, title=title, description='', created_by=created_by or self.boss,
+                                   **fields)
+        task.assigned_to.set(assignees)
+        return task
+
+    def test_summary_counts_distinct_tasks_in_one_query(self):
+        with self.assertNumQueries(1):
+            summary = task_metrics.TaskMetrics.for_user(self.tenant, self.ada).summary()
+        self.assertEqual(summary, {
+            'total_tasks': 4, 'completed_tasks': 2, 'weekly_completed': 1, 'monthly_completed': 1,
+            'yearly_completed': 2, 'overdue_tasks': 1, 'completion_percentage': 50.0,
+        })
+        summary = task_metrics.TaskMetrics.corporate(self.tenant, [self.boss.id]).summary()
+        # The shared task counts once; the boss's self-assigned task is not corporate work
+        self.assertEqual((summary['total_tasks'], summary['completed_tasks']), (3, 2))
+
+    def test_categories_split_on_the_creator(self):
+        personal = task_metrics.TaskMetrics.for_user(self.tenant, self.ada, 'personal').summary()
+        corporate = task_metrics.TaskMetrics.for_user(self.tenant, self.ada, 'corporate').summary()
+        self.assertEqual((personal['total_tasks'], corporate['total_tasks']), (1, 3))
+
+    def test_per_user_counts_each_assignee_in_one_query(self):
+        metrics = task_metrics.TaskMetrics.corporate(self.tenant, [self.boss.id, self.ada.id])
+        with self.assertNumQueries(1):
+            rows = metrics.per_user([self.ada.id, self.bob.id, self.boss.id])
+        self.assertEqual(rows, {
+            self.ada.id: {'total_tasks': 3, 'completed_tasks': 2, 'completion_percentage': 66.67},
+            self.bob.id: {'total_tasks': 1, 'completed_tasks': 1, 'completion_percentage': 100.0},
+            self.boss.id: {'total_tasks': 0, 'completed_tasks': 0, 'completion_percentage': 0},
+        })
+
+
+class TaskDailyStatTests(TestCase):
+    def setUp(self):
+        self.tenant, self.boss = make_tenant()
+        self.ada = CustomUser.objects.create_user(username='ada', tenant=self.tenant)
+        self.bob = CustomUser.objects.create_user(username='bob', tenant=self.tenant)
+
+    def task(self, title, assignees, created_by=None, **fields):
+        task = Task.objects.create(tenant=self.tenant, title=title, description='', created_by=created_by or self.boss,
+                                   **fields)
+        task.assigned_to.set(assignees)
+        return task
+
+    def assertRollupMatchesTasks(self, users=None, periods=True):
+        # Completions in a period are counted when they happen, so unassigning a
+        # completed task later changes the live figures but not the rollup's
+        fields = None if periods else ('total_tasks', 'completed_tasks', 'overdue_tasks', 'completion_percentage')
+        for user in users or (self.ada, self.bob, self.boss):
+            for category in ('overall', 'personal', 'corporate'):
+                with self.subTest(user=user.username, category=category):
+                    rollup = task_stats.user_summary(self.tenant, user, category)
+                    live = task_metrics.TaskMetrics.for_user(self.tenant, user, category).summary()
+                    if fields:
+                        rollup, live = ({field: counts[field] for field in fields} for counts in (rollup, live))
+                    self.assertEqual(rollup, live)
+        tenant_counts = {row['status']: row['count'] for row in task_stats.tenant_status_counts()}
+        expected = {}
+        for status in Task.objects.filter(tenant=self.tenant).values_list('status', flat=True):
+            expected[status] = expected.get(status, 0) + 1
+        self.assertEqual(tenant_counts, expected)
+
+    def test_signals_keep_the_rollup_current(self):
+        shared = self.task('Shared report', [self.ada, self.bob])
+        own = self.task('Own notes', [self.ada], created_by=self.ada)
+        self.assertRollupMatchesTasks()
+
+        shared.status = 'completed'
+        shared.completed_at = timezone.now()
+        shared.save()
+        shared.assigned_to.remove(self.bob)
+        own.assigned_to.add(self.boss)
+        self.ada.task_set.remove(own)  # Reverse side of the relation
+        self.assertRollupMatchesTasks(periods=False)
+
+        shared.assigned_to.clear()
+        own.delete()
+        self.assertRollupMatchesTasks(periods=False)
+
+    def test_reloaded_tasks_are_counted_from_their_stored_status(self):
+        task = self.task('Audit', [self.ada])
+        task = Task.objects.get(pk=task.pk)
+        task.status = 'in_progress'
+        task.save()
+        task.save()  # No change the second time
+        self.assertRollupMatchesTasks()
+
+    def test_update_status_keeps_the_rollup_current(self):
+        self.task('Late invoice', [self.ada, self.bob], due_date=timezone.localdate() - timedelta(days=1))
+        self.task('Late report', [self.ada], created_by=self.ada, due_date=timezone.localdate() - timedelta(days=1))
+        self.task('Done', [self.bob], status='completed', completed_at=timezone.now())
+        self.assertEqual(task_stats.update_status(Task.objects.filter(status='pending'), 'overdue'), 2)
+        self.assertEqual(task_stats.update_status(Task.objects.filter(status='pending'), 'overdue'), 0)
+        self.assertRollupMatchesTasks()
+
+    def test_rebuild_matches_the_signal_maintained_rollup(self):
+        self.task('Shared report', [self.ada, self.bob], status='completed', completed_at=timezone.now())
+        self.task('Own notes', [self.ada], created_by=self.ada)
+        Task.objects.filter(title='Own notes').update(status='on_hold')  # Bypasses the signals
+        self.assertEqual(task_stats.rebuild([self.tenant.id]), 5)
+        self.assertRollupMatchesTasks()
+
+    def test_data_migration_fills_the_rollup_like_rebuild(self):
+        self.task('Shared report', [self.ada, self.bob], status='completed', completed_at=timezone.now())
+        self.task('Own notes', [self.ada], created_by=self.ada)
+        TaskDailyStat.objects.all().delete()
+        migration = importlib.import_module('documents.migrations.0088_populate_task_stats')
+        migration.populate_task_stats(global_apps, None)
+        fields = ('tenant', 'user', 'personal', 'day', 'status', 'entered')
+        populated = list(TaskDailyStat.objects.values_list(*fields))
+        self.assertEqual(len(populated), 5)
+        task_stats.rebuild()
+        self.assertCountEqual(TaskDailyStat.objects.values_list(*fields), populated)
+
+    def test_deleting_a_user_or_tenant_does_not_fail(self):
+        self.task('Shared report', [self.ada, self.bob])
+        self.bob.delete()
+        self.assertRollupMatchesTasks(users=[self.ada, self.boss])
+        self.tenant.delete()
+        self.assertFalse(TaskDailyStat.objects.exists())
+
+
+class OverdueSweepTests(TestCase):
+    def setUp(self):
+        self.tenant, self.user = make_tenant()
+        self.other_tenant, self.other_user = make_tenant('Globex')
+        self.yesterday = timezone.localdate() - timedelta(days=1)
+
+    def task(self, tenant, user, status='pending', due_date=None):
+        task = Task.objects.create(tenant=tenant, title='Task', description='', created_by=user, status=status,
+                                   due_date=due_date or self.yesterday)
+        task.assigned_to.set([user])
+        return task
+
+    def test_open_tasks_past_due_are_swept_in_batches_per_tenant(self):
+        for status in ('pending', 'in_progress', 'on_hold'):
+            self.task(self.tenant, self.user, status)
+        self.task(self.other_tenant, self.other_user)
+        kept = [
+            self.task(self.tenant, self.user, 'completed'),
+            self.task(self.tenant, self.user, 'cancelled'),
+            self.task(self.tenant, self.user, due_date=timezone.localdate()),
+        ]
+        with mock.patch.object(overdue, 'update_status', wraps=overdue.update_status) as update:
+            self.assertEqual(overdue.sweep_overdue_tasks(batch_size=2), 4)
+        # Acme: a full batch, then the rest; Globex: one short batch
+        self.assertEqual(update.call_count, 3)
+        self.assertEqual(Task.objects.filter(status='overdue').count(), 4)
+        self.assertEqual([task.status for task in Task.objects.filter(id__in=[t.id for t in kept]).order_by('id')],
+                         ['completed', 'cancelled', 'pending'])
+        self.assertEqual(overdue.sweep_overdue_tasks(batch_size=2), 0)
+
+    def test_sweeping_keeps_the_rollup_current(self):
+        self.task(self.tenant, self.user)
+        overdue.sweep_overdue_tasks()
+        summary = task_stats.user_summary(self.tenant, self.user)
+        self.assertEqual((summary['total_tasks'], summary['overdue_tasks']), (1, 1))
+
+
+class QueryPlanCheckTests(TestCase):
+    def test_view_queries_use_indexes(self):
+        tenant, user = make_tenant()
+        Task.objects.create(tenant=tenant, title='Task', description='', created_by=user).assigned_to.set([user])
+        out = io.StringIO()
+        try:
+            call_command('check_query_plans', tenant='acme', stdout=out)
+        except CommandError:
+            self.fail(out.getvalue())
+        self.assertIn('overdue sweep: ok', out.getvalue())
+
+    def test_unknown_tenant_is_an_error(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown tenant slug'):
+            call_command('check_query_plans', tenant='globex', stdout=io.StringIO())
+
+
+class LoadTestSeedTests(TestCase):
+    def test_seeded_tenants_are_reproducible_and_rolled_up(self):
+        counts = loadtest.seed(1, scale=0.05, prefix='a', seed=7)
+        loadtest.seed(1, scale=0.05, prefix='b', seed=7)
+        self.assertEqual(list(counts), ['a-1'])
+        self.assertEqual((counts['a-1']['users'], counts['a-1']['tasks']), (2, 100))
+        titles = [list(Task.objects.filter(tenant__slug=slug).order_by('id').values_list('title', 'status'))
+                  for slug in ('a-1', 'b-1')]
+        self.assertEqual(titles[0], titles[1])
+
+        tenant = Tenant.objects.get(slug='a-1')
+        tenant_counts = {row['status']: row['count'] for row in task_stats.tenant_status_counts()
+                         if row['tenant__id'] == tenant.id}
+        self.assertEqual(sum(tenant_counts.values()), 100)
+        users = loadtest.benchmark_users(tenant)
+        self.assertTrue(users['admin'].roles.filter(name='Admin').exists())
+        self.assertEqual(list(loadtest.seeded_tenants('a')), [tenant])
+
+
+class FolderTreeTests(SimpleTestCase):
+    # (id, parent_id, name, is_public, created_by_id, depth, file_count, file_size), in load()'s order
+    ROWS = [
+        (1, None, 'Public', True, 7, 0, 1, 100),
+        (5, None, 'Mine', False, 7, 0, 0, 0),
+        (2, 1, 'HR', True, 7, 1, 2, 20),
+        (3, 1, 'Sales', True, 7, 1, 0, 0),
+        (4, 2, 'Payroll', True, 7, 2, 3, 3),
+    ]
+
+    def setUp(self):
+        self.tree = folder_tree.FolderTree(1, self.ROWS)
+
+    def test_descendants_are_the_pre_order_span(self):
+        self.assertEqual(self.tree.descendant_ids(1), [2, 4, 3])
+        self.assertEqual(self.tree.descendant_ids(2), [4])
+        self.assertEqual(self.tree.descendant_ids(4), [])
+        self.assertEqual(self.tree.descendant_ids(5), [])
+
+    def test_breadcrumbs_run_from_the_root(self):
+        self.assertEqual([node.name for node in self.tree.breadcrumbs(4)], ['Public', 'HR', 'Payroll'])
+        self.assertEqual([node.name for node in self.tree.breadcrumbs(5)], ['Mine'])
+        self.assertEqual(self.tree.breadcrumbs(99), [])
+
+    def test_is_descendant_excludes_the_folder_itself(self):
+        self.assertTrue(self.tree.is_descendant(4, 1))
+        self.assertTrue(self.tree.is_descendant(4, 2))
+        self.assertFalse(self.tree.is_descendant(4, 4))
+        self.assertFalse(self.tree.is_descendant(2, 4))
+        self.assertFalse(self.tree.is_descendant(3, 2))
+
+    def test_subtree_totals_include_every_descendant(self):
+        self.assertEqual(self.tree.subtree_file_count(1), 6)
+        self.assertEqual(self.tree.subtree_size(1), 123)
+        self.assertEqual(self.tree.subtree_file_count(2), 5)
+        self.assertEqual(self.tree.subtree_size(3), 0)
+
+    def test_folders_by_visibility(self):
+        self.assertEqual([node.id for node in self.tree.folders(is_public=True)], [1, 2, 4, 3])
+        self.assertEqual([node.id for node in self.tree.folders(is_public=False)], [5])
+        self.assertEqual(len(self.tree.folders()), 5)
+
+
+class FolderTreeLoadTests(TestCase):
+    def setUp(self):
+        self.tenant, self.user = make_tenant()
+        self.root = Folder.objects.create(tenant=self.tenant, name='Root', created_by=self.user, is_public=True)
+        self.child = Folder.objects.create(tenant=self.tenant, name='Child', parent=self.root, created_by=self.user,
+                                           is_public=True)
+        File.objects.create(tenant=self.tenant, folder=self.child, file='uploads/a.txt', original_name='a.txt', size=10)
+        other_tenant, other_user = make_tenant('Other')
+        Folder.objects.create(tenant=other_tenant, name='Elsewhere', created_by=other_user)
+
+    def test_load_reads_one_tenant_with_file_totals(self):
+        tree = folder_tree.load(self.tenant.id)
+        self.assertEqual([node.name for node in tree.folders()], ['Root', 'Child'])
+        self.assertEqual(tree.get(self.child.id).depth, 1)
+        self.assertEqual((tree.subtree_file_count(self.root.id), tree.subtree_size(self.root.id)), (1, 10))
+
+    def test_get_tree_reloads_when_a_current_folder_is_missing(self):
+        folder_tree.get_tree(self.tenant.id)
+        # bulk_create sends no signal, like a save handled by another worker
+        new = Folder.objects.bulk_create([
+            Folder(tenant=self.tenant, name='New', parent=self.root, created_by=self.user, is_public=True),
+        ])[0]
+        self.assertNotIn(new.id, folder_tree.get_tree(self.tenant.id))
+        tree = folder_tree.get_tree(self.tenant.id, current=[self.root, new])
+        self.assertEqual([node.name for node in tree.breadcrumbs(new.id)], ['Root', 'New'])
+
+    def test_get_tree_reloads_when_a_current_folder_is_missing(self):
+        folder_tree.get_tree(self.tenant.id)
+
+
+class FolderSharingTests(TestCase):
+    def setUp(self):
+        self.tenant, self.user = make_tenant()
+        self.top = self.folder('Top')
+        self.middle = self.folder('Middle', self.top)
+        self.bottom = self.folder('Bottom', self.middle)
+        self.top_file = self.file('top.txt', self.top)
+        self.bottom_file = self.file('bottom.txt', self.bottom)
+
+    def folder(self, name, parent=None):
+        return Folder.objects.create(tenant=self.tenant, name=name, parent=parent, created_by=self.user, is_public=True)
+
+    def file(self, name, folder):
+        return File.objects.create(tenant=self.tenant, folder=folder, file=f'uploads/{name}', original_name=name, size=1)
+
+    def shared(self, *objects):
+        return [type(obj).objects.values_list('is_shared', 'shared_via_id').get(pk=obj.pk) for obj in objects]
+
+    def post(self, view, data, *args):
+        request = RequestFactory().post('/', data)
+        request.user, request.tenant = self.user, self.tenant
+        return view(request, *args)
+
+    def test_share_reaches_the_whole_subtree(self):
+        folder_sharing.share(self.top, self.user, subfolders=True, files=True)
+        self.assertEqual(self.shared(self.top), [(True, None)])
+        self.assertEqual(self.shared(self.middle, self.bottom, self.top_file, self.bottom_file), [(True, self.top.id)] * 4)
+
+    def test_share_without_options_shares_only_the_folder(self):
+        folder_sharing.share(self.top, self.user)
+        self.assertEqual(self.shared(self.middle, self.top_file), [(False, None)] * 2)
+
+    def test_share_includes_subfolders_created_without_signals(self):
+        # A folder saved through another worker is missing from that worker's cached tree
+        folder_tree.get_tree(self.tenant.id)
+        late = Folder.objects.bulk_create([
+            Folder(tenant=self.tenant, name='Late', parent=self.bottom, created_by=self.user, is_public=True),
+        ])[0]
+        folder_sharing.share(self.top, self.user, subfolders=True)
+        self.assertEqual(self.shared(late), [(True, self.top.id)])
+
+    def test_unshare_keeps_rows_shared_directly(self):
+        folder_sharing.share(self.middle, self.user)
+        folder_sharing.share(self.top, self.user, subfolders=True, files=True)
+        folder_sharing.unshare(self.top)
+        self.assertEqual(self.shared(self.top, self.bottom, self.top_file), [(False, None)] * 3)
+        self.assertEqual(self.shared(self.middle), [(True, None)])
+
+    def test_reshare_drops_what_the_earlier_options_granted(self):
+        folder_sharing.share(self.top, self.user, subfolders=True, files=True)
+        folder_sharing.share(self.top, self.user, subfolders=True)
+        self.assertEqual(self.shared(self.bottom), [(True, self.top.id)])
+        self.assertEqual(self.shared(self.top_file, self.bottom_file), [(False, None)] * 2)
+
+    def test_detach_drops_shares_inherited_from_outside_the_moved_subtree(self):
+        folder_sharing.share(self.bottom, self.user, files=True)
+        folder_sharing.share(self.top, self.user, subfolders=True, files=True)
+        elsewhere = self.folder('Elsewhere')
+        self.middle.parent = elsewhere
+        self.middle.save()
+        folder_sharing.detach(self.middle)
+        self.assertEqual(self.shared(self.middle), [(False, None)])
+        # Bottom's own share, and the file it shares, are inside the moved subtree
+        self.assertEqual(self.shared(self.bottom), [(True, None)])
+        self.assertEqual(self.shared(self.bottom_file), [(True, self.bottom.id)])
+        self.assertEqual(self.shared(self.top_file), [(True, self.top.id)])
+
+
+    def test_folder_created_below_a_shared_folder_inherits_its_share(self):
+        folder_sharing.share(self.top, self.user, subfolders=True)
+        self.post(folder_views.create_folder, {'name': 'New', 'tab': 'public', 'parent': self.bottom.id})
+        new = Folder.objects.get(name='New')
+        self.assertEqual(self.shared(new), [(True, self.top.id)])
+        folder_sharing.unshare(self.top)
+        self.assertEqual(self.shared(new), [(False, None)])
+
+    def test_folder_moved_below_a_shared_folder_inherits_its_share(self):
+        folder_sharing.share(self.top, self.user, subfolders=True, files=True)
+        elsewhere = self.folder('Elsewhere')
+        inner = self.folder('Inner', elsewhere)
+        inner_file = self.file('inner.txt', inner)
+        self.post(folder_views.move_folder, {'tab': 'public', 'new_parent_id': self.middle.id}, elsewhere.id)
+        self.assertEqual(self.shared(elsewhere, inner, inner_file), [(True, self.top.id)] * 3)
+
+    def test_folder_created_below_a_folder_shared_alone_is_not_shared(self):
+        folder_sharing.share(self.top, self.user)
+        self.post(folder_views.create_folder, {'name': 'New', 'tab': 'public', 'parent': self.top.id})
+        self.assertEqual(self.shared(Folder.objects.get(name='New')), [(False, None)])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.tenant, self.admin = make_tenant()
+        self.sales = Department.objects.create(tenant=self.tenant, name='Sales')
+        self.ops = Department.objects.create(tenant=self.tenant, name='Ops')
+        self.ada = CustomUser.objects.create_user(username='ada', first_name='Ada', last_name='Lovelace',
+                                                  tenant=self.tenant, department=self.sales)
+        self.bob = CustomUser.objects.create_user(username='bob', tenant=self.tenant, department=self.ops)
+        self.other_tenant, self.outsider = make_tenant('Globex')
+
+    def contact(self, name, created_by, department=None, is_public=True):
+        return Contact.objects.create(tenant=created_by.tenant, name=name, email=f'{name.lower()}@example.com',
+                                      created_by=created_by, department=department, is_public=is_public)
+
+    def visible(self, user, kinds=None):
+        return sorted(search.visible_entries(user, kinds).values_list('kind', 'title'))
+
+    def test_contacts_follow_the_contact_list_rules(self):
+        self.contact('Sales lead', self.admin, self.sales)
+        self.contact('Ops lead', self.admin, self.ops)
+        self.contact('Ada private', self.ada, is_public=False)
+        self.contact('Bob public', self.bob)
+        self.contact('Globex lead', self.outsider)
+        self.assertEqual(self.visible(self.ada, ['contact']), [('contact', 'Ada private'), ('contact', 'Sales lead')])
+        self.assertEqual(self.visible(self.bob, ['contact']), [('contact', 'Bob public'), ('contact', 'Ops lead')])
+
+    def test_tasks_are_visible_to_assignees_creators_and_hods(self):
+        task = Task.objects.create(tenant=self.tenant, title='Quarterly report', description='', created_by=self.admin)
+        task.assigned_to.set([self.ada])
+        self.assertEqual(self.visible(self.ada, ['task']), [('task', 'Quarterly report')])
+        self.assertEqual(self.visible(self.admin, ['task']), [('task', 'Quarterly report')])
+        self.assertEqual(self.visible(self.bob, ['task']), [])
+        self.bob.roles.add(Role.objects.get_or_create(name='HOD')[0])
+        self.assertEqual(self.visible(self.bob, ['task']), [('task', 'Quarterly report')])
+
+    def test_personal_folders_and_files_are_listed_to_their_owner(self):
+        shared = Folder.objects.create(tenant=self.tenant, name='Shared plans', created_by=self.ada, is_public=True)
+        mine = Folder.objects.create(tenant=self.tenant, name='Ada plans', created_by=self.ada, is_public=False)
+        File.objects.create(tenant=self.tenant, folder=mine, file='uploads/cv.pdf', original_name='cv.pdf',
+                            uploaded_by=self.ada)
+        File.objects.create(tenant=self.tenant, folder=shared, file='uploads/plan.pdf', original_name='plan.pdf',
+                            uploaded_by=self.ada)
+        self.assertEqual(self.visible(self.ada, ['folder', 'file']), [
+            ('file', 'cv.pdf'), ('file', 'plan.pdf'), ('folder', 'Ada plans'), ('folder', 'Shared plans'),
+        ])
+        self.assertEqual(self.visible(self.bob, ['folder', 'file']), [('file', 'plan.pdf'), ('folder', 'Shared plans')])
+
+    def test_search_ranks_title_prefixes_first_within_the_tenant(self):
+        CustomUser.objects.create_user(username='globex-ada', first_name='Ada', tenant=self.other_tenant)
+        self.contact('Lovelace Ada', self.ada)
+        self.contact('Adams', self.ada, is_public=False)
+        results = search.search(self.ada, ' ADA ')
+        self.assertEqual([result['title'] for result in results], ['Adams', 'Ada Lovelace', 'Lovelace Ada'])
+        self.assertEqual(results[1]['kind'], 'person')
+        self.assertEqual([result['title'] for result in search.search(self.ada, 'ad', kinds=['person'])],
+                         ['Ada Lovelace', 'acme-admin'])
+        self.assertEqual(search.search(self.ada, '  '), [])
+
+    def test_people_match_their_staff_profile_names(self):
+        profile = self.bob.staff_profile
+        profile.first_name, profile.last_name = 'Robert', 'Marley'
+        profile.save()
+        self.assertEqual([result['title'] for result in search.search(self.admin, 'marley')], ['bob'])
+        search.rebuild()
+        self.assertEqual([result['title'] for result in search.search(self.admin, 'robert')], ['bob'])
+
+    def test_signals_and_rebuild_agree(self):
+        contact = self.contact('Sales lead', self.admin, self.sales)
+        contact.name = 'Key account'
+        contact.email = 'key@example.com'
+        contact.save()
+        self.assertEqual(search.search(self.admin, 'sales lead'), [])
+        self.assertEqual([result['title'] for result in search.search(self.admin, 'key acc')], ['Key account'])
+        signalled = sorted(SearchEntry.objects.values_list('kind', 'object_id', 'title', 'owner_id'))
+        search.rebuild()
+        self.assertEqual(sorted(SearchEntry.objects.values_list('kind', 'object_id', 'title', 'owner_id')), signalled)
+        contact.delete()
+        self.assertEqual(search.search(self.admin, 'key acc'), [])
+
+
+class ExtractionTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = media.name
+        settings_override = override_settings(MEDIA_ROOT=self.media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.tenant, self.user = make_tenant()
+        self.folder = Folder.objects.create(tenant=self.tenant, name='Docs', created_by=self.user, is_public=True)
+
+    def upload(self, name, data):
+        os.makedirs(os.path.join(self.media, 'uploads'), exist_ok=True)
+        with open(os.path.join(self.media, 'uploads', name), 'wb') as f:
+            f.write(data)
+        return self.file(name)
+
+    def file(self, name):
+        file = File.objects.create(tenant=self.tenant, folder=self.folder, file=f'uploads/{name}', original_name=name,
+                                   size=1)
+        return SearchEntry.objects.get(kind='file', object_id=file.pk)
+
+    def extract(self, entry):
+        entry = SearchEntry.objects.get(pk=entry.pk)
+        return extraction.extract_entry(entry), SearchEntry.objects.get(pk=entry.pk)
+
+    def test_text_is_extracted_once_and_shared_between_copies(self):
+        entry = self.upload('notes.txt', b'Quarterly  Revenue\nUp')
+        outcome, entry = self.extract(entry)
+        self.assertEqual((outcome, entry.body, entry.content_source), ('extracted', 'quarterly revenue up', entry.source))
+        self.assertNotIn(entry, extraction.due_entries())
+        self.assertEqual([result['title'] for result in search.search(self.user, 'revenue')], ['notes.txt'])
+
+        copy = self.upload('copy.txt', b'Quarterly  Revenue\nUp')
+        self.assertEqual(self.extract(copy)[0], 'reused')
+        # Saved again with the same bytes
+        SearchEntry.objects.filter(pk=entry.pk).update(content_source='')
+        self.assertEqual(self.extract(entry)[0], 'unchanged')
+
+    def test_files_that_cannot_be_read_get_an_empty_body(self):
+        self.assertEqual(self.extract(self.file('missing.txt'))[0], 'failed')
+        outcome, entry = self.extract(self.upload('broken.docx', b'not a zip'))
+        self.assertEqual((outcome, entry.body), ('failed', ''))
+        self.assertNotIn(entry, extraction.due_entries())
+        self.assertEqual(self.extract(self.upload('image.png', b'\x89PNG'))[0], 'extracted')
+        with self.settings(SEARCH_EXTRACT_MAX_BYTES=3):
+            self.assertEqual(self.extract(self.upload('big.txt', b'1234'))[0], 'skipped')
+
+    def test_removed_files_clear_the_body(self):
+        entry = self.upload('notes.txt', b'hello')
+        self.extract(entry)
+        SearchEntry.objects.filter(pk=entry.pk).update(source='')
+        outcome, entry = self.extract(entry)
+        self.assertEqual((outcome, entry.body, entry.content_hash), ('cleared', '', ''))
+
+    @mock.patch.object(extraction, 'PdfReader', None)
+    def test_pdfs_wait_while_pypdf_is_missing(self):
+        pdf = self.upload('letter.pdf', b'%PDF-1.4')
+        text = self.upload('notes.txt', b'hello')
+        self.assertEqual(list(extraction.due_entries()), [text])
+        outcome, pdf = self.extract(pdf)
+        self.assertEqual((outcome, pdf.content_source), ('waiting', ''))
+        self.assertEqual(extraction.process_pending(), {'extracted': 1})
+
+    def test_pdfs_are_read_with_pypdf(self):
+        page = mock.Mock(**{'extract_text.return_value': 'Offer Letter'})
+        reader = mock.Mock(return_value=mock.Mock(pages=[page, page]))
+        with mock.patch.object(extraction, 'PdfReader', reader):
+            outcome, entry = self.extract(self.upload('letter.pdf', b'%PDF-1.4'))
+        self.assertEqual((outcome, entry.body), ('extracted', 'offer letter offer letter'))
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.ada = autocomplete.ContactItem(1, 'Ada Lovelace', 'ada@acme.com')
+        self.adam = autocomplete.ContactItem(2, 'Adam Smith', 'adam@globex.com')
+        self.bob = autocomplete.ContactItem(3, 'Bob Adams', 'bob@acme.com')
+        self.index = autocomplete.PrefixIndex(autocomplete.CONTACTS, [
+            (item, autocomplete._keys(item.name, item.email)) for item in (self.bob, self.adam, self.ada)
+        ])
+
+    def test_keys_cover_words_whole_values_and_the_email_domain(self):
+        self.assertEqual(autocomplete._keys('  Ada   Lovelace ', 'Ada@Acme.com', None), {
+            'ada lovelace', 'ada', 'lovelace', 'ada@acme.com', 'acme', 'com', 'acme.com',
+        })
+
+    def test_lookup_matches_any_key_prefix_in_key_order(self):
+        self.assertEqual(self.index.lookup('ada'), [self.ada, self.adam, self.bob])
+        self.assertEqual(self.index.lookup('acme.'), [self.ada, self.bob])
+        self.assertEqual(self.index.lookup('smith'), [self.adam])
+        self.assertEqual(self.index.lookup('zed'), [])
+
+    def test_lookup_counts_each_item_once_towards_the_limit(self):
+        # 'acme' sorts first; Ada's other keys starting with 'a' do not fill the second place
+        self.assertEqual(self.index.lookup('a', limit=2), [self.ada, self.bob])
+        self.assertEqual(self.index.lookup('ada', predicate=lambda item: item.id != 1), [self.adam, self.bob])
+
+    def test_add_replaces_the_keys_of_the_same_id(self):
+        renamed = autocomplete.ContactItem(1, 'Grace Hopper', 'grace@navy.mil')
+        self.index.add(renamed, autocomplete._keys(renamed.name, renamed.email))
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.lookup('ada'), [self.adam, self.bob])
+        self.assertEqual(self.index.lookup('hop'), [renamed])
+
+    def test_discard_removes_every_key(self):
+        self.index.discard(2)
+        self.index.discard(99)
+        self.assertEqual(self.index.lookup('ad'), [self.ada, self.bob])
+        self.assertEqual(self.index.lookup('globex'), [])
+
+
+class PeopleAutocompleteTests(TestCase):
+    def setUp(self):
+        autocomplete._indexes.clear()
+        self.tenant, self.user = make_tenant()
+        self.ada = CustomUser.objects.create_user(username='ada', first_name='Ada', last_name='Lovelace',
+                                                  email='ada@acme.com', tenant=self.tenant)
+        make_tenant('Other')
+
+    def tearDown(self):
+        autocomplete._indexes.clear()
+
+    def test_people_are_looked_up_within_the_tenant(self):
+        self.assertEqual([person.username for person in autocomplete.people(self.tenant.id, ' Ada ')], ['ada'])
+        self.assertEqual([person.username for person in autocomplete.people(self.tenant.id, 'other')], [])
+
+    def test_sales_reps_filter_on_the_role(self):
+        self.assertEqual(autocomplete.people(self.tenant.id, 'ada', sales_reps=True), [])
+        autocomplete._indexes.clear()
+        self.ada.roles.add(Role.objects.create(name=autocomplete.SALES_REP_ROLE))
+        self.assertEqual([person.name for person in autocomplete.people(self.tenant.id, 'ada', sales_reps=True)],
+                         ['Ada Lovelace'])
+
+    def test_saves_update_the_loaded_index_on_commit(self):
+        autocomplete.people(self.tenant.id, 'ada')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ada.last_name = 'King'
+            self.ada.save()
+        self.assertEqual(autocomplete.people(self.tenant.id, 'lovelace'), [])
+        self.assertEqual([person.name for person in autocomplete.people(self.tenant.id, 'king')], ['Ada King'])
+
+
+def xlsx_rows(data):
+    """Cell texts per row of the single worksheet written by exports.write_xlsx."""
+    namespace = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+    return [[''.join(cell.itertext()) for cell in row] for row in sheet.iter(f'{namespace}row')]
+
+
+class ExportWriterTests(SimpleTestCase):
+    ROWS = [
+        ['Name', 'Active', 'Joined', 'Salary', 'Notes'],
+        ['Ada, Countess', True, date(2024, 1, 31), Decimal('1200.50'), None],
+        ['Bob <b>&</b>', False, None, 7, 'line\x01break'],
+    ]
+
+    def test_csv_quotes_and_formats_values(self):
+        data = b''.join(exports.write_csv(self.ROWS)).decode()
+        self.assertEqual(data.splitlines(), [
+            'Name,Active,Joined,Salary,Notes',
+            '"Ada, Countess",Yes,2024-01-31,1200.50,',
+            'Bob <b>&</b>,No,,7,line\x01break',
+        ])
+
+    def test_csv_streams_in_batches(self):
+        chunks = list(exports.write_csv(self.ROWS, batch_size=1))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(b''.join(chunks), b''.join(exports.write_csv(self.ROWS)))
+
+    def test_xlsx_holds_the_same_cells(self):
+        data = b''.join(exports.write_xlsx(self.ROWS, sheet_name='People', batch_size=1))
+        self.assertEqual(xlsx_rows(data), [
+            ['Name', 'Active', 'Joined', 'Salary', 'Notes'],
+            ['Ada, Countess', 'Yes', '2024-01-31', '1200.50', ''],
+            # Characters XML cannot carry are dropped
+            ['Bob <b>&</b>', 'No', '', '7', 'linebreak'],
+        ])
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            self.assertIn(b'name="People"', archive.read('xl/workbook.xml'))
+
+
+class StaffExportTests(TestCase):
+    def setUp(self):
+        self.tenant, self.user = make_tenant()
+        sales = Department.objects.create(tenant=self.tenant, name='Sales')
+        teams = [Team.objects.create(tenant=self.tenant, name=name, department=sales) for name in ('North', 'East')]
+        self.ada = CustomUser.objects.create_user(username='ada', first_name='Ada', last_name='Lovelace',
+                                                  tenant=self.tenant, department=sales)
+        self.ada.staff_profile.team.set(teams)
+        bob = CustomUser.objects.create_user(username='bob', tenant=self.tenant)
+        StaffProfile.objects.create(user=bob, tenant=self.tenant, first_name='Bob', last_name='Stone')
+        other_tenant, _ = make_tenant('Other')
+        zed = CustomUser.objects.create_user(username='zed', tenant=other_tenant)
+        StaffProfile.objects.create(user=zed, tenant=other_tenant, first_name='Zed', last_name='Zed')
+        self.exporter = exports.EXPORTERS['staff']
+
+    def test_rows_resolve_teams_per_chunk(self):
+        with self.settings(EXPORT_CHUNK_SIZE=1):
+            rows = list(self.exporter.rows(self.exporter.queryset_for(self.user, QueryDict())))
+        self.assertEqual(rows[0], ['Name', 'Phone Number', 'Email', 'Sex', 'Designation', 'Department', 'Team'])
+        self.assertEqual(rows[1:], [
+            ['Ada  Lovelace', 'N/A', 'N/A', 'N/A', 'N/A', 'Sales', 'East, North'],
+            ['Bob  Stone', 'N/A', 'N/A', 'N/A', 'N/A', 'N/A', 'N/A'],
+        ])
+
+    def test_ids_select_rows_by_user(self):
+        rows = list(self.exporter.rows(self.exporter.queryset_for(self.user, QueryDict(f'ids={self.ada.id}'))))
+        self.assertEqual([row[0] for row in rows[1:]], ['Ada  Lovelace'])
+
+
+def csv_upload(text):
+    return io.BytesIO(text.encode('utf-8'))
+
+
+class BulkImportTests(TestCase):
+    def setUp(self):
+        self.tenant, self.user = make_tenant()
+        self.sales = Department.objects.create(tenant=self.tenant, name='Sales')
+
+    def import_users(self, text, **kwargs):
+        return bulk_import.import_file('users', csv_upload(text), self.tenant, filename='users.csv', **kwargs)
+
+    def test_read_rows_normalizes_headers_and_skips_blank_lines(self):
+        rows = list(bulk_import.read_rows(csv_upload('User Name,E-mail \n\nada, ada@example.com\n,\n'), 'u.csv'))
+        self.assertEqual(rows, [(3, {'user_name': 'ada', 'e_mail': 'ada@example.com'})])
+
+    def test_read_rows_reads_exported_xlsx(self):
+        data = b''.join(exports.write_xlsx(ExportWriterTests.ROWS, batch_size=1))
+        self.assertEqual(list(bulk_import.read_rows(io.BytesIO(data), 'export.xlsx')), [
+            (2, {'name': 'Ada, Countess', 'active': 'Yes', 'joined': '2024-01-31', 'salary': '1200.50', 'notes': ''}),
+            (3, {'name': 'Bob <b>&</b>', 'active': 'No', 'joined': '', 'salary': '7', 'notes': 'linebreak'}),
+        ])
+
+    def test_read_rows_rejects_other_formats(self):
+        with self.assertRaises(bulk_import.RowError):
+            list(bulk_import.read_rows(csv_upload('username\nada\n'), 'users.txt'))
+
+    def test_invalid_values_are_reported_by_line(self):
+        report = self.import_users(
+            'username,email,date_of_birth,department,is_active\n'
+            'ada,not-an-email,,,\n'
+            'bob,,31/01/1990,,\n'
+            'cy,,,Marketing,\n'
+            'dee,,,,maybe\n'
+            ',,,,\n'
+        )
+        self.assertEqual(report.errors, [
+            (2, "email 'not-an-email' is not a valid email address."),
+            (3, "date_of_birth must be a date like 2024-01-31."),
+            (4, "Unknown department 'Marketing'."),
+            (5, "is_active must be yes or no."),
+        ])
+        self.assertEqual((report.rows, report.created, report.failed), (4, 0, 4))
+
+    def test_dates_accept_excel_serials(self):
+        data = bulk_import.UserImporter(self.tenant).validate({'username': 'ada', 'date_of_birth': '45322'})
+        self.assertEqual(str(data['date_of_birth']), '2024-01-31')
+
+    def test_corrected_copy_of_a_rejected_row_imports(self):
+        report = self.import_users('username,email\nada,oops\nada,ada@example.com\nada,ada@example.org\n')
+        self.assertEqual(report.errors, [
+            (2, "email 'oops' is not a valid email address."),
+            (4, "Username 'ada' appears more than once in the file."),
+        ])
+        self.assertEqual(CustomUser.objects.get(username='ada').email, 'ada@example.com')
+
+    def test_taken_usernames_are_reported(self):
+        report = self.import_users(f'username\n{self.user.username}\nada\n')
+        self.assertEqual(report.errors, [(2, f"Username '{self.user.username}' is already taken.")])
+        self.assertEqual(report.created, 1)
+
+    def test_dry_run_writes_nothing(self):
+        report = self.import_users('username\nada\nbob\n', dry_run=True)
+        self.assertEqual((report.created, report.failed), (0, 0))
+        self.assertFalse(CustomUser.objects.filter(username__in=['ada', 'bob']).exists())
+
+    def test_import_writes_users_profiles_and_one_log_entry(self):
+        report = self.import_users(
+            'username,first_name,department,password\nada,Ada,sales,secret\nbob,Bob,,\n', user=self.user,
+        )
+        self.assertEqual(report.created, 2)
+        ada = CustomUser.objects.get(username='ada')
+        self.assertEqual((ada.tenant, ada.department), (self.tenant, self.sales))
+        self.assertTrue(ada.check_password('secret'))
+        self.assertFalse(CustomUser.objects.get(username='bob').has_usable_password())
+        self.assertEqual(StaffProfile.objects.get(user=ada).first_name, 'Ada')
+        entry = LogEntry.objects.get(user=self.user)
+        self.assertEqual(entry.action_flag, ADDITION)
+        self.assertIn('ada, bob', entry.change_message)
@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import create_document, document_list, home, send_approved_email, autocomplete_sales_rep, create_from_editor
+from .views import create_document, document_list, home, send_approved_email, autocomplete_sales_rep, create_from_editor, document_job_status
 
 urlpatterns = [
     path("create/", create_document, name="create_document"),
     path("list/", document_list, name="document_list"),
+    path("jobs/status/", document_job_status, name="document_job_status"),
     # path("", home, name="document_home"),  # Renamed to avoid conflict
     path('autocomplete/sales-rep/', autocomplete_sales_rep, name='autocomplete_sales_rep'),
     path("create-editor/", create_from_editor, name="create_from_editor"),
@@ -1,13 +1,12 @@
 from django.contrib.auth.decorators import user_passes_test
 from documents.models import CustomUser, Document, Folder, File, Task, Department, Team, Event, EventParticipant, StaffProfile, Notification, UserNotification
-from documents.viewfuncs.mail_connection import get_email_smtp_connection
+from documents.outbox import enqueue_email
 from raadaa import settings
 from ..rba_decorators import is_admin 
 from django.http import HttpResponseForbidden
 from django.shortcuts import redirect
 from django.contrib.admin.models import LogEntry, CHANGE, ADDITION, DELETION
 from django.contrib.contenttypes.models import ContentType
-from django.core.mail import send_mail
 
 
 @user_passes_test(is_admin)
@@ -97,9 +96,8 @@ def bulk_action_users(request):
             admin_user = request.user
             sender_provider = admin_user.email_provider
             sender_email = admin_user.email_address
-            sender_password = admin_user.email_password
+            sender_password = admin_user.get_smtp_password()
             if sender_email and sender_password:
-                connection, error_message = get_email_smtp_connection(sender_provider, sender_email, sender_password)
                 if settings.DEBUG:
                     base_domain = "localhost:8000"
                     protocol = "http"
@@ -119,17 +117,9 @@ def bulk_action_users(request):
                     Best regards,  
                     {admin_user.get_full_name() or admin_user.username}
                     """
-                    try:
-                        send_mail(
-                            subject,
-                            message,
-                            sender_email,
-                            [user.email],
-                            connection=connection,
-                        )
-                    except Exception as e:
-                        print(f"Failed to send email to {user.email}: {e}")
-                        # Continue with other users even if one email fails
+                    # Delivered by the mail worker over one pooled connection
+                    enqueue_email(subject, message, [user.email], sender_provider, sender_email, sender_password,
+                                  tenant=request.tenant, kind="bulk_activation")
         else:
             return HttpResponseForbidden("Invalid action specified.")
     
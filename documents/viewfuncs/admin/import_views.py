@@ -0,0 +1,25 @@
+from django.contrib.auth.decorators import user_passes_test, login_required
+from django.http import HttpResponseForbidden
+from django.shortcuts import render
+from documents import bulk_import
+from documents.forms import BulkImportForm
+from ..rba_decorators import is_admin
+
+@login_required
+@user_passes_test(is_admin)
+def bulk_import_view(request):
+    # Onboard many users or contacts at once from a CSV/XLSX upload (documents/bulk_import.py)
+    if request.user.tenant != request.tenant:
+        return HttpResponseForbidden("Unauthorized: Admin does not belong to this company.")
+    report = None
+    if request.method == "POST":
+        form = BulkImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            report = bulk_import.import_file(
+                form.cleaned_data['kind'], form.cleaned_data['file'], request.tenant,
+                user=request.user, dry_run=form.cleaned_data['dry_run'],
+            )
+    else:
+        form = BulkImportForm()
+    columns = {kind: importer.columns for kind, importer in bulk_import.IMPORTERS.items()}
+    return render(request, "admin/bulk_import.html", {"form": form, "report": report, "columns": columns})
@@ -3,10 +3,10 @@
 # Create function for Editor documents in editor_docs.py
 
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.core.paginator import Paginator
-from documents.models import Document, CustomUser
+from documents.models import Document, DocumentJob, CustomUser
 from .rba_decorators import is_admin
 
 # List Document (both templated and Editor docs)
@@ -75,6 +75,14 @@ def document_list(request):
         id__in=Document.objects.filter(tenant=request.tenant).values_list('approved_by', flat=True).distinct()
     ).exclude(username__isnull=True).values_list('username', flat=True)
 
+    # Latest generation job of each listed document still in progress (or failed), for polling
+    jobs = {}
+    for job in DocumentJob.objects.filter(
+        document__in=[document.id for document in page_obj]
+    ).order_by('document_id', '-id').only('id', 'document_id', 'status', 'error'):
+        jobs.setdefault(job.document_id, job)
+    jobs = {document_id: job for document_id, job in jobs.items() if job.status != 'done'}
+
     # Debug filtered document count
     print(f"Filtered documents count: {documents.count()}")
 
@@ -93,9 +101,30 @@ def document_list(request):
         "distinct_companies": distinct_companies,
         "distinct_type": distinct_type,
         "distinct_created_by": distinct_created_by,
-        "distinct_approved_by": distinct_approved_by
+        "distinct_approved_by": distinct_approved_by,
+        "jobs": jobs,
     })
 
+# Generation job status, polled by the document list while documents are generated
+@login_required
+def document_job_status(request):
+    if request.user.tenant != request.tenant:
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+    ids = [int(i) for i in request.GET.get('ids', '').split(',') if i.strip().isdigit()][:50]
+    jobs = DocumentJob.objects.filter(tenant=request.tenant, id__in=ids).select_related('document')
+    return JsonResponse({'jobs': [
+        {
+            'id': job.id,
+            'document_id': job.document_id,
+            'status': job.status,
+            'error': job.error,
+            'pdf_url': job.document.pdf_file.url if job.document.pdf_file else None,
+            'word_url': job.document.word_file.url if job.document.word_file else None,
+        }
+        for job in jobs
+    ]})
+
 # Delete Document
 @login_required
 @user_passes_test(is_admin)
@@ -1,10 +1,11 @@
 # Editor Document Functions
 # Contains create for Document model (for editor type)
 
-import urllib.parse, requests, io, os, logging, platform, shutil, subprocess
+import urllib.parse, requests, io, os, logging
 from bs4 import BeautifulSoup
 from ckeditor_uploader.views import upload as ckeditor_upload
 from documents.forms import CreateDocumentForm
+from documents.conversion import convert, ConversionError
 from documents.models import Folder, File, Document
 from django.http import HttpResponseForbidden
 from django.core.exceptions import ValidationError
@@ -16,6 +17,7 @@ from django.utils.text import slugify
 from docx import Document as DocxDocument
 from docx.shared import Inches
 from raadaa import settings
+from tenants.observability import log_event
 
 logger = logging.getLogger(__name__)
 
@@ -225,40 +227,10 @@ def create_from_editor(request):
             else:
                 absolute_pdf_path = f"{settings.MEDIA_URL}{relative_pdf_path.rstrip('/')}/"
 
-            # Choose the right LibreOffice path
-            if platform.system() == "Windows":
-                paths = [
-                    r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
-                    r"C:\Program Files\LibreOffice\program\soffice.exe"
-                ]
-                libreoffice_path = next((p for p in paths if os.path.exists(p)), None)
-            else:
-                libreoffice_path = shutil.which("libreoffice") or shutil.which("soffice")
-
-            # Check if LibreOffice exists
-            if not libreoffice_path or not os.path.exists(libreoffice_path):
-                messages.error(request, "LibreOffice not found. Make sure it's installed and in PATH.")
-                return render(request, 'documents/create_from_editor.html', {'form': form})
-
             try:
-                print("Starting PDF conversion with LibreOffice")
-                abs_word_path = os.path.abspath(word_path)
+                # Convert with the warm LibreOffice pool (documents/conversion.py)
                 abs_output_dir = os.path.dirname(os.path.abspath(absolute_pdf_path))
-
-                # Run LibreOffice to convert .docx to .pdf
-                result = subprocess.run(
-                    [libreoffice_path, "--headless", "--convert-to", "pdf", "--outdir", abs_output_dir, abs_word_path],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    check=True,
-                    timeout=30
-                )
-
-                print("LibreOffice path:", libreoffice_path)
-                print("abs_word_path:", abs_word_path)
-                print("abs_output_dir:", abs_output_dir)
-                print("LibreOffice stdout:", result.stdout.decode())
-                print("LibreOffice stderr:", result.stderr.decode())
+                convert(word_path, abs_output_dir)
 
                 # Confirm output PDF file exists
                 if not os.path.exists(absolute_pdf_path):
@@ -267,13 +239,13 @@ def create_from_editor(request):
                     messages.error(request, "PDF file was not generated.")
                     return render(request, 'documents/create_from_editor.html', {'form': form})
 
-            except subprocess.CalledProcessError as e:
-                print(f"LibreOffice conversion error: {e.stderr.decode()}")
-                messages.error(request, f"Error converting to PDF: {e.stderr.decode()}")
+            except ConversionError as e:
+                log_event("conversion.failed", level=logging.WARNING, view="create_from_editor", error=str(e))
+                messages.error(request, f"Error converting to PDF: {e}")
                 return render(request, 'documents/create_from_editor.html', {'form': form})
 
             except Exception as e:
-                print(f"Unexpected error during PDF conversion: {e}")
+                log_event("conversion.error", level=logging.ERROR, exc_info=True, view="create_from_editor")
                 messages.error(request, f"Unexpected error converting to PDF: {e}")
                 return render(request, 'documents/create_from_editor.html', {'form': form})
 
@@ -1,19 +1,27 @@
-from datetime import timezone
 import logging
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from documents.forms import EmailForm
-from documents.models import Email, Attachment, CustomUser
+from documents.models import Email, EmailCampaign, Attachment, CustomUser
 from django.http import HttpResponseForbidden, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.core.paginator import Paginator
-from django.core.mail import EmailMessage
-
-
-from documents.viewfuncs.mail_connection import get_email_smtp_connection
+from documents.campaigns import CampaignError, start_campaign
+from documents.outbox import enqueue_email
+from .rba_decorators import is_admin
 
 
 logger = logging.getLogger(__name__)
 
+def _enqueue(request, email):
+    user = request.user
+    return enqueue_email(
+        email.subject, email.body, email.get_to_emails(),
+        user.email_provider, user.email_address, user.get_smtp_password(),
+        cc=email.get_cc_emails(), bcc=email.get_bcc_emails(),
+        attachments=[attachment.file.path for attachment in email.attachments.all()],
+        tenant=request.tenant, kind="user_email", email=email,
+    )
+
 @login_required
 def email_list(request):
     if not hasattr(request, 'tenant') or request.user.tenant != request.tenant:
@@ -67,26 +75,8 @@ def edit_email(request, email_id):
 
             # If user wants to send the email
             if 'send' in request.POST:
-                sender_provider = request.user.email_provider
-                sender_email = request.user.email_address
-                sender_password = request.user.email_password
-                connection, error_message = get_email_smtp_connection(sender_provider,sender_email, sender_password)
-                email_msg = EmailMessage(
-                    subject=email.subject,
-                    body=email.body,
-                    from_email=sender_email,
-                    to=email.get_to_emails(),
-                    cc=email.get_cc_emails(),
-                    bcc=email.get_bcc_emails(),
-                    connection=connection
-                )
-                # Attach all files
-                for attachment in email.attachments.all():
-                    email_msg.attach_file(attachment.file.path)
-                email_msg.send()
-                email.sent = True
-                email.sent_at = timezone.now()
-                email.save()
+                # Queued; the mail worker marks the Email as sent once delivered
+                _enqueue(request, email)
                 return redirect('email_list')
 
             return redirect('email_list')
@@ -124,11 +114,6 @@ def send_email(request):
         print(f"Unauthorized access by user {request.user.username}: tenant mismatch")
         return render(request, 'error.html', {'message': 'You are not authorized for this tenant.'})
 
-    sender_provider = request.user.email_provider
-    sender_email = request.user.email_address
-    sender_password = request.user.email_password
-    connection, error_message = get_email_smtp_connection(sender_provider,sender_email, sender_password)
-
     # superuser = CustomUser.objects.get(is_superuser=True)
     # if not connection:
     #     sender_provider = superuser.email_provider
@@ -147,22 +132,8 @@ def send_email(request):
             email.save()
             form.save()  # Save attachments
 
-            # Send email
-            email_msg = EmailMessage(
-                subject=email.subject,
-                body=email.body,
-                from_email=sender_email,
-                to=email.get_to_emails(),
-                cc=email.get_cc_emails(),
-                bcc=email.get_bcc_emails(),
-                connection=connection
-            )
-            for attachment in email.attachments.all():
-                email_msg.attach_file(attachment.file.path)
-            email_msg.send()
-            email.sent = True
-            email.sent_at = timezone.now()
-            email.save()
+            # Queued; the mail worker marks the Email as sent once delivered
+            _enqueue(request, email)
             return redirect('email_list')
     else:
         form = EmailForm()
@@ -174,7 +145,38 @@ def email_detail(request, email_id):
         print(f"Unauthorized access by user {request.user.username}: tenant mismatch")
         return HttpResponseForbidden("You are not authorized for this company.")
     email = get_object_or_404(Email, id=email_id, tenant=request.tenant, sender=request.user)
-    return render(request, 'dashboard/email_detail.html', {'email': email})
+    campaigns = email.campaigns.order_by('-created_at')
+    return render(request, 'dashboard/email_detail.html', {
+        'email': email,
+        'campaigns': campaigns,
+        'audience_choices': EmailCampaign.AUDIENCE_CHOICES,
+        'can_send_campaign': bool(is_admin(request.user)),
+    })
+
+# Send the draft to every contact or staff member, personalized ({{ name }}, {{ first_name }}, {{ last_name }}, {{ email }})
+# Admins only: a campaign mails the whole tenant audience
+@login_required
+@user_passes_test(is_admin)
+def send_email_campaign(request, email_id):
+    if not hasattr(request, 'tenant') or request.user.tenant != request.tenant:
+        return HttpResponseForbidden("You are not authorized for this company.")
+    email = get_object_or_404(Email, id=email_id, tenant=request.tenant, sender=request.user)
+    if request.method != 'POST':
+        return redirect('email_detail', email_id=email.id)
+
+    audience = request.POST.get('audience')
+    if audience not in dict(EmailCampaign.AUDIENCE_CHOICES):
+        return HttpResponseForbidden("Invalid audience.")
+    if not (request.user.email_provider and request.user.email_address and request.user.email_password):
+        return HttpResponseForbidden("Your email credentials are missing. Configure them in Email Settings.")
+    if email.campaigns.filter(status__in=['queued', 'running']).exists():
+        return HttpResponseForbidden("A campaign for this email is already in progress.")
+
+    try:
+        start_campaign(email, audience, request.user)
+    except CampaignError as e:
+        return render(request, 'error.html', {'message': str(e)})
+    return redirect('email_detail', email_id=email.id)
 
 def delete_email(request, email_id):
     if not hasattr(request, 'tenant') or request.user.tenant != request.tenant:
@@ -0,0 +1,29 @@
+# CSV/XLSX downloads of the exporters in documents/exports.py
+import logging
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponseBadRequest, HttpResponseForbidden
+from documents import exports
+
+logger = logging.getLogger(__name__)
+
+@login_required
+def export_records(request, name):
+    # /exports/<name>/?format=csv|xlsx, optionally narrowed by ids=... and the exporter's filters
+    if not hasattr(request, 'tenant') or request.user.tenant != request.tenant:
+        logger.error(f"Unauthorized access by user {request.user.username}: tenant mismatch")
+        return HttpResponseForbidden("You are not authorized for this company.")
+    exporter = exports.EXPORTERS.get(name)
+    if exporter is None:
+        raise Http404("Unknown export.")
+    if not exporter.allowed(request.user):
+        return HttpResponseForbidden("You are not authorized to export these records.")
+    params = request.POST if request.method == 'POST' else request.GET
+    fmt = params.get('format', 'csv')
+    if fmt not in exports.WRITERS:
+        return HttpResponseBadRequest("Unsupported export format.")
+    try:
+        queryset = exporter.queryset_for(request.user, params)
+    except (ValueError, ValidationError):
+        return HttpResponseBadRequest("Invalid export filter.")
+    return exports.response(exporter, queryset, fmt)
@@ -133,6 +133,7 @@ def enable_file_sharing(request, file_id):
 
     if request.method == 'POST':
         file.is_shared = not file.is_shared
+        file.shared_via = None  # Shared (or unshared) directly from now on
         file.share_time = timezone.now()
         if end_date:
             file.share_time_end = end_date
@@ -4,10 +4,11 @@
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ValidationError
 from django.db import transaction
-from django.http import HttpResponseForbidden, JsonResponse
+from django.http import Http404, HttpResponseForbidden, JsonResponse
 from django.shortcuts import get_object_or_404, render
 from django.urls.base import reverse
 from django.utils import timezone
+from documents import folder_sharing, folder_tree
 from documents.models import Folder, File
 from documents.forms import FolderForm, FileUploadForm, FileUploadAnonForm
 import re
@@ -20,9 +21,6 @@ def folder_view(request, public_folder_id=None, personal_folder_id=None):
 
     # Get active tab, default to 'public'
     active_tab = request.GET.get('tab', 'public')
-    all_pub = Folder.objects.filter(tenant=request.tenant, is_public=True)
-    all_per = Folder.objects.filter(tenant=request.tenant, is_public=False)
-
     # Public tab context
     public_parent = None
     if public_folder_id:
@@ -61,6 +59,14 @@ def folder_view(request, public_folder_id=None, personal_folder_id=None):
         tenant=request.tenant,
         is_public=False
     )
+    # Whole folder tree of the tenant: one cached query for the move targets and breadcrumbs.
+    # Reloaded if it lacks a folder shown here (created through another worker).
+    tree = folder_tree.get_tree(
+        request.tenant.id, current=[public_parent, personal_parent, *public_folders, *personal_folders],
+    )
+    all_pub = tree.folders(is_public=True)
+    all_per = tree.folders(is_public=False)
+
     personal_files_1 = File.objects.filter(
         folder=personal_parent,
         uploaded_by=request.user,
@@ -114,6 +120,8 @@ def folder_view(request, public_folder_id=None, personal_folder_id=None):
         'file_form': file_form,
         'all_pub': all_pub,
         'all_per': all_per,
+        'public_breadcrumbs': tree.breadcrumbs(public_parent.id) if public_parent else [],
+        'personal_breadcrumbs': tree.breadcrumbs(personal_parent.id) if personal_parent else [],
     })
 
 # Create Folders
@@ -147,6 +155,7 @@ def create_folder(request):
                     return JsonResponse({'success': False, 'errors': 'Parent folder not found.'}, status=400)
             
             folder.save()
+            folder_sharing.inherit(folder)
             # return JsonResponse({'success': True, 'redirect_url': f'/folders/?tab={active_tab}'})
             if folder.parent:
                 if folder.is_public:
@@ -208,35 +217,11 @@ def enable_folder_sharing(request, folder_id):
         share_subfolders = 'share_folders' in request.POST  # True if checked, False otherwise
         share_files = 'share_files' in request.POST  # True if checked, False otherwise
 
-        folder.is_shared = not folder.is_shared
-        folder.share_time = timezone.now()
-        folder.share_time_end = end_date if end_date else None
-        folder.shared_by = request.user
-        folder.share_subfolders = share_subfolders
-        folder.share_files = share_files
-
-        folder.save()
-        if end_date:
-            folder.share_time_end = end_date
-        if share_subfolders:
-            folder.share_subfolders = True
-            for subfolder in Folder.objects.filter(parent=folder, tenant=request.tenant):
-                subfolder.is_shared = True
-                subfolder.share_time = timezone.now()
-                subfolder.share_time_end = end_date if end_date else None
-                subfolder.shared_by = request.user
-                subfolder.share_subfolders = share_subfolders
-                subfolder.share_files = share_files
-                subfolder.save()
-        if share_files:
-            for file in folder.files.all():  # Adjust based on your model
-                    file.is_shared = True
-                    file.share_time = timezone.now()
-                    file.share_time_end = end_date if end_date else None
-                    file.shared_by = request.user
-                    file.save()
-        # folder.shared_by = request.user
-        # folder.save()
+        if folder.is_shared:
+            folder_sharing.unshare(folder)
+        else:
+            folder_sharing.share(folder, request.user, end=end_date or None,
+                                 subfolders=share_subfolders, files=share_files)
         active_tab = request.GET.get('tab', 'public')
         
     # Determine the correct URL based on folder.is_public and active_tab
@@ -258,7 +243,10 @@ def enable_folder_sharing(request, folder_id):
 def shared_folder_view(request, token):
     # Retrieve the folder by share token
     folder = get_object_or_404(Folder, share_token=token, is_shared=True)
-    folders = Folder.objects.filter(parent=folder, tenant=request.tenant)
+    # Read-only: the share flags of the children were written when the folder was shared
+    if folder_sharing.is_expired(folder):
+        raise Http404("This share has expired.")
+    folders = Folder.objects.filter(parent=folder, tenant=request.tenant, is_shared=True)
     files = File.objects.filter(
         folder=folder,
         # uploaded_by=request.user,
@@ -270,14 +258,6 @@ def shared_folder_view(request, token):
     if not folder.name:
         return HttpResponseForbidden("File not available.")
     
-    for fold in folders:
-        fold.is_shared = True
-        fold.shareable_link = request.build_absolute_uri(fold.get_shareable_link())
-        fold.share_time = timezone.now()
-        fold.share_time_end = fold.parent.share_time_end
-        fold.shared_by = fold.parent.shared_by
-        fold.save()
-    
     context = {
         'folder': folder,
         'folders': folders if folder.share_subfolders else [],
@@ -336,8 +316,15 @@ def move_folder(request, folder_id):
             return JsonResponse({'success': False, 'errors': {'general': 'Invalid tab context'}})
         new_parent_id = request.POST.get('new_parent_id')
         if new_parent_id:
-            folder.parent = Folder.objects.get(id=new_parent_id, tenant=request.tenant)
+            new_parent = get_object_or_404(Folder, id=new_parent_id, tenant=request.tenant)
+            # Fresh tree: a cached one may predate moves made through another worker
+            tree = folder_tree.load(request.tenant.id)
+            if new_parent.id == folder.id or tree.is_descendant(new_parent.id, folder.id):
+                return JsonResponse({'success': False, 'errors': {'general': 'A folder cannot be moved into itself or one of its subfolders'}})
+            folder.parent = new_parent
             folder.save()
+            folder_sharing.detach(folder)
+            folder_sharing.inherit(folder)
 
         if folder.parent:
             if folder.is_public:
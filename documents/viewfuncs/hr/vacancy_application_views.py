@@ -17,9 +17,10 @@ logger = logging.getLogger(__name__)
 
 main_superuser = CustomUser.objects.filter(is_superuser=True).first()
 
-SUPERUSER_EMAIL_PROVIDER = main_superuser.email_provider
-SUPERUSER_EMAIL_ADDRESS = main_superuser.email_address
-SUPERUSER_EMAIL_PASSWORD = main_superuser.get_smtp_password()
+# None on a database without a superuser yet (a fresh install, the test database)
+SUPERUSER_EMAIL_PROVIDER = main_superuser.email_provider if main_superuser else None
+SUPERUSER_EMAIL_ADDRESS = main_superuser.email_address if main_superuser else None
+SUPERUSER_EMAIL_PASSWORD = main_superuser.get_smtp_password() if main_superuser else None
 
 @login_required
 @user_passes_test(is_hr)
@@ -44,7 +45,7 @@ def send_vacancy_application_received(request, application_id):
     sender = hr
     sender_provider = hr.email_provider if hr.email_provider else SUPERUSER_EMAIL_PROVIDER
     sender_email = hr.email_address if hr.email_address else SUPERUSER_EMAIL_ADDRESS
-    sender_password = hr.email_password if hr.get_smtp_password() else SUPERUSER_EMAIL_PASSWORD
+    sender_password = hr.get_smtp_password() or SUPERUSER_EMAIL_PASSWORD
     candidate_name = vacancy_application.first_name
     company = vacancy_application.tenant.name
 
@@ -120,7 +121,7 @@ def send_vacancy_accepted_mail(request, application_id):
     
     sender_provider = hr.email_provider if hr.email_provider else SUPERUSER_EMAIL_PROVIDER
     sender_email = hr.email_address if hr.email_address else SUPERUSER_EMAIL_ADDRESS
-    sender_password = hr.email_password if hr.get_smtp_password() else SUPERUSER_EMAIL_PASSWORD
+    sender_password = hr.get_smtp_password() or SUPERUSER_EMAIL_PASSWORD
     candidate_name = vacancy_application.first_name
     company = vacancy_application.tenant.name
 
@@ -149,7 +150,7 @@ def send_vacancy_rejected_mail(request, application_id):
     
     sender_provider = hr.email_provider if hr.email_provider else SUPERUSER_EMAIL_PROVIDER
     sender_email = hr.email_address if hr.email_address else SUPERUSER_EMAIL_ADDRESS
-    sender_password = hr.email_password if hr.get_smtp_password() else SUPERUSER_EMAIL_PASSWORD
+    sender_password = hr.get_smtp_password() or SUPERUSER_EMAIL_PASSWORD
     candidate_name = vacancy_application.first_name.capitalize()
     company = vacancy_application.tenant.name
 
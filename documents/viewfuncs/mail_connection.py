@@ -1,27 +1,42 @@
 # Email Connection
 
 from django.core.mail import get_connection
-import smtplib, imaplib, ssl
+import smtplib, imaplib, ssl, logging
+from tenants.observability import log_event
+
+# provider: (host, port, use_tls, use_ssl)
+SMTP_SETTINGS = {
+    "gmail": ("smtp.gmail.com", 587, True, False),
+    "zoho": ("smtp.zoho.com", 587, True, False),
+    "yahoo": ("smtp.mail.yahoo.com", 587, True, False),
+    "outlook": ("smtp-mail.outlook.com", 587, True, False),
+    "icloud": ("smtp.mail.me.com", 587, True, False),
+    "zeptomail": ("smtp.zeptomail.com", 587, True, False),
+}
+
+# provider: (messages per minute, burst) used by campaign sends (documents/campaigns.py).
+# Kept under each provider's published sending limits; override with settings.MAIL_RATE_LIMITS.
+SMTP_RATE_LIMITS = {
+    "gmail": (20, 5),
+    "zoho": (10, 5),
+    "yahoo": (10, 5),
+    "outlook": (30, 10),
+    "icloud": (10, 5),
+    "zeptomail": (600, 50),
+}
 
 def get_email_smtp_connection(sender_provider, sender_email, sender_password):
-    smtp_settings = {
-        "gmail": ("smtp.gmail.com", 587, True, False),
-        "zoho": ("smtp.zoho.com", 587, True, False),
-        "yahoo": ("smtp.mail.yahoo.com", 587, True, False),
-        "outlook": ("smtp-mail.outlook.com", 587, True, False),
-        "icloud": ("smtp.mail.me.com", 587, True, False),
-        "zeptomail": ("smtp.zeptomail.com", 587, True, False),
-    }
-    
+    smtp_settings = SMTP_SETTINGS
+
     if sender_provider:
         sender_provider = sender_provider.lower()
     if sender_provider not in smtp_settings:
-        print(f"Unsupported email provider: {sender_provider}")
+        log_event("smtp.unsupported_provider", level=logging.WARNING, provider=sender_provider)
         return None, f"Unsupported email provider: {sender_provider}"
     
     host, port, use_tls, use_ssl = smtp_settings[sender_provider]
     try:
-        print(f"Connecting to {host}:{port} for {sender_email}")
+        log_event("smtp.connecting", host=host, port=port, sender=sender_email)
         # Establish SMTP connection
     #     context = ssl.create_default_context()
     #     server = smtplib.SMTP(host, port)
@@ -43,13 +58,13 @@ def get_email_smtp_connection(sender_provider, sender_email, sender_password):
         # Test the connection by opening it
         connection.open()
         # connection.close()
-        print(f"SMTP connection successful for {sender_provider}")
+        log_event("smtp.connected", provider=sender_provider, sender=sender_email)
         return connection, None  # Success: return connection and no error
     except smtplib.SMTPAuthenticationError as e:
-        print(f"Authentication failed for {sender_provider}: {str(e)}")
+        log_event("smtp.auth_failed", level=logging.WARNING, provider=sender_provider, sender=sender_email, error=str(e))
         return None, str(e)  # Return error message for user feedback
     except Exception as e:
-        print(f"SMTP connection failed for {sender_provider}: {str(e)}")
+        log_event("smtp.connect_failed", level=logging.WARNING, provider=sender_provider, sender=sender_email, error=str(e))
         return None, str(e)
 
     
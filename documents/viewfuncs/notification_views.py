@@ -1,10 +1,11 @@
-from datetime import timezone
+from django.utils import timezone
 import logging
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.http import HttpResponseForbidden, JsonResponse
 from django.shortcuts import render
 from documents.models import Notification, UserNotification
+from documents.notifications import invalidate_users
 
 logger = logging.getLogger(__name__)
 
@@ -67,6 +68,8 @@ def dismiss_all_notifications(request):
             dismissed=True,
             seen_at=timezone.now()
         )
+        # update() bypasses post_save, so drop the cached notification bar explicitly
+        invalidate_users([request.user.id])
         return JsonResponse({'success': True, 'updated_count': updated_count})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
\ No newline at end of file
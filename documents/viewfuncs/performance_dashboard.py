@@ -1,10 +1,10 @@
-from datetime import timedelta, timezone
 import logging
 from django.http import HttpResponseForbidden
 from django.shortcuts import render
-from documents.models import CustomUser, Department, Task
+from documents.models import CustomUser, Department
+from documents.task_metrics import TaskMetrics
+from documents.task_stats import user_summary
 from django.contrib.auth.decorators import login_required
-from django.db.models import F
 
 
 
@@ -20,37 +20,20 @@ def performance_dashboard(request):
     user = request.user
     category = request.GET.get('category', 'overall')
     
-    # Filter tasks by tenant and assigned_to user
-    tasks = Task.objects.filter(tenant=request.user.tenant, assigned_to=user)
-    if category == 'personal':
-        tasks = tasks.filter(created_by=user)
-    elif category == 'corporate':
-        tasks = tasks.exclude(created_by=user)
-    
-    total_tasks = tasks.count()
-    completed_tasks = tasks.filter(status='completed').count()
-    completion_percentage = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
-
-    now = timezone.now()
-    week_ago = now - timedelta(days=7)
-    month_ago = now - timedelta(days=30)
-    year_ago = now - timedelta(days=365)
-
-    weekly_completed = tasks.filter(status='completed', completed_at__gte=week_ago).count()
-    monthly_completed = tasks.filter(status='completed', completed_at__gte=month_ago).count()
-    yearly_completed = tasks.filter(status='completed', completed_at__gte=year_ago).count()
-
-    overdue_tasks = tasks.filter(status='overdue', due_date__lt=now).count()
+    # All six figures in one query on the daily rollup (documents/task_stats.py)
+    metrics = user_summary(request.user.tenant, user, category)
+    completion_percentage = metrics['completion_percentage']
+    overdue_tasks = metrics['overdue_tasks']
 
     performance_score = completion_percentage - (overdue_tasks * 10)
     performance_score = max(0, min(100, performance_score))
 
     context = {
         'category': category,
-        'completion_percentage': round(completion_percentage, 2),
-        'weekly_completed': weekly_completed,
-        'monthly_completed': monthly_completed,
-        'yearly_completed': yearly_completed,
+        'completion_percentage': completion_percentage,
+        'weekly_completed': metrics['weekly_completed'],
+        'monthly_completed': metrics['monthly_completed'],
+        'yearly_completed': metrics['yearly_completed'],
         'overdue_tasks': overdue_tasks,
         'performance_score': round(performance_score, 2),
     }
@@ -97,47 +80,33 @@ def hod_performance_dashboard(request):
     # Get user filter from query parameter (optional)
     selected_user_id = request.GET.get('user_id', 'all')
     
-    # Base query: corporate tasks (created by department members, not personal)
-    tasks = Task.objects.filter(
-        created_by__in=users_ids, 
-        tenant=request.tenant
-    ).exclude(created_by=F('assigned_to')).select_related('created_by', 'assigned_to')
+    # Corporate tasks (created by department members, not personal)
+    metrics = TaskMetrics.corporate(request.tenant, users_ids)
 
-    # Filter by selected user if specified
-    if selected_user_id != 'all':
-        tasks = tasks.filter(assigned_to__id=selected_user_id)
+    # Per-user metrics for the table, in one grouped query
+    per_user = metrics.per_user(users_ids)
 
     # Department-wide or user-specific metrics
-    total_tasks = tasks.count()
-    completed_tasks = tasks.filter(status='completed').count()
-    completion_percentage = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
-
-    # Per-user metrics for the table
+    if selected_user_id != 'all' and selected_user_id.isdigit() and int(selected_user_id) in per_user:
+        summary = per_user[int(selected_user_id)]
+    else:
+        summary = metrics.summary()
+    total_tasks = summary['total_tasks']
+    completed_tasks = summary['completed_tasks']
+    completion_percentage = summary['completion_percentage']
     user_metrics = []
     for dept_user in department_users:
-        user_tasks = Task.objects.filter(
-            created_by__in=users_ids,
-            assigned_to=dept_user,
-            tenant=request.tenant
-        ).exclude(created_by=F('assigned_to')).select_related('assigned_to')
-        
-        user_total_tasks = user_tasks.count()
-        user_completed_tasks = user_tasks.filter(status='completed').count()
-        user_completion_percentage = (user_completed_tasks / user_total_tasks * 100) if user_total_tasks > 0 else 0
-        
         user_metrics.append({
             'user_id': dept_user.id,
             'full_name': dept_user.get_full_name() or dept_user.username,
             'department': dept_user.department.name if dept_user.department else 'N/A',
-            'total_tasks': user_total_tasks,
-            'completed_tasks': user_completed_tasks,
-            'completion_percentage': round(user_completion_percentage, 2),
+            **per_user[dept_user.id],
         })
 
     context = {
         'departments': departments,
         'selected_department_id': selected_department_id,
-        'completion_percentage': round(completion_percentage, 2),
+        'completion_percentage': completion_percentage,
         'total_tasks': total_tasks,
         'completed_tasks': completed_tasks,
         'user_metrics': user_metrics,
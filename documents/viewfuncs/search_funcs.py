@@ -1,8 +1,24 @@
 # for search bars...
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from django.http import JsonResponse
-from documents.models import CustomUser, Contact
+from django.http import HttpResponseForbidden, JsonResponse
+from documents import autocomplete, search
+from documents.models import SearchEntry
+
+SEARCH_LIMIT_MAX = 50
+
+@login_required
+def global_search(request):
+    # One endpoint for people, contacts, files, folders, tasks and vacancies (documents/search.py)
+    if not hasattr(request, 'tenant') or request.user.tenant != request.tenant:
+        return HttpResponseForbidden("You are not authorized for this company.")
+    query = request.GET.get('q', '').strip()
+    kinds = [kind for kind in request.GET.getlist('kind') if kind in dict(SearchEntry.KIND_CHOICES)]
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), SEARCH_LIMIT_MAX)
+    except ValueError:
+        limit = 20
+    results = search.search(request.user, query, kinds=kinds or None, limit=limit) if query else []
+    return JsonResponse({'query': query, 'results': results})
 
 @login_required
 def user_search(request):
@@ -10,25 +26,11 @@ def user_search(request):
     if not query:
         return JsonResponse([], safe=False)
 
-    # Build OR conditions across multiple fields
-    users = CustomUser.objects.filter(
-        tenant=request.user.tenant
-    ).filter(
-        Q(email__icontains=query) |
-        Q(username__icontains=query) |
-        Q(first_name__icontains=query) |
-        Q(last_name__icontains=query)
-    ).distinct()[:10]
-
-    # Build full name safely
+    # Word prefixes of username, names and email, from the tenant's in-memory index
+    people = autocomplete.people(request.user.tenant_id, query, limit=10) if request.user.tenant_id else []
     results = [
-        {   
-            'id': user.id,
-            'email': user.email,
-            'username': user.username,
-            'name': f"{user.first_name} {user.last_name}".strip() or user.username,
-        }
-        for user in users
+        {'id': person.id, 'email': person.email, 'username': person.username, 'name': person.name}
+        for person in people
     ]
 
     return JsonResponse(results, safe=False)
@@ -36,9 +38,6 @@ def user_search(request):
 @login_required
 def contact_search(request):
     query = request.GET.get('q', '')
-    contacts = Contact.objects.filter(
-        tenant=request.user.tenant,  # Assuming tenant-based filtering
-        email__icontains=query
-    )[:10]  # Limit to 10 results
+    contacts = autocomplete.contacts(request.user.tenant_id, query, limit=10) if request.user.tenant_id else []
     results = [{'email': contact.email, 'name': contact.name} for contact in contacts]
-    return JsonResponse(results, safe=False)
\ No newline at end of file
+    return JsonResponse(results, safe=False)
@@ -2,12 +2,13 @@
 
 from documents.models import CustomUser
 from raadaa import settings
-from .mail_connection import get_email_smtp_connection
+from documents.outbox import enqueue_email
 from django.shortcuts import render
 from django.http import HttpResponseForbidden
-from django.core.mail import send_mail, EmailMessage
 from django.template.loader import render_to_string
 from django.utils import timezone
+from tenants.observability import log_event
+import logging
 
 
 main_superuser = CustomUser.objects.filter(is_superuser=True).first()
@@ -34,62 +35,24 @@ def send_reg_confirm(request, user, admin_user, superuser):
     html_content = render_to_string('emails/reg_confirm.html', context)
 
     subject = f"Account Approved: {user.username}"
+    # Queued for the mail worker; send from the tenant admin's mailbox if configured, else the superuser's
     if admin_user.email_provider and admin_user.email_address and admin_user.email_password:
-        sender_password = admin_user.get_smtp_password()
-        connection, error_message = get_email_smtp_connection(admin_user.email_provider, admin_user.email_address, sender_password)
-        if connection:
-            try:
-                # Create and send HTML email
-                email = EmailMessage(
-                    subject=subject,
-                    body=html_content,
-                    from_email=admin_user.email_address,
-                    to=[user.email],
-                    connection=connection
-                )
-                # Specify that this is HTML email
-                email.content_subtype = "html"
-                email.send()
-                print("Email sent successfully via admin_user")
-                return  # Success — exit early
-            except Exception as e:
-                print(f"Failed to send via admin_user: {e}")
-                connection = None  # Force fallback
-        else:
-            print(f"SMTP Connection Failed for admin_user: {error_message}")
+        enqueue_email(subject, html_content, [user.email], admin_user.email_provider, admin_user.email_address,
+                      admin_user.get_smtp_password(), html=True, tenant=request.tenant, kind="reg_confirm")
+        return
 
     if superuser.email_provider and superuser.email_address and superuser.email_password:
-        sender_password = superuser.get_smtp_password()
-        connection, error_message = get_email_smtp_connection(superuser.email_provider, superuser.email_address, sender_password)
-        if connection:
-            try:
-                # Create and send HTML email
-                email = EmailMessage(
-                    subject=subject,
-                    body=html_content,
-                    from_email=superuser.email_address,
-                    to=[user.email],
-                    cc=[admin_user.email],
-                    connection=connection
-                )
-                # Specify that this is HTML email
-                email.content_subtype = "html"
-                email.send()
-                print("Email sent successfully via superuser")
-                return  # Success — exit early
-            except Exception as e:
-                print(f"Failed to send via superuser: {e}")
-                connection = None  # Force fallback
-        else:
-            print(f"SMTP Connection Failed for superuser: {error_message}")
-
-    print("Email sent failed")
+        enqueue_email(subject, html_content, [user.email], superuser.email_provider, superuser.email_address,
+                      superuser.get_smtp_password(), cc=[admin_user.email], html=True, tenant=request.tenant,
+                      kind="reg_confirm")
+        return
+
+    log_event("mail.send_failed", level=logging.ERROR, kind="reg_confirm", to=user.email, error="no sender configured")
 
 # Send Password Reset
 def send_password_reset_email(user, reset_url, superuser):
     sender_password = superuser.get_smtp_password()
     if superuser.email_provider and superuser.email_address and sender_password:
-        connection, error_message = get_email_smtp_connection(superuser.email_provider, superuser.email_address, sender_password)
         # Send email (customize content as needed)
         subject = 'TeamManager Password Reset Request'
         message = f"""
@@ -104,8 +67,8 @@ def send_password_reset_email(user, reset_url, superuser):
         Thanks,
         The TeamManager Team
         """
-        email = EmailMessage(subject=subject, body=message, from_email=superuser.email_address, to=[user.email], connection=connection)
-        email.send()
+        enqueue_email(subject, message, [user.email], superuser.email_provider, superuser.email_address, sender_password,
+                      tenant=user.tenant, kind="password_reset")
         # send_mail(subject, message, superuser.email_address, [user.email], connection=connection)
 
 # Template document approval
@@ -134,7 +97,6 @@ def send_password_reset_email(user, reset_url, superuser):
 
 def send_approval_request(document, sender_provider, sender_email, sender_password, bdm_emails, sender):
     sender_password = sender.get_smtp_password()
-    connection, error_message = get_email_smtp_connection(sender_provider, sender_email, sender_password)
 
     base_domain = "127.0.0.1:8000" if settings.DEBUG else "teammanager.ng"
     protocol = "http" if settings.DEBUG else "https"
@@ -154,26 +116,9 @@ def send_approval_request(document, sender_provider, sender_email, sender_passwo
 
     subject = f"Approval Request: {document.company_name}"
 
-    print("Sending mail...")
-
-    # Create email with HTML content and attachment
-    email = EmailMessage(
-        subject=subject,
-        body=html_content,  # HTML content as the body
-        from_email=sender_email,
-        to=list(bdm_emails),
-        connection=connection
-    )
-    
-    # Specify that this is HTML email
-    email.content_subtype = "html"
-    
-    # Attach the PDF file
-    email.attach_file(document.pdf_file.path)
-    
-    email.send()
-    
-    print("Mail Sent")
+    # HTML email with the PDF attached, delivered by the mail worker
+    enqueue_email(subject, html_content, list(bdm_emails), sender_provider, sender_email, sender_password,
+                  html=True, attachments=[document.pdf_file.path], tenant=document.tenant, kind="approval_request")
 
 # Send Template document approved email
 # def send_doc_approved_bdm(request, document, sender_provider, sender_email, sender_password):
@@ -197,9 +142,6 @@ def send_approval_request(document, sender_provider, sender_email, sender_passwo
 #     email.send()
 
 def send_doc_approved_bdm(request, document, sender_provider, sender_email, sender_password):
-    # Configure SMTP settings dynamically
-    connection, error_message = get_email_smtp_connection(sender_provider, sender_email, sender_password)
-
     base_domain = "127.0.0.1:8000" if settings.DEBUG else "teammanager.ng"
     protocol = "http" if settings.DEBUG else "https"
     document_link = f"{protocol}://{document.tenant.slug}.{base_domain}/media/documents/pdf/{document.pdf_file.url}"
@@ -223,22 +165,9 @@ def send_doc_approved_bdm(request, document, sender_provider, sender_email, send
 
     subject = f"Document Approved for {request.tenant.name}"
 
-    # Create and send HTML email
-    email = EmailMessage(
-        subject=subject,
-        body=html_content,
-        from_email=sender_email,
-        to=[document.created_by.email],
-        connection=connection
-    )
-    
-    # Specify that this is HTML email
-    email.content_subtype = "html"
-    
-    # Attach the PDF file
-    email.attach_file(document.pdf_file.path)
-    
-    email.send()
+    # HTML email with the PDF attached, delivered by the mail worker
+    enqueue_email(subject, html_content, [document.created_by.email], sender_provider, sender_email, sender_password,
+                  html=True, attachments=[document.pdf_file.path], tenant=request.tenant, kind="document_approved")
 
 
 
@@ -312,8 +241,6 @@ def send_doc_approved_bdm(request, document, sender_provider, sender_email, send
 
 
 def send_approved_email_client(sender_provider, sender_email, sender_password, document, recipient, cc_list):
-    connection, error_message = get_email_smtp_connection(sender_provider, sender_email, sender_password)
-
     context = {
         'company_name': document.company_name,
         'creator_name': document.created_by.get_full_name(),
@@ -332,20 +259,8 @@ def send_approved_email_client(sender_provider, sender_email, sender_password, d
 
     html_content = render_to_string(template_name, context)
 
-    email = EmailMessage(
-        subject=subject,
-        body=html_content,
-        from_email=sender_email,
-        to=recipient,
-        cc=cc_list,
-        connection=connection
-    )
-    
-    email.content_subtype = "html"
-    
-    email.attach_file(document.pdf_file.path)
-    
-    email.send()
+    enqueue_email(subject, html_content, recipient, sender_provider, sender_email, sender_password, cc=cc_list,
+                  html=True, attachments=[document.pdf_file.path], tenant=document.tenant, kind="approved_client")
 
 # def send_user_approved_email(request, user, admin_user, sender_provider, sender_email, sender_password):
 
@@ -393,11 +308,6 @@ def send_approved_email_client(sender_provider, sender_email, sender_password, d
 
 
 def send_user_approved_email(request, user, admin_user, sender_provider, sender_email, sender_password):
-    connection, error_message = get_email_smtp_connection(sender_provider, sender_email, sender_password)
-    if error_message:
-        print(f"SMTP Error: {error_message}")
-        return HttpResponseForbidden("Email service unavailable.")
-
     # Generate tenant-specific login URL
     protocol = "http" if settings.DEBUG else "https"
     base_domain = "127.0.0.1:8000" if settings.DEBUG else "teammanager.ng"
@@ -415,22 +325,8 @@ def send_user_approved_email(request, user, admin_user, sender_provider, sender_
     html_content = render_to_string('emails/user_approved.html', context)
     subject = f"Account Approved - Welcome to {request.tenant.name}!"
 
-    print("Sending approval email...")
-
-    try:
-        email = EmailMessage(
-            subject=subject,
-            body=html_content,
-            from_email=sender_email,
-            to=[user.email],
-            connection=connection
-        )
-        email.content_subtype = "html"
-        email.send()
-        print("Approval email sent successfully.")
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-        return HttpResponseForbidden("Failed to send approval email. Contact admin.")
+    enqueue_email(subject, html_content, [user.email], sender_provider, sender_email, sender_password,
+                  html=True, tenant=request.tenant, kind="user_approved")
     
 
 # def send_vac_app_received_email(sender_provider, sender_email, sender_password, company, candidate_name, vacancy_application, vacancy):
@@ -485,12 +381,8 @@ def send_user_approved_email(request, user, admin_user, sender_provider, sender_
 #     email.send()
 
 def send_vac_app_received_email(sender_provider, sender_email, sender_password, company, candidate_name, vacancy_application, vacancy, sender):
-    sender_password = sender.get_smtp_password()
-    connection, error_message = get_email_smtp_connection(sender_provider, sender_email, sender_password)
-    if error_message:
-        print(f"SMTP Connection Failed: {error_message}")
-        return  # Or raise/log as needed
-    
+    sender_password = sender.get_smtp_password() or sender_password
+
     now = timezone.now()
 
     context = {
@@ -505,22 +397,8 @@ def send_vac_app_received_email(sender_provider, sender_email, sender_password,
     html_content = render_to_string('emails/application_received.html', context)
     subject = f"Application Received for {vacancy.title} Role"
 
-    print(f"Sending application confirmation to {vacancy_application.email}...")
-
-    try:
-        email = EmailMessage(
-            subject=subject,
-            body=html_content,
-            from_email=sender_email,
-            to=[vacancy_application.email],
-            connection=connection
-        )
-        email.content_subtype = "html"
-        email.send()
-        print("Application received email sent successfully.")
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-        # Optionally log or notify admin
+    enqueue_email(subject, html_content, [vacancy_application.email], sender_provider, sender_email, sender_password,
+                  html=True, tenant=vacancy_application.tenant, kind="application_received")
 
 # def send_vac_app_accepted_email(sender_provider, sender_email, sender_password, company, candidate_name, hr, cc, vacancy_application, vacancy):
 #     connection, error_message = get_email_smtp_connection(sender_provider, sender_email, sender_password)
@@ -553,11 +431,6 @@ def send_vac_app_received_email(sender_provider, sender_email, sender_password,
 #     email.send()
 
 def send_vac_app_accepted_email(sender_provider, sender_email, sender_password, company, candidate_name, hr, cc, vacancy_application, vacancy):
-    connection, error_message = get_email_smtp_connection(sender_provider, sender_email, sender_password)
-    if error_message:
-        print(f"SMTP Error: {error_message}")
-        return  # Handle gracefully
-
     context = {
         'candidate_name': candidate_name,
         'vacancy_title': vacancy.title,
@@ -570,23 +443,8 @@ def send_vac_app_accepted_email(sender_provider, sender_email, sender_password,
     html_content = render_to_string('emails/application_accepted.html', context)
     subject = f"You're Moving Forward! Next Steps for the {vacancy.title} Role"
 
-    print(f"Sending acceptance email to {vacancy_application.email}...")
-
-    try:
-        email = EmailMessage(
-            subject=subject,
-            body=html_content,
-            from_email=sender_email,
-            to=[vacancy_application.email],
-            cc=cc or [],
-            connection=connection
-        )
-        email.content_subtype = "html"
-        email.send()
-        print("Acceptance email sent successfully.")
-    except Exception as e:
-        print(f"Email failed: {e}")
-        # Log or notify admin
+    enqueue_email(subject, html_content, [vacancy_application.email], sender_provider, sender_email, sender_password,
+                  cc=cc, html=True, tenant=vacancy_application.tenant, kind="application_accepted")
 
 # def send_vac_app_rejected_email(sender_provider, sender_email, sender_password, company, candidate_name, hr, cc, vacancy_application, vacancy):
 #     connection, error_message = get_email_smtp_connection(sender_provider, sender_email, sender_password)
@@ -619,11 +477,6 @@ def send_vac_app_accepted_email(sender_provider, sender_email, sender_password,
 #     email.send()
 
 def send_vac_app_rejected_email(sender_provider, sender_email, sender_password, company, candidate_name, hr, cc, vacancy_application, vacancy):
-    connection, error_message = get_email_smtp_connection(sender_provider, sender_email, sender_password)
-    if error_message:
-        print(f"SMTP Error: {error_message}")
-        return
-
     context = {
         'candidate_name': candidate_name,
         'vacancy_title': vacancy.title,
@@ -636,19 +489,5 @@ def send_vac_app_rejected_email(sender_provider, sender_email, sender_password,
     html_content = render_to_string('emails/application_rejected.html', context)
     subject = f"An Update on Your Application for {vacancy.title} Role"
 
-    print(f"Sending rejection email to {vacancy_application.email}...")
-
-    try:
-        email = EmailMessage(
-            subject=subject,
-            body=html_content,
-            from_email=sender_email,
-            to=[vacancy_application.email],
-            cc=cc or [],
-            connection=connection
-        )
-        email.content_subtype = "html"
-        email.send()
-        print("Rejection email sent.")
-    except Exception as e:
-        print(f"Email failed: {e}")
\ No newline at end of file
+    enqueue_email(subject, html_content, [vacancy_application.email], sender_provider, sender_email, sender_password,
+                  cc=cc, html=True, tenant=vacancy_application.tenant, kind="application_rejected")
@@ -1,12 +1,11 @@
-import csv
 import logging
 from django.contrib.auth.decorators import user_passes_test, login_required
 from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.shortcuts import get_object_or_404, render
+from documents import exports, search
 from documents.models import Department, StaffDocument, StaffProfile
 from documents.forms import StaffDocumentForm
 from .rba_decorators import is_admin 
-from django.db.models import Q
 from django.core.paginator import Paginator
 from django.views.decorators.http import require_POST
 
@@ -154,12 +153,10 @@ def staff_list(request):
         'user', 'department'
     ).prefetch_related('team').filter(user__tenant=request.user.tenant)
 
-    # Search by name
+    # Search by name (and username/email) through the search index
     if search_query:
         profiles = profiles.filter(
-            Q(first_name__icontains=search_query) |
-            Q(middle_name__icontains=search_query) |
-            Q(last_name__icontains=search_query)
+            user_id__in=search.entries(request.user, search_query, kinds=['person']).values('object_id')
         )
 
     # Filter by department
@@ -210,27 +207,7 @@ def export_staff_csv(request):
             content='{"error": "No profiles selected"}'
         )
 
-    # Only export profiles that belong to the same tenant as the requester
-    profiles = StaffProfile.objects.filter(
-        user__id__in=profile_ids,
-        user__tenant=request.user.tenant
-    ).select_related('user', 'department').prefetch_related('team')
-
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="staff_export.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(['Name', 'Phone Number', 'Email', 'Sex', 'Designation', 'Department', 'Team'])
-
-    for profile in profiles:
-        writer.writerow([
-            f"{profile.first_name} {profile.middle_name or ''} {profile.last_name}".strip(),
-            profile.phone_number or 'N/A',
-            profile.email or 'N/A',
-            profile.sex or 'N/A',
-            profile.designation or 'N/A',
-            profile.department.name if profile.department else 'N/A',
-            ', '.join(profile.team.all().values_list('name', flat=True)) or 'N/A',
-        ])
-
-    return response
+    # Only export profiles that belong to the same tenant as the requester; streamed (documents/exports.py)
+    exporter = exports.EXPORTERS['staff']
+    profiles = exporter.queryset(request.user).filter(user__id__in=profile_ids)
+    return exports.response(exporter, profiles, 'csv', filename='staff_export.csv')
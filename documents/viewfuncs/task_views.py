@@ -9,7 +9,8 @@ from django.http import HttpResponseForbidden, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
-from documents.models import Task, CustomUser, Notification, UserNotification, File
+from documents.models import Task, CustomUser, Notification, File
+from documents.notifications import notify_users
 from documents.forms import TaskForm, ReassignTaskForm
 import logging, json
 
@@ -39,23 +40,15 @@ def task_list(request):
     elif category == 'corporate':
         tasks = tasks.filter(assigned_to=request.user).exclude(created_by=request.user)
     
-    # Update overdue tasks for the current tenant
-    overdue_tasks = Task.objects.filter(
-        tenant=request.tenant,
-        due_date__lt=date.today(),
-        status__in=['pending', 'in_progress', 'on_hold'],
-        assigned_to=request.user
-    )
-    if overdue_tasks.exists():
-        logger.debug(f"Updating {overdue_tasks.count()} overdue tasks for tenant {request.tenant}")
-        overdue_tasks.update(status='overdue')
+    # Overdue tasks are marked by OverdueTaskCronJob (documents/overdue.py); this view only reads
 
     # Filter users by tenant and optionally by department
     users = CustomUser.objects.filter(tenant=request.tenant)
     if request.user.department:
         users = users.filter(department=request.user.department)
     
-    logger.debug(f"Task list for tenant {request.tenant}: {tasks.count()} tasks, {users.count()} users")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Task list for tenant {request.tenant}: {tasks.count()} tasks, {users.count()} users")
 
     context = {
         'tasks': tasks,
@@ -100,12 +93,7 @@ def create_task(request):
                 is_active=True
             )
 
-            for assignee in task.assigned_to.all():
-                UserNotification.objects.create(
-                    tenant=request.tenant,
-                    user=assignee,
-                    notification=notif
-                )
+            notify_users(request.tenant, notif, task.assigned_to.values_list('id', flat=True))
             return redirect('task_list')
     else:
         form = TaskForm(user=request.user)
@@ -238,12 +226,7 @@ def reassign_task(request, task_id):
                 is_active=True
             )
 
-            for assignee in task.assigned_to.all():
-                UserNotification.objects.create(
-                    tenant=request.tenant,
-                    user=assignee,
-                    notification=notif
-                )
+            notify_users(request.tenant, notif, task.assigned_to.values_list('id', flat=True))
             return redirect('task_list')
 
             return JsonResponse({'success': True, 'message': 'Task reassigned successfully.'})
@@ -7,16 +7,16 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.forms import formset_factory
 from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.core.exceptions import ValidationError, PermissionDenied
-from datetime import datetime
-from docx import Document as DocxDocument
+from django.contrib import messages
 from raadaa import settings
 from .documents_path import upload_to_documents_word, upload_to_documents_pdf
 from .custom_auth import get_tenant_url
-from .send_mails import send_approval_request, send_doc_approved_bdm, send_approved_email_client
+from .send_mails import send_doc_approved_bdm, send_approved_email_client
 from documents.forms import DocumentForm
 from documents.models import Folder, File, Document, CustomUser
-from documents.placeholders import replace_placeholders
-import os, platform, shutil, subprocess
+from documents import autocomplete
+from documents.doc_jobs import document_dirs, enqueue_document_job
+import os
 
 # Create template documents
 @login_required
@@ -40,6 +40,7 @@ def create_document(request):
 
         if formset.is_valid():
             print("Formset is valid")
+            queued = 0
             for form in formset:
                 if form.has_changed():
                     print("Processing form:", form.cleaned_data)
@@ -85,61 +86,15 @@ def create_document(request):
                     document.save()
 
                     creation_method = form.cleaned_data['creation_method']
-                    if settings.DEBUG:
-                        word_dir = os.path.join(settings.MEDIA_ROOT, upload_to_documents_word(document))
-                        pdf_dir = os.path.join(settings.MEDIA_ROOT, upload_to_documents_pdf(document))
-                    else:
-                        word_dir = f"{settings.MEDIA_URL}{upload_to_documents_word(document).rstrip('/')}/"
-                        pdf_dir = f"{settings.MEDIA_URL}{upload_to_documents_pdf(document).rstrip('/')}/"
-                    os.makedirs(word_dir, exist_ok=True)
-                    os.makedirs(pdf_dir, exist_ok=True)
-
-                    base_filename = f"{document.company_name}_{document.id}"
-
                     if creation_method == 'template':
-                        template_filename = "Approval Letter Template.docx" if document.document_type == "approval" else "SLA Template.docx"
-                        template_path = os.path.join(settings.BASE_DIR, "documents/templates/docx_templates", template_filename)
-                        if not os.path.exists(template_path):
-                            print(f"Template not found: {template_path}")
-                            return HttpResponse(f"Error: Template not found at {template_path}", status=500)
-                        
-                        today = datetime.today()
-                        if document.document_type == "approval":
-                            day = today.day
-                            suffix = "th" if 11 <= day <= 13 else {1: "st", 2: "nd", 3: "rd"}.get(day % 10, "th")
-                            formatted_date = today.strftime("%d") + suffix + " " + today.strftime("%d %B, %Y")
-                        else:
-                            formatted_date = today.strftime("%m/%d/%Y")
-
-                        doc = DocxDocument(template_path)
-                        replacements = {
-                            "{{Company Name}}": document.company_name,
-                            "{{Company Address}}": document.company_address,
-                            "{{Contact Person Name}}": document.contact_person_name,
-                            "{{Contact Person Email}}": document.contact_person_email,
-                            "{{Contact Person Designation}}": document.contact_person_designation + ",",
-                            "{{Sales Rep}}": document.sales_rep,
-                            "{{Date}}": formatted_date,
-                        }
-                        doc = replace_placeholders(doc, replacements, document.document_type)
-
-                        word_filename = f"{base_filename}.docx"
-                        word_path = os.path.join(word_dir, word_filename)
-                        doc.save(word_path)
-                        document.word_file = os.path.join(upload_to_documents_word(document), word_filename)
-
-                        # Save Word file to File
-                        public_word_file = File(
-                            tenant=request.tenant,
-                            original_name=word_filename,
-                            file=os.path.join(upload_to_documents_word(document), word_filename),
-                            folder=template_folder,
-                            uploaded_by=user
-                        )
-                        public_word_file.save()
+                        # Filled, converted and sent for approval by the document worker (documents/doc_jobs.py)
+                        enqueue_document_job(document, 'template')
+                        queued += 1
                     else:
                         uploaded_file = form.cleaned_data['uploaded_file']
                         file_extension = uploaded_file.name.lower().split('.')[-1]
+                        word_dir, pdf_dir = document_dirs(document)
+                        base_filename = f"{document.company_name}_{document.id}"
 
                         if file_extension == 'docx':
                             word_filename = f"{base_filename}.docx"
@@ -148,16 +103,11 @@ def create_document(request):
                                 for chunk in uploaded_file.chunks():
                                     f.write(chunk)
                             document.word_file = os.path.join(upload_to_documents_word(document), word_filename)
+                            document.save()
 
-                            # Save Word file to File
-                            public_word_file = File(
-                                tenant=request.tenant,
-                                original_name=word_filename,
-                                file=os.path.join(upload_to_documents_word(document), word_filename),
-                                folder=template_folder,
-                                uploaded_by=user
-                            )
-                            public_word_file.save()
+                            # The worker files the .docx, converts it and requests approval
+                            enqueue_document_job(document, 'upload')
+                            queued += 1
                         elif file_extension == 'pdf':
                             pdf_filename = f"{base_filename}.pdf"
                             pdf_path = os.path.join(pdf_dir, pdf_filename)
@@ -179,108 +129,9 @@ def create_document(request):
 
                             # print("Sending email for uploaded PDF")
                             # send_approval_request(document, sender_provider, sender_email, sender_password, bdm_emails)
-                            continue
-
-                    pdf_filename = f"{base_filename}.pdf"
-                    if settings.DEBUG:
-                        relative_pdf_path = os.path.join(upload_to_documents_pdf(document), pdf_filename)
-                    else:
-                        relative_pdf_path = f"{settings.MEDIA_URL}{upload_to_documents_pdf(document).rstrip('/')}/{pdf_filename}"
-                    
-                    if settings.DEBUG:
-                        absolute_pdf_path = os.path.join(settings.MEDIA_ROOT, relative_pdf_path)
-                    else:
-                        absolute_pdf_path = f"{settings.MEDIA_URL}{relative_pdf_path.rstrip('/')}/"
-
-                    # Choose the right LibreOffice path
-                    if platform.system() == "Windows":
-                        paths = [
-                            r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
-                            r"C:\Program Files\LibreOffice\program\soffice.exe"
-                        ]
-                        libreoffice_path = next((p for p in paths if os.path.exists(p)), None)
-                    else:
-                        libreoffice_path = shutil.which("libreoffice")
-
-                    # Check if LibreOffice exists
-                    if not libreoffice_path or not os.path.exists(libreoffice_path):
-                        raise FileNotFoundError("LibreOffice not found. Make sure it's installed and in PATH.")
-
-                    try:
-                        print("Starting PDF conversion with LibreOffice")
-                        
-                        # Ensure paths are absolute
-                        abs_word_path = os.path.abspath(word_path)
-                        abs_output_dir = os.path.dirname(os.path.abspath(absolute_pdf_path))
-
-                        print("abs_word_path: ", abs_word_path)
-
-                        # Run LibreOffice to convert .docx to .pdf
-                        result = subprocess.run(
-                            [libreoffice_path, "--headless", "--convert-to", "pdf", "--outdir", abs_output_dir, abs_word_path],
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE,
-                            check=True
-                        )
-
-                        print("LibreOffice stdout:", result.stdout.decode())
-                        print("LibreOffice stderr:", result.stderr.decode())
-
-                        # Confirm output PDF file path
-                        if os.path.exists(absolute_pdf_path):
-                            document.pdf_file = relative_pdf_path
-                            document.save()
-
-                            # Save PDF file to File
-                            public_pdf_file = File(
-                                tenant=request.tenant,
-                                original_name=pdf_filename,
-                                file=relative_pdf_path,
-                                folder=template_folder,
-                                uploaded_by=user
-                            )
-                            public_pdf_file.save()
-                        else:
-                            return HttpResponse("PDF file was not generated.", status=500)
-
-                    except subprocess.CalledProcessError as e:
-                        print(f"LibreOffice conversion error: {e.stderr.decode()}")
-                        return HttpResponse(f"Error converting to PDF: {e.stderr.decode()}", status=500)
-
-                    except Exception as e:
-                        print(f"Unexpected error: {e}")
-                        return HttpResponse(f"Unexpected error converting to PDF: {e}", status=500)
-                    
-                    # Send 
-                    # Get all BDM emails for the document's tenant
-                    bdm_emails = CustomUser.objects.filter(
-                        tenant=document.tenant,  # Filter by the document's tenant
-                        roles__name="BDM"
-                    ).values_list("email", flat=True)
-
-                    # Ensure there are BDMs to notify
-                    if not bdm_emails:
-                        return
-                    
-                    # Ensure the document's creator is from the same tenant
-                    if document.created_by.tenant != document.tenant:
-                        # return HttpResponseForbidden("Unauthorized: Creator does not belong to the document's tenant.")
-                        return render('error.html', {
-                        'error_code': '403',
-                        'message': 'Unauthorized: User does not belong to the document\'s company.'
-                    }, status=403)
-
-                    # sender_provider = document.created_by.email_provider
-                    # sender_email = document.created_by.email_address
-                    # sender_password = document.created_by.get_smtp_password()
-
-                    sender = document.created_by
-
-                    if not sender.email_address or not sender.email_password:
-                        return HttpResponseForbidden("Your email credentials are missing. Contact admin.")
-                    print("Sending email")
-                    send_approval_request(document, sender.email_provider, sender.email_address, sender.email_password, bdm_emails, sender)
 
+            if queued:
+                messages.info(request, f"{queued} document(s) are being generated. This page updates when they are ready.")
             print("Redirecting to document_list")
             return redirect("document_list")
         else:
@@ -329,12 +180,9 @@ def autocomplete_sales_rep(request):
     if not hasattr(request, 'tenant') or request.user.tenant != request.tenant:
         return HttpResponseForbidden("You are not authorized for this company.")
     if 'term' in request.GET:
-        qs = CustomUser.objects.filter(
-            tenant = request.tenant,
-            roles__name='Sales Rep',
-            username__icontains=request.GET.get('term')
-        ).distinct()
-        names = list(qs.values_list('username', flat=True))
+        # Served from the tenant's in-memory index (documents/autocomplete.py), not a query per keystroke
+        reps = autocomplete.people(request.tenant.id, request.GET.get('term'), limit=20, sales_reps=True)
+        names = [person.username for person in reps]
         return JsonResponse(names, safe=False)
     
 
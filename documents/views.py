@@ -3,9 +3,10 @@ from .viewfuncs.contact_views import contact_list, create_contact, edit_contact,
 from .viewfuncs.custom_auth import CustomLoginView, home, register, account_activation_sent, get_tenant_url, forgot_password, reset_password, password_reset_sent, password_reset_success, post_login_redirect
 from .viewfuncs.custom_errors import custom_400, custom_403, custom_404, custom_500
 from .viewfuncs.custom_settings import email_config, email_config_success_view
-from .viewfuncs.document_views import document_list, delete_document
+from .viewfuncs.document_views import document_list, delete_document, document_job_status
 from .viewfuncs.editor_docs import custom_ckeditor_upload, create_from_editor
-from .viewfuncs.email_views import email_list, save_draft, send_email, email_detail, delete_email, delete_email_attachment, edit_email
+from .viewfuncs.email_views import email_list, save_draft, send_email, email_detail, delete_email, delete_email_attachment, edit_email, send_email_campaign
+from .viewfuncs.export_views import export_records
 from .viewfuncs.events_views import EventViewSet, UserViewSet, EventParticipantResponseView, calendar_view
 from .viewfuncs.file_views import upload_file, upload_file_anon, delete_file, move_file, rename_file, shared_file_view, enable_file_sharing
 from .viewfuncs.folder_views import folder_view, create_folder, shared_folder_view, enable_folder_sharing, delete_folder, move_folder, rename_folder
@@ -13,7 +14,7 @@ from .viewfuncs.help_views import contact_support
 from .viewfuncs.notification_views import notifications_view, dismiss_notification, dismiss_all_notifications
 from .viewfuncs.performance_dashboard import performance_dashboard, hod_performance_dashboard
 from .viewfuncs.profile_views import view_my_profile, edit_my_profile
-from .viewfuncs.search_funcs import user_search, contact_search
+from .viewfuncs.search_funcs import user_search, contact_search, global_search
 from .viewfuncs.staff_views import staff_directory, view_staff_profile, staff_list, add_staff_document, delete_staff_document, staff_list, export_staff_csv
 from .viewfuncs.task_views import task_list, task_detail, create_task, update_task_status, reassign_task, delete_task, task_edit, delete_task_document
 from .viewfuncs.template_docs import create_document, approve_document, autocomplete_sales_rep, send_approved_email
@@ -24,6 +25,7 @@ from .viewfuncs.admin.department_views import assign_users_to_department, depart
 from .viewfuncs.admin.document_views import admin_documents_list, admin_document_details, admin_delete_document
 from .viewfuncs.admin.event_views import create_event, event_list, delete_event, create_event_participant, event_participant_list, delete_event_participant, edit_event, edit_event_participant
 from .viewfuncs.admin.file_views import admin_file_list, admin_delete_file
+from .viewfuncs.admin.import_views import bulk_import_view
 from .viewfuncs.admin.folder_views import admin_folder_list, admin_delete_folder, admin_folder_details
 from .viewfuncs.admin.notifications_views import admin_notification_list, create_notification, edit_notification, delete_notification
 from .viewfuncs.admin.staff_profile_views import staff_profile_list, create_staff_profile, edit_staff_profile, delete_staff_profile
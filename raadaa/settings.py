@@ -132,15 +132,28 @@ LOGGING = {
         "console": {
             "class": "logging.StreamHandler",
         },
+        "events": {
+            "class": "tenants.observability.QueueHandler",
+        },
     },
     "loggers": {
         "django": {
             "handlers": ["console"],
             "level": "DEBUG" if DEBUG else "INFO",
         },
+        # Structured request-path events (tenants/observability.py)
+        "raadaa.events": {
+            "handlers": ["events"],
+            "level": os.getenv("EVENT_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
     },
 }
 
+# Per-event sampling for raadaa.events, e.g. {"tenant.*": 0.1, "mail.sent": 1.0}
+EVENT_SAMPLE_RATES = {}
+EVENT_DEFAULT_SAMPLE_RATE = float(os.getenv("EVENT_DEFAULT_SAMPLE_RATE", "1.0"))
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
 
@@ -183,6 +196,8 @@ REST_FRAMEWORK = {
 }
 
 MIDDLEWARE = [
+    'tenants.observability.RequestIdMiddleware',
+    'tenants.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -191,6 +206,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'tenants.middleware.TenantMiddleware',
+    'tenants.presence.PresenceMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
 ]
 
@@ -219,9 +235,99 @@ TEMPLATES[0]['OPTIONS']['context_processors'] += [
 
 WSGI_APPLICATION = 'raadaa.wsgi.application'
 
+# Tenant resolution cache (tenants/cache.py)
+TENANT_CACHE_ENABLED = os.getenv('TENANT_CACHE_ENABLED', 'True') == 'True'
+TENANT_CACHE_TTL = int(os.getenv('TENANT_CACHE_TTL', '60'))  # Seconds an entry lives in the per-process LRU
+TENANT_CACHE_ALIAS = os.getenv('TENANT_CACHE_ALIAS')  # Optional shared cache alias, e.g. 'default' when backed by Redis/Memcached
+
+# Notification bar/badge payload cache (documents/notifications.py). Use a shared
+# backend in CACHES so invalidation reaches every gunicorn worker.
+NOTIFICATION_CACHE_ALIAS = os.getenv('NOTIFICATION_CACHE_ALIAS', 'default')
+NOTIFICATION_CACHE_TTL = int(os.getenv('NOTIFICATION_CACHE_TTL', '60'))
+# notify_users(): UserNotification rows per INSERT, and the recipient count above which
+# the fan-out is queued for NotificationFanoutCronJob instead of written in the request
+NOTIFICATION_FANOUT_BATCH_SIZE = int(os.getenv('NOTIFICATION_FANOUT_BATCH_SIZE', '500'))
+NOTIFICATION_FANOUT_SYNC_LIMIT = int(os.getenv('NOTIFICATION_FANOUT_SYNC_LIMIT', '1000'))
+
+# Outbound mail queue (documents/outbox.py): SMTP connections kept per sender by the
+# worker, seconds an idle one stays open, and retry policy for failed sends
+MAIL_POOL_MAX_PER_SENDER = int(os.getenv('MAIL_POOL_MAX_PER_SENDER', '2'))
+MAIL_POOL_IDLE_TIMEOUT = int(os.getenv('MAIL_POOL_IDLE_TIMEOUT', '60'))
+MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', '5'))
+MAIL_RETRY_BASE_DELAY = int(os.getenv('MAIL_RETRY_BASE_DELAY', '30'))
+MAIL_RETRY_MAX_DELAY = int(os.getenv('MAIL_RETRY_MAX_DELAY', '3600'))
+# Campaigns (documents/campaigns.py): recipients per send_messages() batch (capped by the
+# provider's burst in SMTP_RATE_LIMITS) and seconds one cron run may spend sending
+MAIL_CAMPAIGN_BATCH_SIZE = int(os.getenv('MAIL_CAMPAIGN_BATCH_SIZE', '50'))
+MAIL_CAMPAIGN_TIME_BUDGET = int(os.getenv('MAIL_CAMPAIGN_TIME_BUDGET', '50'))
+
+# DOCX -> PDF conversion pool (documents/conversion.py): warm soffice processes per
+# app process, and seconds before a conversion is killed. The workers stay warm only
+# when LibreOffice's Python bindings (python3-uno) import in this interpreter;
+# otherwise every conversion is a cold `soffice --convert-to`
+LIBREOFFICE_PATH = os.getenv('LIBREOFFICE_PATH')  # Default: soffice/libreoffice on PATH
+DOC_CONVERSION_WORKERS = int(os.getenv('DOC_CONVERSION_WORKERS', '2'))
+DOC_CONVERSION_TIMEOUT = int(os.getenv('DOC_CONVERSION_TIMEOUT', '60'))
+# Background document generation (documents/doc_jobs.py): tries before a job whose
+# conversion keeps failing is marked failed
+DOC_JOB_MAX_ATTEMPTS = int(os.getenv('DOC_JOB_MAX_ATTEMPTS', '3'))
+# Compiled .docx templates kept in memory per process (documents/placeholders.py)
+DOCX_TEMPLATE_CACHE_SIZE = int(os.getenv('DOCX_TEMPLATE_CACHE_SIZE', '16'))
+
+# Open tasks past due_date moved to 'overdue' per transaction by OverdueTaskCronJob
+OVERDUE_SWEEP_BATCH_SIZE = int(os.getenv('OVERDUE_SWEEP_BATCH_SIZE', '500'))
+
+# Per-tenant folder trees (documents/folder_tree.py); dropped on folder/file changes.
+# Use a shared backend in CACHES so the drop reaches every gunicorn worker.
+FOLDER_TREE_CACHE_ALIAS = os.getenv('FOLDER_TREE_CACHE_ALIAS', 'default')
+FOLDER_TREE_CACHE_TTL = int(os.getenv('FOLDER_TREE_CACHE_TTL', '300'))
+
+# Document text extraction for search (documents/extraction.py): larger files are not read,
+# longer text is cut off
+SEARCH_EXTRACT_MAX_BYTES = int(os.getenv('SEARCH_EXTRACT_MAX_BYTES', str(25 * 1024 * 1024)))
+SEARCH_BODY_MAX_CHARS = int(os.getenv('SEARCH_BODY_MAX_CHARS', '200000'))
+SEARCH_EXTRACT_BATCH_SIZE = int(os.getenv('SEARCH_EXTRACT_BATCH_SIZE', '50'))
+
+# In-memory people/contact autocomplete (documents/autocomplete.py): tenants kept per
+# worker, and seconds an index lives before changes made in other workers show up
+AUTOCOMPLETE_MAX_TENANTS = int(os.getenv('AUTOCOMPLETE_MAX_TENANTS', '100'))
+AUTOCOMPLETE_TTL = int(os.getenv('AUTOCOMPLETE_TTL', '300'))
+
+# Rows read per query by the streaming CSV/XLSX exports (documents/exports.py)
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
+# Rows written per transaction by the bulk user/contact import (documents/bulk_import.py)
+BULK_IMPORT_CHUNK_SIZE = int(os.getenv('BULK_IMPORT_CHUNK_SIZE', '1000'))
+
+# Superuser dashboard counts (tenants/platform_stats.py), cached for this many seconds
+PLATFORM_STATS_CACHE_ALIAS = os.getenv('PLATFORM_STATS_CACHE_ALIAS', 'default')
+PLATFORM_STATS_CACHE_TTL = int(os.getenv('PLATFORM_STATS_CACHE_TTL', '60'))
+
+# Signed-in user presence (tenants/presence.py): a user's last_seen is written at most
+# once per PRESENCE_UPDATE_INTERVAL seconds; users seen within PRESENCE_ACTIVE_WINDOW
+# seconds and not logged out count as active on the tracking dashboards
+PRESENCE_UPDATE_INTERVAL = int(os.getenv('PRESENCE_UPDATE_INTERVAL', '300'))
+PRESENCE_ACTIVE_WINDOW = int(os.getenv('PRESENCE_ACTIVE_WINDOW', str(24 * 60 * 60)))
+
+# Per-request SQL/template timing by URL name (tenants/profiling.py), off by default.
+# Adds Server-Timing headers; percentiles at /tenants/profiling/slowest/ (superusers)
+REQUEST_PROFILING = os.getenv('REQUEST_PROFILING', 'False') == 'True'
+REQUEST_PROFILING_SAMPLES = int(os.getenv('REQUEST_PROFILING_SAMPLES', '500'))
+# Max queries per URL name, e.g. {'task_list': 20}; going over logs a warning, or
+# raises QueryBudgetExceeded when QUERY_BUDGET_STRICT (set it in tests)
+QUERY_BUDGETS = {}
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', 'False') == 'True'
+
 CRON_CLASSES = [
     "documents.cron.BirthdayNotificationCronJob",
     "documents.cron.EventReminderCronJob",
+    "documents.cron.NotificationFanoutCronJob",
+    "documents.cron.MailOutboxCronJob",
+    "documents.cron.MailCampaignCronJob",
+    "documents.cron.DocumentJobCronJob",
+    "documents.cron.OverdueTaskCronJob",
+    "documents.cron.ContentExtractionCronJob",
 ]
 
 # Database
@@ -60,6 +60,7 @@ urlpatterns = [
     path("staff/documents/add/", add_staff_document, name="add_staff_document"),
     path("staff/documents/delete/<int:document_id>", delete_staff_document, name="delete_staff_document"),
     path('staff/export-csv/', export_staff_csv, name='export_staff_csv'),
+    path('exports/<str:name>/', dv.export_records, name='export_records'),
     path('notifications/', notifications_view, name='notifications'),
     path('notifications/dismiss/', dismiss_notification, name='dismiss_notification'),
     path('notifications/dismiss-all/', dismiss_all_notifications, name='dismiss_all_notifications'),
@@ -79,6 +80,7 @@ urlpatterns = [
     path('dashboard/contacts/delete/<int:contact_id>/', delete_contact, name='delete_contact'),
     path('dashboard/emails/', email_list, name='email_list'),
     path('dashboard/emails/<int:email_id>', email_detail, name='email_detail'),
+    path('dashboard/emails/<int:email_id>/campaign/', dv.send_email_campaign, name='send_email_campaign'),
     path('dashboard/emails/<int:email_id>/delete-email-attachment/<int:attachment_id>/', dv.delete_email_attachment, name='delete_email_attachment'),
     path('dashboard/emails/save-draft/', save_draft, name='save_draft'),
     path('dashboard/emails/send/', send_email, name='send_email'),
@@ -120,9 +122,11 @@ urlpatterns = [
     path('admins/bulk-delete/<str:model_name>/', bulk_delete, name='bulk_delete'),
     # Users URLs
     path('users-search/', dv.user_search, name='user_search'),
+    path('search/', dv.global_search, name='global_search'),
     path('admins/users/bulk-action/', bulk_action_users, name='bulk_action_users'),
     path('admins/users/list/', users_list, name='users_list'),
     path('admins/users/create/', create_user, name='create_user'),
+    path('admins/import/', dv.bulk_import_view, name='bulk_import'),
     path('admins/users/view/<int:user_id>', view_user_details, name='view_user_details'),
     path('admins/users/approve/<int:user_id>', approve_user, name='approve_user'),
     path('admins/users/account-activation/', account_activation_sent, name='account_activation_sent'),
@@ -0,0 +1,147 @@
+# Tenant resolution cache
+# Keeps slug -> Tenant and id -> Tenant lookups out of the database on the
+# request path. Two layers:
+#   1. an in-process LRU (per gunicorn worker) with a short TTL
+#   2. an optional shared Django cache (set TENANT_CACHE_ALIAS, e.g. "default")
+# Entries are dropped by the post_save/post_delete receivers in tenants/signals.py.
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from tenants.models import Tenant
+
+DEFAULT_TENANT_KEY = "__default__"
+
+
+class LRUCache:
+    """Small thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, maxsize=256, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            for key in [k for k, (v, _) in self._data.items() if predicate(v)]:
+                del self._data[key]
+
+    def items(self):
+        """Snapshot of the unexpired (key, value) pairs."""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, value) for key, (value, expires) in self._data.items() if expires >= now]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_local = LRUCache(
+    maxsize=getattr(settings, "TENANT_CACHE_MAXSIZE", 256),
+    ttl=getattr(settings, "TENANT_CACHE_TTL", 60),
+)
+
+
+def is_enabled():
+    return getattr(settings, "TENANT_CACHE_ENABLED", True)
+
+
+def _shared_cache():
+    alias = getattr(settings, "TENANT_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def _shared_key(kind, value):
+    return f"tenants:{kind}:{value}"
+
+
+def _lookup(kind, value, loader):
+    if not is_enabled():
+        return loader()
+
+    key = (kind, value)
+    tenant = _local.get(key)
+    if tenant is not None:
+        return tenant
+
+    shared = _shared_cache()
+    if shared is not None:
+        tenant = shared.get(_shared_key(kind, value))
+
+    if tenant is None:
+        tenant = loader()  # May raise Tenant.DoesNotExist; misses are not cached
+        if tenant is None:
+            return None
+        if shared is not None:
+            shared.set(_shared_key(kind, value), tenant, getattr(settings, "TENANT_CACHE_SHARED_TTL", 300))
+
+    _local.set(key, tenant)
+    return tenant
+
+
+def get_tenant_by_slug(slug):
+    """Return the Tenant for a subdomain slug. Raises Tenant.DoesNotExist."""
+    return _lookup("slug", slug, lambda: Tenant.objects.get(slug=slug))
+
+
+def get_tenant_by_id(tenant_id):
+    """Return the Tenant with this primary key, or None."""
+    if tenant_id is None:
+        return None
+    return _lookup("id", tenant_id, lambda: Tenant.objects.filter(id=tenant_id).first())
+
+
+def get_default_tenant():
+    """DEBUG fallback used by TenantMiddleware when a subdomain is unknown."""
+    return _lookup("slug", DEFAULT_TENANT_KEY, lambda: Tenant.objects.first())
+
+
+def invalidate_tenant(tenant, old_slug=None):
+    """Drop every cached entry that refers to this tenant."""
+    slugs = {tenant.slug, old_slug, DEFAULT_TENANT_KEY} - {None}
+    _local.delete_where(lambda cached: cached.pk == tenant.pk)
+    for slug in slugs:
+        _local.delete(("slug", slug))
+    _local.delete(("id", tenant.pk))
+
+    shared = _shared_cache()
+    if shared is not None:
+        keys = [_shared_key("slug", slug) for slug in slugs]
+        keys.append(_shared_key("id", tenant.pk))
+        shared.delete_many(keys)
+
+
+def clear():
+    _local.clear()
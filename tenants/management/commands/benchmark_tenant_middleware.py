@@ -0,0 +1,84 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from documents.models import CustomUser
+from tenants import cache as tenant_cache
+from tenants.middleware import TenantMiddleware
+from tenants.models import Tenant
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare queries per request and p95 latency of TenantMiddleware with and without the tenant cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--tenants", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run_benchmark(options["requests"], options["tenants"])
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def run_benchmark(self, num_requests, num_tenants):
+        tenants = [
+            Tenant.objects.create(name=f"bench-tenant-{i}", slug=f"bench-tenant-{i}")
+            for i in range(num_tenants)
+        ]
+        users = [
+            CustomUser.objects.create_user(username=f"bench-user-{i}", password="x", tenant=tenant)
+            for i, tenant in enumerate(tenants)
+        ]
+        main_domain = settings.MAIN_DOMAIN.split(':')[0]
+        host_suffix = "localhost" if main_domain in ("http", "https") else main_domain
+
+        def view(request):
+            # Typical view guard: touches request.user.tenant
+            if request.user.tenant != request.tenant:
+                return HttpResponse(status=403)
+            return HttpResponse("ok")
+
+        middleware = TenantMiddleware(view)
+        factory = RequestFactory()
+
+        for label, enabled in (("before (no cache)", False), ("after (cached)", True)):
+            tenant_cache.clear()
+            timings = []
+            queries = 0
+            with override_settings(TENANT_CACHE_ENABLED=enabled):
+                for n in range(num_requests):
+                    idx = n % num_tenants
+                    request = factory.get("/", HTTP_HOST=f"{tenants[idx].slug}.{host_suffix}")
+                    # AuthenticationMiddleware loads the user row in both cases; keep it out of the measurement
+                    request.user = CustomUser.objects.get(pk=users[idx].pk)
+                    with CaptureQueriesContext(connection) as ctx:
+                        start = time.perf_counter()
+                        response = middleware(request)
+                        timings.append((time.perf_counter() - start) * 1000)
+                    if response.status_code != 200:
+                        self.stdout.write(self.style.ERROR(f"Unexpected status {response.status_code}"))
+                        return
+                    # Skip the warm-up pass over each tenant when counting steady-state queries
+                    if n >= num_tenants:
+                        queries += len(ctx.captured_queries)
+
+            steady = num_requests - num_tenants
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            self.stdout.write(
+                f"{label:<20} queries/request={queries / steady:.2f} "
+                f"p50={statistics.median(timings):.3f}ms p95={p95:.3f}ms"
+            )
+        tenant_cache.clear()
@@ -6,8 +6,9 @@ from urllib.parse import urlparse, urlunparse
 from django.shortcuts import redirect, render
 from django.contrib.auth import authenticate, login, logout
 from django.core.exceptions import PermissionDenied
-from documents.models import CustomUser
 from tenants.models import Tenant
+from tenants import cache as tenant_cache
+from tenants.observability import log_event
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -22,12 +23,12 @@ class TenantMiddleware:
         
         # Early return for superusers to bypass tenant logic
         if hasattr(request, 'user') and request.user.is_authenticated and request.user.is_superuser:
-            print("Superuser detected, bypassing tenant assignment")
+            log_event("tenant.superuser_bypass", user=request.user.username)
             return self.get_response(request)
         
         # Extract host and remove port if present
         host = request.get_host().split(':')[0]
-        print(f"Raw host: {request.get_host()}, Processed host: {host}, REMOTE_ADDR: {request.META.get('REMOTE_ADDR')}")
+        log_event("tenant.host", host=host, remote_addr=request.META.get('REMOTE_ADDR'))
 
         # Check if the request is for the main domain (no subdomain)
         main_domain = settings.MAIN_DOMAIN.split(':')[0]  # e.g., 'teammanager.ng'
@@ -36,56 +37,56 @@ class TenantMiddleware:
 
         # NEW: Check if host matches main domain exactly or is localhost
         if host == main_domain or host == 'localhost':
-            print("Request to main domain or localhost, no tenant required")
+            log_event("tenant.main_domain", host=host)
             request.tenant = None
             # Proceed to association check for authenticated users
         else:
             # Extract subdomain only if host has more parts than main domain
             if len(domain_parts) > len(main_domain_parts):
                 subdomain = domain_parts[0]  # e.g., 'sub' from 'sub.teammanager.ng'
-                print(f"Extracted subdomain: {subdomain}")
             else:
-                print(f"Invalid host format or no subdomain: {host}")
+                log_event("tenant.invalid_host", level=logging.WARNING, host=host)
                 return HttpResponseNotFound("Invalid host format or no subdomain")
 
             # Try to find tenant by subdomain
             try:
-                tenant = Tenant.objects.get(slug=subdomain)
-                print(f"Found tenant: {tenant.slug}")
+                tenant = tenant_cache.get_tenant_by_slug(subdomain)
                 request.tenant = tenant
             except Tenant.DoesNotExist:
-                print(f"Tenant with subdomain '{subdomain}' not found.")
+                log_event("tenant.not_found", level=logging.WARNING, subdomain=subdomain)
                 if settings.DEBUG:
-                    tenant = Tenant.objects.first()
+                    tenant = tenant_cache.get_default_tenant()
                     if tenant:
-                        print(f"Falling back to default tenant: {tenant.slug}")
+                        log_event("tenant.fallback", subdomain=subdomain, tenant=tenant.slug)
                         request.tenant = tenant
                     else:
-                        print("No tenants found in the database.")
+                        log_event("tenant.none_configured", level=logging.ERROR)
                         return HttpResponseNotFound("No tenants found in the database.")
                 else:
                     return HttpResponseNotFound(f"Tenant with subdomain '{subdomain}' not found.")
-            except Exception as e:
-                print(f"Unexpected error in tenant lookup: {e}")
+            except Exception:
+                log_event("tenant.lookup_error", level=logging.ERROR, exc_info=True, subdomain=subdomain)
                 return HttpResponseServerError("An unexpected server error occurred.")
 
         # Restrict access for authenticated non-superusers
+        # The user row is already loaded by AuthenticationMiddleware, so compare tenant ids
+        # instead of re-querying CustomUser.
         if hasattr(request, 'user') and request.user.is_authenticated:
-            if not CustomUser.objects.filter(id=request.user.id, tenant=request.tenant).exists():
-                print(f"User {request.user.username} not associated with tenant {request.tenant.slug if request.tenant else 'None'}")
-                expected_subdomain = (
-                    request.user.tenant.slug
-                    if hasattr(request.user, 'tenant') and request.user.tenant
-                    else None
-                )
+            request_tenant_id = request.tenant.id if request.tenant else None
+            if request.user.tenant_id != request_tenant_id:
+                log_event("tenant.user_mismatch", level=logging.WARNING, user=request.user.username, tenant=request.tenant.slug if request.tenant else None)
+                user_tenant = tenant_cache.get_tenant_by_id(request.user.tenant_id)
+                expected_subdomain = user_tenant.slug if user_tenant else None
                 if expected_subdomain is None:
                     logout(request)
                     raise PermissionDenied("You have no associated tenant. Contact support. faith.osebi@transnetcloud.com")
-                print(f"Wrong user tenant slug: {expected_subdomain}")
                 base_domain = "localhost:8000" if settings.DEBUG else "teammanager.ng"
                 protocol = "http" if settings.DEBUG else "https"
                 home_url = f"{protocol}://{expected_subdomain}.{base_domain}/"
-                print(f"Redirecting to tenant home: {home_url}")
+                log_event("tenant.redirect", user=request.user.username, expected=expected_subdomain, url=home_url)
                 return redirect(home_url)
-        print(f"Set request.tenant to: {request.tenant.slug if request.tenant else 'None'}")
+            if request.tenant is not None:
+                # Prime the FK cache so views comparing request.user.tenant don't query again
+                request.user.tenant = request.tenant
+        log_event("tenant.resolved", tenant=request.tenant.slug if request.tenant else None)
         return self.get_response(request)
\ No newline at end of file
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.21 on 2026-10-18 17:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tenants', '0010_alter_tenantapplication_email_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserPresence',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='presence', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('last_seen', models.DateTimeField()),
+                ('logged_out', models.BooleanField(default=False)),
+                ('tenant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='presences', to='tenants.tenant')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('logged_out', False)), fields=['last_seen', 'tenant'], name='user_presence_active_idx')],
+            },
+        ),
+    ]
@@ -98,4 +98,19 @@ class Payment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"Payment of {self.amount} for {self.tenant} on {self.payment_date}"
\ No newline at end of file
+        return f"Payment of {self.amount} for {self.tenant} on {self.payment_date}"
+
+class UserPresence(models.Model):
+    """Last activity of a signed-in user, kept by tenants/presence.py (one row per user)."""
+    user = models.OneToOneField('documents.CustomUser', on_delete=models.CASCADE, primary_key=True, related_name='presence')
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, null=True, blank=True, related_name='presences')
+    last_seen = models.DateTimeField()
+    logged_out = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_seen', 'tenant'], condition=models.Q(logged_out=False), name='user_presence_active_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} last seen {self.last_seen}"
@@ -0,0 +1,149 @@
+# Structured, sampled event logging for the request path
+#
+# Usage:
+#     from tenants.observability import log_event
+#     log_event("tenant.resolved", slug=tenant.slug)
+#
+# Events go to the "raadaa.events" logger. Its handler (QueueHandler below) only
+# puts records on an in-memory queue; a background thread does the actual
+# stdout write, so request threads never block on I/O.
+#
+# Verbosity can be changed at runtime without a restart of the code path:
+#   - set_level(logging.DEBUG) turns on the per-request trace events
+#   - set_sample_rate("tenant.resolved", 0.01) keeps 1% of a noisy event
+# Defaults come from settings.EVENT_LOG_LEVEL and settings.EVENT_SAMPLE_RATES.
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import uuid
+
+from django.conf import settings
+
+EVENT_LOGGER_NAME = "raadaa.events"
+REQUEST_ID_HEADER = "X-Request-ID"
+
+logger = logging.getLogger(EVENT_LOGGER_NAME)
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+_sample_rate_overrides = {}
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+def set_level(level):
+    logger.setLevel(level)
+
+
+def set_sample_rate(event, rate):
+    """Override the sampling rate (0.0 - 1.0) of an event, or of an "prefix.*" group."""
+    _sample_rate_overrides[event] = rate
+
+
+def clear_sample_rates():
+    _sample_rate_overrides.clear()
+
+
+def get_sample_rate(event):
+    configured = getattr(settings, "EVENT_SAMPLE_RATES", {})
+    prefix = event.split(".", 1)[0] + ".*"
+    for source in (_sample_rate_overrides, configured):
+        if event in source:
+            return source[event]
+        if prefix in source:
+            return source[prefix]
+    return getattr(settings, "EVENT_DEFAULT_SAMPLE_RATE", 1.0)
+
+
+def log_event(event, level=logging.DEBUG, exc_info=None, **fields):
+    """
+    Emit a structured event. Cheap when the level is disabled or the event is sampled out:
+    no string formatting happens before those checks.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    rate = get_sample_rate(event)
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return
+    logger.log(
+        level,
+        event,
+        exc_info=exc_info,
+        extra={"event": event, "fields": fields, "request_id": _request_id.get(), "sample_rate": rate},
+    )
+
+
+class StructuredFormatter(logging.Formatter):
+    """Render a record as one JSON object per line."""
+
+    def format(self, record):
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "event": getattr(record, "event", record.getMessage()),
+            "request_id": getattr(record, "request_id", None),
+        }
+        if getattr(record, "sample_rate", 1.0) < 1:
+            payload["sample_rate"] = record.sample_rate
+        payload.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Non-blocking handler. Records are queued and written by a QueueListener thread.
+    When the queue is full, records are dropped (and counted) rather than blocking the request.
+    """
+
+    def __init__(self, maxsize=10000, stream=None):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+        target = logging.StreamHandler(stream)
+        target.setFormatter(StructuredFormatter())
+        self.listener = logging.handlers.QueueListener(self.queue, target)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def prepare(self, record):
+        # Keep exc_info formatted for the listener thread but leave the structured fields intact
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestIdMiddleware:
+    """
+    Assign a correlation id to every request (reusing an incoming X-Request-ID if present),
+    expose it as request.request_id and echo it back in the response headers.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = (request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex)[:64]
+        request.request_id = request_id
+        token = _request_id.set(request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_id.reset(token)
+        response[REQUEST_ID_HEADER] = request_id
+        return response
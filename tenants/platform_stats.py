@@ -0,0 +1,79 @@
+# Platform-wide and per-tenant row counts for the superuser dashboard
+#
+# All per-tenant counts come from one UNION ALL of grouped COUNT queries
+# (one branch per model), plus one query for the tenant names; no table is
+# loaded into memory. The result is cached for PLATFORM_STATS_CACHE_TTL
+# seconds, so counts on the dashboard can lag by that much.
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, F, IntegerField, Value
+
+from documents.models import (CompanyProfile, Contact, CustomUser, Department, Email, Event, Role, StaffProfile,
+                              Team)
+from tenants.models import Tenant, TenantApplication
+
+CACHE_KEY = "platform_stats:counts"
+
+# Dashboard key -> model with a tenant FK
+TENANT_MODELS = {
+    'users': CustomUser,
+    'depts': Department,
+    'teams': Team,
+    'staff_prof': StaffProfile,
+    'comp_prof': CompanyProfile,
+    'events': Event,
+    'contacts': Contact,
+    'emails': Email,
+}
+# Dashboard key -> model counted platform-wide only
+GLOBAL_MODELS = {
+    'tenants_app': TenantApplication,
+    'roles': Role,
+}
+
+
+def _grouped_counts():
+    """{key: {tenant_id: count}}; tenant_id is None for rows without a tenant and for GLOBAL_MODELS."""
+    # Every branch has the same shape: union() takes the column names and order from the first
+    branches = [
+        model.objects.order_by().values(tenant_ref=F('tenant_id'))
+        .annotate(key=Value(key), n=Count('id')).values_list('key', 'tenant_ref', 'n')
+        for key, model in TENANT_MODELS.items()
+    ] + [
+        model.objects.order_by().values(tenant_ref=Value(None, output_field=IntegerField()))
+        .annotate(key=Value(key), n=Count('id')).values_list('key', 'tenant_ref', 'n')
+        for key, model in GLOBAL_MODELS.items()
+    ]
+    counts = {key: {} for key in (*TENANT_MODELS, *GLOBAL_MODELS)}
+    for key, tenant_id, n in branches[0].union(*branches[1:], all=True):
+        counts[key][tenant_id] = n
+    return counts
+
+
+def compute():
+    grouped = _grouped_counts()
+    tenants = list(Tenant.objects.order_by('id').values_list('id', 'name'))
+    totals = {key: sum(per_tenant.values()) for key, per_tenant in grouped.items()}
+    totals['tenants'] = len(tenants)
+    return {
+        'totals': totals,
+        # Chart series, one entry per tenant in tenant_names order
+        'charts': {
+            'tenant_names': [name for _, name in tenants],
+            'user_counts': [grouped['users'].get(tenant_id, 0) for tenant_id, _ in tenants],
+            'dept_counts': [grouped['depts'].get(tenant_id, 0) for tenant_id, _ in tenants],
+            'team_counts': [grouped['teams'].get(tenant_id, 0) for tenant_id, _ in tenants],
+        },
+    }
+
+
+def get_counts():
+    """compute(), cached in PLATFORM_STATS_CACHE_ALIAS for PLATFORM_STATS_CACHE_TTL seconds."""
+    cache = caches[getattr(settings, 'PLATFORM_STATS_CACHE_ALIAS', 'default')]
+    counts = cache.get(CACHE_KEY)
+    if counts is None:
+        counts = compute()
+        cache.set(CACHE_KEY, counts, getattr(settings, 'PLATFORM_STATS_CACHE_TTL', 60))
+    return counts
+
@@ -0,0 +1,88 @@
+# Signed-in user presence for the tracking dashboards
+#
+# One UserPresence row per user, written on login and logout (tenants/signals.py)
+# and by PresenceMiddleware on activity, at most once per PRESENCE_UPDATE_INTERVAL
+# seconds per user and worker. A user is active if they have not logged out and
+# were seen within the last PRESENCE_ACTIVE_WINDOW seconds.
+#
+#     presence.active_user_counts()   # {'total_active_users': ..., 'active_users_per_tenant': [...]}
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from tenants.cache import LRUCache
+from tenants.models import UserPresence
+
+# user id -> True while this worker has recorded the user within the interval
+_recently_seen = LRUCache(
+    maxsize=getattr(settings, "PRESENCE_THROTTLE_MAXSIZE", 10000),
+    ttl=getattr(settings, "PRESENCE_UPDATE_INTERVAL", 300),
+)
+
+
+def record(user, logged_out=False):
+    """Upsert the user's presence row with last_seen = now."""
+    fields = dict(tenant_id=user.tenant_id, last_seen=timezone.now(), logged_out=logged_out)
+    if UserPresence.objects.filter(user_id=user.pk).update(**fields):
+        return
+    try:
+        with transaction.atomic():
+            UserPresence.objects.create(user_id=user.pk, **fields)
+    except IntegrityError:
+        # Another request created the row first
+        UserPresence.objects.filter(user_id=user.pk).update(**fields)
+
+
+def seen(user):
+    """Throttled record() for request activity."""
+    if _recently_seen.get(user.pk):
+        return
+    _recently_seen.set(user.pk, True)
+    record(user)
+
+
+def logged_in(user):
+    _recently_seen.set(user.pk, True)
+    record(user)
+
+
+def logged_out(user):
+    _recently_seen.delete(user.pk)
+    record(user, logged_out=True)
+
+
+def active_presences():
+    window = getattr(settings, "PRESENCE_ACTIVE_WINDOW", 24 * 60 * 60)
+    return UserPresence.objects.filter(logged_out=False, last_seen__gte=timezone.now() - timedelta(seconds=window))
+
+
+def active_user_counts(limit=20):
+    """Active users overall and per tenant (top `limit` tenants), in two queries."""
+    presences = active_presences()
+    return {
+        'total_active_users': presences.count(),
+        'active_users_per_tenant': list(
+            presences.values('tenant__id', 'tenant__name')
+            .annotate(active_user_count=Count('user_id'))
+            .order_by('-active_user_count')[:limit]
+        ),
+    }
+
+
+class PresenceMiddleware:
+    """Record activity of signed-in users; must come after AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, "user", None)
+        # After the view, so a login/logout in this request has already been recorded
+        if user is not None and user.is_authenticated:
+            seen(user)
+        return response
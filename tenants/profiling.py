@@ -0,0 +1,168 @@
+# Opt-in per-request profiling, keyed by URL name
+#
+# Enabled with settings.REQUEST_PROFILING. For every resolved request the
+# middleware records the SQL query count, SQL time, template render time and
+# total time, and:
+#   - adds a Server-Timing header (visible in the browser's network panel)
+#   - keeps the last REQUEST_PROFILING_SAMPLES requests per URL name in memory,
+#     for the rolling percentiles shown by the superuser slowest_views endpoint
+#   - checks settings.QUERY_BUDGETS ({url_name: max queries}); a request over
+#     budget logs "profiling.query_budget" and, with QUERY_BUDGET_STRICT (tests),
+#     raises QueryBudgetExceeded
+#
+# Numbers are per process; each worker keeps its own samples.
+
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template import base as template_base
+
+from tenants.observability import log_event
+
+_current = contextvars.ContextVar("request_profile", default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - started
+
+
+_original_template_render = template_base.Template.render
+
+
+def _timed_template_render(self, context):
+    profile = _current.get()
+    if profile is None:
+        return _original_template_render(self, context)
+    # {% include %} renders templates inside templates; time only the outermost one
+    profile.template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_template_render(self, context)
+    finally:
+        profile.template_depth -= 1
+        if not profile.template_depth:
+            profile.template_time += time.perf_counter() - started
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class ViewStats:
+    """Rolling samples of (total, sql, template) ms and query count per URL name."""
+
+    FIELDS = ("total_ms", "sql_ms", "template_ms", "queries")
+
+    def __init__(self, size):
+        self.size = size
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, url_name, sample):
+        with self._lock:
+            if url_name not in self._samples:
+                self._samples[url_name] = deque(maxlen=self.size)
+                self._counts[url_name] = 0
+            self._samples[url_name].append(sample)
+            self._counts[url_name] += 1
+
+    def summary(self):
+        """{url_name: {"requests": n, "total_ms": {"p50", "p95", "p99", "max"}, ...}}"""
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+            counts = dict(self._counts)
+        result = {}
+        for name, values in samples.items():
+            result[name] = {"requests": counts[name], "samples": len(values)}
+            for i, field in enumerate(self.FIELDS):
+                ordered = sorted(sample[i] for sample in values)
+                result[name][field] = {
+                    "p50": _percentile(ordered, 0.5),
+                    "p95": _percentile(ordered, 0.95),
+                    "p99": _percentile(ordered, 0.99),
+                    "max": ordered[-1],
+                }
+        return result
+
+    def slowest(self, limit=20, by="total_ms"):
+        rows = sorted(self.summary().items(), key=lambda item: item[1][by]["p95"], reverse=True)
+        return [dict(url_name=name, **stats) for name, stats in rows[:limit]]
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+
+view_stats = ViewStats(getattr(settings, "REQUEST_PROFILING_SAMPLES", 500))
+
+
+def query_budget(url_name):
+    return getattr(settings, "QUERY_BUDGETS", {}).get(url_name, getattr(settings, "QUERY_BUDGET_DEFAULT", None))
+
+
+class ProfilingMiddleware:
+    """Per-request SQL/template/total timing; see the module comment. Not loaded unless REQUEST_PROFILING."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_PROFILING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        template_base.Template.render = _timed_template_render
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - profile.started
+
+        match = getattr(request, "resolver_match", None)
+        if match is None or not match.url_name:
+            return response
+        url_name = match.url_name
+        sample = (round(total * 1000, 1), round(profile.sql_time * 1000, 1),
+                  round(profile.template_time * 1000, 1), profile.sql_count)
+        view_stats.add(url_name, sample)
+        response["Server-Timing"] = (
+            f'sql;dur={sample[1]};desc="{profile.sql_count} queries", '
+            f'tpl;dur={sample[2]}, total;dur={sample[0]}'
+        )
+
+        budget = query_budget(url_name)
+        if budget is not None and profile.sql_count > budget:
+            log_event("profiling.query_budget", level=logging.WARNING, url_name=url_name, path=request.path,
+                      queries=profile.sql_count, budget=budget)
+            if getattr(settings, "QUERY_BUDGET_STRICT", False):
+                raise QueryBudgetExceeded(f"{url_name} ran {profile.sql_count} queries (budget {budget})")
+        return response
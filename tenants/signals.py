@@ -0,0 +1,32 @@
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Tenant
+from . import cache as tenant_cache, presence
+
+@receiver(pre_save, sender=Tenant)
+def remember_old_tenant_slug(sender, instance, **kwargs):
+    """
+    Keep the slug the tenant had before this save so a rename also evicts the old key.
+    """
+    if instance.pk:
+        instance._old_slug = Tenant.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def invalidate_tenant_cache(sender, instance, **kwargs):
+    """
+    Drop cached slug/id lookups for a tenant whenever it changes.
+    """
+    tenant_cache.invalidate_tenant(instance, old_slug=getattr(instance, '_old_slug', None))
+
+
+@receiver(user_logged_in)
+def record_login(sender, request, user, **kwargs):
+    presence.logged_in(user)
+
+@receiver(user_logged_out)
+def record_logout(sender, request, user, **kwargs):
+    # user is None when the session had already expired
+    if user is not None:
+        presence.logged_out(user)
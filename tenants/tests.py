@@ -1,3 +1,331 @@
-from django.test import TestCase
+import atexit
+import io
+import json
+import logging
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.template import base as template_base
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from tenants import cache as tenant_cache
+from documents.models import CustomUser, Department, Role, Team
+from tenants import observability, platform_stats, presence, profiling
+from tenants.models import Tenant, UserPresence
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        lru = tenant_cache.LRUCache(maxsize=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+
+    def test_expired_entries_are_misses(self):
+        lru = tenant_cache.LRUCache(ttl=-1)
+        lru.set('a', 1)
+        self.assertIsNone(lru.get('a'))
+        self.assertEqual(len(lru), 0)
+
+
+class TenantCacheTests(TestCase):
+    def setUp(self):
+        tenant_cache.clear()
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+
+    def tearDown(self):
+        tenant_cache.clear()
+
+    def test_lookups_are_served_from_the_cache(self):
+        tenant_cache.get_tenant_by_slug('acme')
+        tenant_cache.get_tenant_by_id(self.tenant.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(tenant_cache.get_tenant_by_slug('acme'), self.tenant)
+            self.assertEqual(tenant_cache.get_tenant_by_id(self.tenant.id), self.tenant)
+
+    def test_misses_are_not_cached(self):
+        with self.assertRaises(Tenant.DoesNotExist):
+            tenant_cache.get_tenant_by_slug('globex')
+        self.assertIsNone(tenant_cache.get_tenant_by_id(self.tenant.id + 1))
+        globex = Tenant.objects.create(name='Globex', slug='globex')
+        self.assertEqual(tenant_cache.get_tenant_by_slug('globex'), globex)
+        self.assertEqual(tenant_cache.get_tenant_by_id(globex.id), globex)
+
+    def test_rename_evicts_the_old_slug(self):
+        tenant_cache.get_tenant_by_slug('acme')
+        tenant_cache.get_tenant_by_id(self.tenant.id)
+        self.tenant.name = 'Acme Corp'
+        self.tenant.slug = 'acme-corp'
+        self.tenant.save()
+        with self.assertRaises(Tenant.DoesNotExist):
+            tenant_cache.get_tenant_by_slug('acme')
+        self.assertEqual(tenant_cache.get_tenant_by_id(self.tenant.id).name, 'Acme Corp')
+
+    def test_delete_evicts_the_tenant(self):
+        tenant_cache.get_tenant_by_slug('acme')
+        tenant_id = self.tenant.id
+        self.tenant.delete()
+        with self.assertRaises(Tenant.DoesNotExist):
+            tenant_cache.get_tenant_by_slug('acme')
+        self.assertIsNone(tenant_cache.get_tenant_by_id(tenant_id))
+
+    def test_default_tenant_is_evicted_with_any_tenant_change(self):
+        self.assertEqual(tenant_cache.get_default_tenant(), self.tenant)
+        Tenant.objects.filter(pk=self.tenant.pk).delete()
+        first = Tenant.objects.create(name='Globex', slug='globex')
+        self.assertEqual(tenant_cache.get_default_tenant(), first)
+
+    @override_settings(TENANT_CACHE_ENABLED=False)
+    def test_disabled_cache_always_queries(self):
+        tenant_cache.get_tenant_by_slug('acme')
+        with self.assertNumQueries(1):
+            tenant_cache.get_tenant_by_slug('acme')
+
+
+@override_settings(
+    CACHES={'tenants': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tenant-tests'}},
+    TENANT_CACHE_ALIAS='tenants',
+)
+class SharedTenantCacheTests(TestCase):
+    def setUp(self):
+        tenant_cache.clear()
+        self.tenant = Tenant.objects.create(name='Acme', slug='acme')
+
+    def tearDown(self):
+        tenant_cache.clear()
+        caches['tenants'].clear()
+
+    def test_other_workers_read_the_shared_layer(self):
+        tenant_cache.get_tenant_by_slug('acme')
+        tenant_cache.clear()  # Another worker: empty process cache
+        with self.assertNumQueries(0):
+            self.assertEqual(tenant_cache.get_tenant_by_slug('acme'), self.tenant)
+
+    def test_saves_evict_the_shared_entries(self):
+        tenant_cache.get_tenant_by_slug('acme')
+        tenant_cache.get_tenant_by_id(self.tenant.id)
+        self.tenant.slug = 'acme-corp'
+        self.tenant.save()
+        self.assertIsNone(caches['tenants'].get('tenants:slug:acme'))
+        self.assertIsNone(caches['tenants'].get(f'tenants:id:{self.tenant.id}'))
+
+
+class LogEventTests(SimpleTestCase):
+    def setUp(self):
+        self.level = observability.logger.level
+        observability.set_level(logging.INFO)
+        self.addCleanup(observability.set_level, self.level)
+        self.addCleanup(observability.clear_sample_rates)
+
+    def test_events_below_the_level_are_skipped(self):
+        with self.assertNoLogs(observability.EVENT_LOGGER_NAME):
+            observability.log_event('tenant.resolved', slug='acme')
+        with self.assertLogs(observability.EVENT_LOGGER_NAME, logging.INFO) as logs:
+            observability.log_event('tenant.resolved', level=logging.INFO, slug='acme')
+        [record] = logs.records
+        self.assertEqual((record.event, record.fields, record.sample_rate), ('tenant.resolved', {'slug': 'acme'}, 1.0))
+
+    @override_settings(EVENT_SAMPLE_RATES={'tenant.*': 0, 'tenant.kept': 1.0})
+    def test_sample_rates_by_event_then_prefix(self):
+        self.assertEqual(observability.get_sample_rate('tenant.kept'), 1.0)
+        self.assertEqual(observability.get_sample_rate('tenant.resolved'), 0)
+        self.assertEqual(observability.get_sample_rate('mail.sent'), 1.0)
+        # Runtime overrides win over settings
+        observability.set_sample_rate('tenant.resolved', 0.5)
+        self.assertEqual(observability.get_sample_rate('tenant.resolved'), 0.5)
+        with self.assertNoLogs(observability.EVENT_LOGGER_NAME):
+            observability.log_event('tenant.other', level=logging.WARNING)
+
+    def test_formatter_writes_one_json_object(self):
+        with self.assertLogs(observability.EVENT_LOGGER_NAME, logging.INFO) as logs:
+            observability.set_sample_rate('mail.sent', 0.999999)
+            with mock.patch('tenants.observability.random.random', return_value=0.0):
+                observability.log_event('mail.sent', level=logging.INFO, to='a@example.com')
+        payload = json.loads(observability.StructuredFormatter().format(logs.records[0]))
+        self.assertEqual(payload['event'], 'mail.sent')
+        self.assertEqual(payload['to'], 'a@example.com')
+        self.assertEqual(payload['sample_rate'], 0.999999)
+        self.assertIsNone(payload['request_id'])
+
+    def test_full_queue_drops_records(self):
+        handler = observability.QueueHandler(maxsize=1, stream=io.StringIO())
+        handler.listener.stop()
+        atexit.unregister(handler.listener.stop)
+        record = logging.LogRecord('x', logging.INFO, __file__, 1, 'event', None, None)
+        handler.enqueue(record)
+        handler.enqueue(record)
+        self.assertEqual(handler.dropped, 1)
+
+
+class RequestIdMiddlewareTests(SimpleTestCase):
+    def test_request_id_is_reused_and_echoed(self):
+        seen = []
+
+        def view(request):
+            seen.append(observability.get_request_id())
+            return HttpResponse()
+
+        middleware = observability.RequestIdMiddleware(view)
+        response = middleware(RequestFactory().get('/', HTTP_X_REQUEST_ID='abc'))
+        self.assertEqual((seen, response['X-Request-ID']), (['abc'], 'abc'))
+        self.assertIsNone(observability.get_request_id())
+
+        response = middleware(RequestFactory().get('/', HTTP_X_REQUEST_ID='x' * 100))
+        self.assertEqual(response['X-Request-ID'], 'x' * 64)
+        response = middleware(RequestFactory().get('/'))
+        self.assertEqual(len(response['X-Request-ID']), 32)
+
+
+@override_settings(REQUEST_PROFILING=True, QUERY_BUDGETS={'task_list': 1}, QUERY_BUDGET_DEFAULT=None)
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        profiling.view_stats.clear()
+        self.addCleanup(profiling.view_stats.clear)
+        self.addCleanup(setattr, template_base.Template, 'render', template_base.Template.render)
+
+    def request(self, url_name, queries):
+        def view(request):
+            for _ in range(queries):
+                Tenant.objects.exists()
+            request.resolver_match = mock.Mock(url_name=url_name)
+            return HttpResponse()
+
+        return profiling.ProfilingMiddleware(view)(RequestFactory().get('/'))
+
+    def test_requests_are_sampled_by_url_name(self):
+        response = self.request('folder_view', 2)
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        summary = profiling.view_stats.summary()
+        self.assertEqual(list(summary), ['folder_view'])
+        self.assertEqual((summary['folder_view']['requests'], summary['folder_view']['queries']['max']), (1, 2))
+
+    def test_going_over_the_query_budget_is_logged(self):
+        with self.assertLogs(observability.EVENT_LOGGER_NAME, logging.WARNING) as logs:
+            self.request('task_list', 2)
+        self.assertEqual(logs.records[0].fields['budget'], 1)
+        with self.assertNoLogs(observability.EVENT_LOGGER_NAME, logging.WARNING):
+            self.request('task_list', 1)
+            self.request('folder_view', 5)  # No budget
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_strict_budgets_raise(self):
+        with self.assertRaisesMessage(profiling.QueryBudgetExceeded, 'task_list ran 3 queries (budget 1)'):
+            self.request('task_list', 3)
+
+    @override_settings(REQUEST_PROFILING=False)
+    def test_middleware_is_not_loaded_unless_enabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            profiling.ProfilingMiddleware(lambda request: HttpResponse())
+
+
+class ViewStatsTests(SimpleTestCase):
+    def test_percentiles_over_the_rolling_window(self):
+        stats = profiling.ViewStats(size=100)
+        for ms in range(1, 201):
+            stats.add('task_list', (ms, 0, 0, 1))
+        stats.add('folder_view', (500, 0, 0, 9))
+        summary = stats.summary()['task_list']
+        self.assertEqual((summary['requests'], summary['samples']), (200, 100))
+        self.assertEqual(summary['total_ms'], {'p50': 151, 'p95': 196, 'p99': 200, 'max': 200})
+        self.assertEqual([row['url_name'] for row in stats.slowest(by='queries')], ['folder_view', 'task_list'])
+        self.assertEqual([row['url_name'] for row in stats.slowest(limit=1)], ['folder_view'])
+
+
+@override_settings(
+    CACHES={'stats': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'platform-stats-tests'}},
+    PLATFORM_STATS_CACHE_ALIAS='stats',
+)
+class PlatformStatsTests(TestCase):
+    def setUp(self):
+        self.addCleanup(caches['stats'].clear)
+        self.acme = Tenant.objects.create(name='Acme', slug='acme')
+        self.globex = Tenant.objects.create(name='Globex', slug='globex')
+        Tenant.objects.create(name='Empty', slug='empty')
+        for i in range(3):
+            CustomUser.objects.create_user(username=f'acme{i}', tenant=self.acme)
+        CustomUser.objects.create_user(username='globex0', tenant=self.globex)
+        CustomUser.objects.create_user(username='root')  # No tenant
+        sales = Department.objects.create(tenant=self.acme, name='Sales')
+        Department.objects.create(tenant=self.globex, name='Sales')
+        Team.objects.create(tenant=self.acme, name='Leads', department=sales)
+        Role.objects.get_or_create(name='HOD')
+
+    def test_counts_match_per_model_counts_in_two_queries(self):
+        with self.assertNumQueries(2):
+            counts = platform_stats.compute()
+        totals = counts['totals']
+        self.assertEqual((totals['tenants'], totals['users'], totals['depts'], totals['teams']), (3, 5, 2, 1))
+        self.assertEqual(totals['roles'], Role.objects.count())
+        self.assertEqual((totals['contacts'], totals['emails']), (0, 0))
+        self.assertEqual(counts['charts'], {
+            'tenant_names': ['Acme', 'Globex', 'Empty'],
+            'user_counts': [3, 1, 0],
+            'dept_counts': [1, 1, 0],
+            'team_counts': [1, 0, 0],
+        })
+
+    def test_counts_are_cached(self):
+        first = platform_stats.get_counts()
+        CustomUser.objects.create_user(username='acme9', tenant=self.acme)
+        with self.assertNumQueries(0):
+            self.assertEqual(platform_stats.get_counts(), first)
+        caches['stats'].clear()
+        self.assertEqual(platform_stats.get_counts()['totals']['users'], 6)
+
+
+class PresenceTests(TestCase):
+    def setUp(self):
+        presence._recently_seen.clear()
+        self.addCleanup(presence._recently_seen.clear)
+        self.acme = Tenant.objects.create(name='Acme', slug='acme')
+        self.globex = Tenant.objects.create(name='Globex', slug='globex')
+        self.ada = CustomUser.objects.create_user(username='ada', tenant=self.acme)
+
+    def request_as(self, user):
+        def view(request):
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.user = user
+        return presence.PresenceMiddleware(view)(request)
+
+    def test_activity_is_written_once_per_interval(self):
+        with self.assertNumQueries(4):  # UPDATE, then the INSERT inside a savepoint
+            self.request_as(self.ada)
+        with self.assertNumQueries(0):
+            self.request_as(self.ada)
+        presence._recently_seen.clear()  # The interval passed
+        with self.assertNumQueries(1):
+            self.request_as(self.ada)
+        self.assertEqual(UserPresence.objects.get().tenant, self.acme)
+
+    def test_logout_ends_presence_until_the_next_login(self):
+        user_logged_in.send(sender=type(self.ada), request=None, user=self.ada)
+        self.assertEqual(presence.active_user_counts()['total_active_users'], 1)
+        user_logged_out.send(sender=type(self.ada), request=None, user=self.ada)
+        self.assertEqual(presence.active_user_counts()['total_active_users'], 0)
+        user_logged_out.send(sender=type(self.ada), request=None, user=None)  # Expired session
+        # Logout clears the throttle, so the next request is recorded at once
+        self.request_as(self.ada)
+        self.assertEqual(presence.active_user_counts()['total_active_users'], 1)
+
+    @override_settings(PRESENCE_ACTIVE_WINDOW=60)
+    def test_active_users_per_tenant(self):
+        for name, tenant in [('bob', self.acme), ('cy', self.globex), ('old', self.globex)]:
+            presence.record(CustomUser.objects.create_user(username=name, tenant=tenant))
+        presence.record(self.ada)
+        UserPresence.objects.filter(user__username='old').update(last_seen=timezone.now() - timedelta(minutes=5))
+        with self.assertNumQueries(2):
+            counts = presence.active_user_counts()
+        self.assertEqual(counts['total_active_users'], 3)
+        self.assertEqual(counts['active_users_per_tenant'], [
+            {'tenant__id': self.acme.id, 'tenant__name': 'Acme', 'active_user_count': 2},
+            {'tenant__id': self.globex.id, 'tenant__name': 'Globex', 'active_user_count': 1},
+        ])
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import home, apply_for_tenant, application_status, create_tenant, tenant_list, reject_tenant, tenant_applications, check_status, edit_tenant, delete_tenant, verify_tenant, delete_tenant_app, users_list, superuser_dashboard
+from .views import home, apply_for_tenant, application_status, create_tenant, tenant_list, reject_tenant, tenant_applications, check_status, edit_tenant, delete_tenant, verify_tenant, delete_tenant_app, users_list, superuser_dashboard, slowest_views
 
 urlpatterns = [
     path('', home, name='tenant_home'),
@@ -15,5 +15,6 @@ urlpatterns = [
     path('verify/<int:tenant_id>/', verify_tenant, name='verify_tenant'),
     path('list/', tenant_list, name='tenant_list'),
     path('users/list/', users_list, name='all_users_list'),
-    path('dashboard/', superuser_dashboard, name='superuser_dashboard')
+    path('dashboard/', superuser_dashboard, name='superuser_dashboard'),
+    path('profiling/slowest/', slowest_views, name='slowest_views'),
 ]
\ No newline at end of file
@@ -1,17 +1,19 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.contrib.sessions.models import Session
 from django.core.mail import send_mail, get_connection
 from django.core.management import call_command
 from django.core.paginator import Paginator
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, JsonResponse
 from django.utils import timezone
 from .models import Tenant, TenantApplication
 from .forms import TenantApplicationForm, TenantForm
 from documents.models import CustomUser, Role, Department, Team, StaffProfile, CompanyProfile, Contact, Email, Event, Task, Folder, File, Vacancy, VacancyApplication
 from django.contrib.auth import authenticate, login
 from django.db.models import Q, Count
+from documents.task_stats import tenant_status_counts
+from .profiling import view_stats
+from . import platform_stats, presence
 import logging
 from raadaa import settings
 
@@ -261,111 +263,62 @@ def users_list(request):
 @login_required
 @user_passes_test(lambda u: u.is_superuser or u.tenant.slug == 'track')
 def superuser_dashboard(request):
-    # Annotate with distinct counts to avoid duplicates from joins
-    tenants = Tenant.objects.annotate(
-        user_count=Count('customuser', distinct=True),  # Use distinct to count unique users
-        dept_count=Count('department', distinct=True),  # Use distinct for departments
-        team_count=Count('team', distinct=True),       # Use distinct for teams
-    ).all()
-
-    # If annotations still produce incorrect counts, compute separately as a fallback
-    tenant_data = []
-    for tenant in tenants:
-        tenant_data.append({
-            'name': tenant.name,  # Adjust to your Tenant field (e.g., tenant.slug or str(tenant))
-            'slug': tenant.slug,
-            'user_count': CustomUser.objects.filter(tenant=tenant).count(),
-            'dept_count': Department.objects.filter(tenant=tenant).count(),
-            'team_count': Team.objects.filter(tenant=tenant).count(),
-        })
-
-    users = CustomUser.objects.all()
-    tenants_app = TenantApplication.objects.all()
-    depts = Department.objects.all()
-    teams = Team.objects.all()
-    roles = Role.objects.all()
-    staff_prof = StaffProfile.objects.all()
-    comp_prof = CompanyProfile.objects.all()
-    events = Event.objects.all()
-    contacts = Contact.objects.all()
-    emails = Email.objects.all()
-
-    # Prepare chart data using tenant_data for reliability
-    tenant_names = [tenant['name'] for tenant in tenant_data]
-    user_counts = [tenant['user_count'] for tenant in tenant_data]
-    dept_counts = [tenant['dept_count'] for tenant in tenant_data]
-    team_counts = [tenant['team_count'] for tenant in tenant_data]
-
+    # Counts and chart series from a handful of grouped queries, cached briefly
+    counts = platform_stats.get_counts()
     context = {
-        'tenants': tenants,
-        'users': users,
-        'tenants_app': tenants_app,
-        'depts': depts,
-        'teams': teams,
-        'roles': roles,
-        'staff_prof': staff_prof,
-        'comp_prof': comp_prof,
-        'events': events,
-        'contacts': contacts,
-        'emails': emails,
-        'tenant_names': tenant_names,
-        'user_counts': user_counts,
-        'dept_counts': dept_counts,
-        'team_counts': team_counts,
+        'counts': counts['totals'],
+        'charts': counts['charts'],
     }
     return render(request, 'tenants/dashboard.html', context)
 
-def get_user_data():
-    # get all unexpired sessions
-    sessions = Session.objects.filter(expire_date__gte=timezone.now())
-    
-    user_ids = []
-    for session in sessions:
-        data = session.get_decoded()
-        user_id = data.get('_auth_user_id')
-        if user_id:
-            user_ids.append(user_id)
-    
-    # Get all users tied to active sessions
-    active_users = CustomUser.objects.filter(id__in=user_ids)
-    
-    # Count totals
-    total_active_users = active_users.count()
-    
-    # Aggregate per tenant
-    active_users_per_tenant = list(
-        active_users.values('tenant__id', 'tenant__name')
-        .annotate(active_user_count=Count('id'))
-        .order_by('-active_user_count')[:20]
-    )
-    
+@login_required
+@user_passes_test(lambda u: u.is_superuser)
+def slowest_views(request):
+    """Rolling per-view timings from ProfilingMiddleware (this process only), slowest p95 first."""
+    by = request.GET.get('by', 'total_ms')
+    if by not in view_stats.FIELDS:
+        return JsonResponse({'error': f"by must be one of {', '.join(view_stats.FIELDS)}"}, status=400)
+    try:
+        limit = int(request.GET.get('limit', 20))
+    except ValueError:
+        limit = 20
+    return JsonResponse({
+        'enabled': settings.REQUEST_PROFILING,
+        'budgets': settings.QUERY_BUDGETS,
+        'views': view_stats.slowest(limit, by),
+    })
+
+def _task_counts():
+    # One grouped query on the rollup instead of four scans of Task
+    status_per_tenant = sorted(tenant_status_counts(), key=lambda item: (item['tenant__id'], item['status']))
+    tasks_per_tenant = {}
+    general_status_counts = {}
+    for item in status_per_tenant:
+        tenant = tasks_per_tenant.setdefault(item['tenant__id'], {
+            'tenant__id': item['tenant__id'], 'tenant__name': item['tenant__name'], 'task_count': 0,
+        })
+        tenant['task_count'] += item['count']
+        general_status_counts[item['status']] = general_status_counts.get(item['status'], 0) + item['count']
     return {
-        'total_active_users': total_active_users,
-        'active_users_per_tenant': active_users_per_tenant,
+        'total_tasks': sum(general_status_counts.values()),
+        'tasks_per_tenant': list(tasks_per_tenant.values()),
+        'general_status_counts': [{'status': status, 'count': count} for status, count in sorted(general_status_counts.items())],
+        'status_per_tenant': status_per_tenant,
     }
-    
+
 # Tracking
 @login_required
 @user_passes_test(lambda u: u.is_superuser or u.tenant.slug == 'track')
 def tracking_dashboard(request):
-    # Task metrics (from task_dashboard logic)
-    total_tasks = Task.objects.count()
-    tasks_per_tenant = list(
-        Task.objects.values('tenant__id', 'tenant__name')
-        .annotate(task_count=Count('id'))
-        .order_by('-task_count')[:20]
-    )
-    top_task_tenant_ids = [item['tenant__id'] for item in tasks_per_tenant]
-    task_general_status_counts = list(
-        Task.objects.values('status')
-        .annotate(count=Count('id'))
-        .order_by('status')
-    )
-    task_status_per_tenant = list(
-        Task.objects.filter(tenant__id__in=top_task_tenant_ids)
-        .values('tenant__id', 'tenant__name', 'status')
-        .annotate(count=Count('id'))
-        .order_by('-count')
+    # Task metrics (from task_dashboard logic), read from the TaskDailyStat rollup
+    task_counts = _task_counts()
+    total_tasks = task_counts['total_tasks']
+    tasks_per_tenant = sorted(task_counts['tasks_per_tenant'], key=lambda item: -item['task_count'])[:20]
+    top_task_tenant_ids = {item['tenant__id'] for item in tasks_per_tenant}
+    task_general_status_counts = task_counts['general_status_counts']
+    task_status_per_tenant = sorted(
+        (item for item in task_counts['status_per_tenant'] if item['tenant__id'] in top_task_tenant_ids),
+        key=lambda item: -item['count'],
     )
 
     # Folder/File metrics (from folder_file_dashboard logic)
@@ -465,7 +418,7 @@ def tracking_dashboard(request):
     )
 
     # User stats
-    user_context = get_user_data()
+    user_context = presence.active_user_counts()
 
     context = {
         # Task keys
@@ -508,22 +461,17 @@ def tracking_dashboard(request):
 
 @login_required
 def track_user(request):
-    context = get_user_data()
+    context = presence.active_user_counts()
     return render(request, 'tracking/loggedin_users_dashboard.html', context)
 
 @login_required
 def track_tasks(request):
-    # Total number of tasks (general tasks)
-    total_tasks = Task.objects.count()
-
-    # Number of tasks per tenant
-    tasks_per_tenant = list(Task.objects.values('tenant__id', 'tenant__name').annotate(task_count=Count('id')).order_by('tenant__id'))
-
-    # General status counts (across all tasks)
-    general_status_counts = list(Task.objects.values('status').annotate(count=Count('id')).order_by('status'))
-
-    # Status counts per tenant
-    status_per_tenant = list(Task.objects.values('tenant__id', 'tenant__name', 'status').annotate(count=Count('id')).order_by('tenant__id', 'status'))
+    # Totals, per-tenant and per-status task counts from the TaskDailyStat rollup
+    task_counts = _task_counts()
+    total_tasks = task_counts['total_tasks']
+    tasks_per_tenant = task_counts['tasks_per_tenant']
+    general_status_counts = task_counts['general_status_counts']
+    status_per_tenant = task_counts['status_per_tenant']
 
     context = {
         'total_tasks': total_tasks,